@@ -5,68 +5,466 @@ Aplikacja desktopowa do wizualizacji danych eksperymentalnych 2D
 Wersja: 9.2 (Poprawka widoczności paska narzędzi, zmiana nazwy przycisku)
 """
 
+from __future__ import annotations
+import time
+_IMPORT_START = time.perf_counter()
 import tkinter as tk
-from tkinter import ttk, filedialog, messagebox, TclError, colorchooser
-from typing import Dict, Any, List
-import pandas as pd
+from tkinter import ttk, filedialog, messagebox, simpledialog, TclError, colorchooser
+from typing import Dict, Any, List, TYPE_CHECKING
 import numpy as np
 import os
 import logging
-from scipy.fft import fft, fftfreq
-from scipy.signal import savgol_filter
-from scipy.ndimage import median_filter, gaussian_filter1d
-import copy
+import sys
+import queue
+import threading
+import functools
+import itertools
+from concurrent.futures import ThreadPoolExecutor
 
 from matplotlib.figure import Figure
+from matplotlib.lines import Line2D
 from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
 from matplotlib.backends._backend_tk import NavigationToolbar2Tk
 
+from davisu_core import (SMOOTHING_METHODS, apply_smoothing, smooth_batch, read_txt_file, read_excel_workbook,
+                         DatasetCache, Signal, SignalView, SignalSummary, DerivedDataCache, SpectralEngine, MinMaxPyramid,
+                         RingBuffer, FileTail, PerformanceMonitor, OutOfCoreSignal, mapped_base, smoothing_margin, SessionFile, DatasetIndex, SignalExporter)
+
+if TYPE_CHECKING: import pandas as pd
+_IMPORT_SECONDS = time.perf_counter() - _IMPORT_START
+
+def timed_operation(name: str):
+    # Dekorator metod aplikacji: mierzy operację użytkownika w monitorze wydajności (self.perf)
+    def decorator(method):
+        @functools.wraps(method)
+        def wrapper(self, *args, **kwargs):
+            with self.perf.operation(name): return method(self, *args, **kwargs)
+        return wrapper
+    return decorator
+
+class QueuedLoader:
+    # Wspólna część wczytywania w tle: wyniki z wątków roboczych trafiają do kolejki, a wątek Tk (root.after)
+    # odbiera je paczkami w kolejności indeksów, więc interfejs pozostaje responsywny.
+    def __init__(self, root, on_results, on_progress, on_done, poll_ms: int = 50):
+        self.root = root; self.on_results = on_results; self.on_progress = on_progress; self.on_done = on_done; self.poll_ms = poll_ms
+        self._queue: queue.Queue = queue.Queue(); self._ready: Dict[int, tuple] = {}; self._next_index = 0
+        self.total: int | None = None; self.cancelled = False; self._worker_finished = False
+    def cancel(self): self.cancelled = True
+    def _poll(self):
+        while True:
+            try: index, item = self._queue.get_nowait()
+            except queue.Empty: break
+            self._ready[index] = item
+        batch = []
+        while self._next_index in self._ready: batch.append(self._ready.pop(self._next_index)); self._next_index += 1
+        if batch and not self.cancelled: self.on_results(batch)
+        if self.total is not None: self.on_progress(self._next_index, self.total)
+        if self.cancelled or (self.total is not None and self._next_index >= self.total) or (self._worker_finished and self._queue.empty() and not self._ready):
+            self._finish(); self.on_done(self.cancelled); return
+        self.root.after(self.poll_ms, self._poll)
+    def _finish(self): pass
+
+class ParallelFileLoader(QueuedLoader):
+    # Wczytuje pliki równolegle w puli wątków; cancel() porzuca zadania, które jeszcze nie wystartowały.
+    def __init__(self, root, filepaths, read_func, on_results, on_progress, on_done, max_workers: int | None = None, poll_ms: int = 50):
+        super().__init__(root, on_results, on_progress, on_done, poll_ms)
+        self.filepaths = list(filepaths); self.read_func = read_func; self.total = len(self.filepaths)
+        self.max_workers = max_workers or min(8, os.cpu_count() or 1); self._executor: ThreadPoolExecutor | None = None
+    def start(self):
+        self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="loader")
+        for index, filepath in enumerate(self.filepaths): self._executor.submit(self._read, index, filepath)
+        self.root.after(self.poll_ms, self._poll)
+    def cancel(self):
+        super().cancel()
+        if self._executor: self._executor.shutdown(wait=False, cancel_futures=True)
+    def _read(self, index: int, filepath: str):
+        if self.cancelled: return
+        try: self._queue.put((index, (filepath, self.read_func(filepath), None)))
+        except Exception as e: self._queue.put((index, (filepath, None, e)))
+    def _finish(self):
+        if self._executor: self._executor.shutdown(wait=False)
+
+class WorkbookLoader(QueuedLoader):
+    # Wczytuje wszystkie arkusze skoroszytu .xlsx w wątku roboczym, raportując postęp po każdym arkuszu.
+    def __init__(self, root, filepath, on_results, on_progress, on_done, dataset_cache: DatasetCache | None = None, poll_ms: int = 50):
+        super().__init__(root, on_results, on_progress, on_done, poll_ms); self.filepath = filepath; self.dataset_cache = dataset_cache; self.error: Exception | None = None
+    def start(self):
+        threading.Thread(target=self._run, name="workbook-loader", daemon=True).start(); self.root.after(self.poll_ms, self._poll)
+    def _run(self):
+        items: List[tuple] = []
+        def set_total(count: int): self.total = count
+        def on_sheet(index: int, name: str, df): items.append((name, df)); self._queue.put((index, (name, df)))
+        try:
+            cached = self.dataset_cache.load(self.filepath) if self.dataset_cache else None
+            if cached is not None:
+                logging.info(f"Wczytano skoroszyt '{os.path.basename(self.filepath)}' z cache danych.")
+                set_total(len(cached))
+                for index, (name, df) in enumerate(cached): self._queue.put((index, (name, df)))
+                return
+            read_excel_workbook(self.filepath, set_total, on_sheet, lambda: self.cancelled)
+            if self.dataset_cache and not self.cancelled: self.dataset_cache.store(self.filepath, items)
+        except Exception as e: self.error = e
+        finally: self._worker_finished = True
+
+class ExportJob(QueuedLoader):
+    # Eksport danych w wątku roboczym: sygnały są przygotowywane (przetworzenie, widmo) i zapisywane kolejno, więc w pamięci
+    # jest naraz tylko jeden; po każdym wiersz statystyk trafia do kolejki, a ostatni element oznacza zamknięcie pliku wynikowego.
+    def __init__(self, root, exporter: SignalExporter, items: List[tuple], on_progress, on_done, poll_ms: int = 100):
+        super().__init__(root, lambda batch: None, on_progress, on_done, poll_ms)
+        self.exporter = exporter; self.items = items; self.total = len(items) + 1; self.error: Exception | None = None
+    def start(self):
+        threading.Thread(target=self._run, name="export", daemon=True).start(); self.root.after(self.poll_ms, self._poll)
+    def _run(self):
+        try:
+            for index, (name, prepare, info) in enumerate(self.items):
+                if self.cancelled: break
+                x_data, y_window, spectrum = prepare()
+                if self.exporter.write(name, x_data, y_window, spectrum, info, lambda: self.cancelled) is None: break
+                self._queue.put((index, name))
+            if self.cancelled: self.exporter.abort(); return
+            self.exporter.close(); self._queue.put((len(self.items), None))
+        except Exception as e:
+            self.error = e
+            try: self.exporter.abort()
+            except OSError: pass
+        finally: self._worker_finished = True
+
+class LiveAcquisition:
+    # Tryb na żywo: wątek roboczy co poll_ms odczytuje tylko nowe linie śledzonych plików (FileTail) i przekazuje je
+    # przez kolejkę; wątek Tk odbiera je najwyżej max_fps razy na sekundę, niezależnie od tempa akwizycji.
+    def __init__(self, root, sources: Dict[str, str], on_samples, on_error, poll_ms: int = 50, max_fps: int = 10):
+        self.root = root; self.sources = dict(sources); self.on_samples = on_samples; self.on_error = on_error
+        self.poll_ms = poll_ms; self.frame_ms = max(int(1000 / max_fps), 1)
+        self._queue: queue.Queue = queue.Queue(); self._stop_event = threading.Event(); self.stopped = False
+    def start(self):
+        threading.Thread(target=self._run, name="live-acquisition", daemon=True).start(); self.root.after(self.frame_ms, self._drain)
+    def stop(self): self.stopped = True; self._stop_event.set()
+    def _run(self):
+        tails = {plot_id: FileTail(path) for plot_id, path in self.sources.items()}
+        try:
+            while tails and not self._stop_event.is_set():
+                for plot_id, tail in list(tails.items()):
+                    try: samples, reset = tail.read_new()
+                    except Exception as e: tail.close(); tails.pop(plot_id); self._queue.put((plot_id, None, e)); continue
+                    if reset or len(samples): self._queue.put((plot_id, samples, reset))
+                self._stop_event.wait(self.poll_ms / 1000)
+        finally:
+            for tail in tails.values(): tail.close()
+    def _drain(self):
+        if self.stopped: return
+        updates: Dict[str, list] = {}
+        while True:
+            try: plot_id, samples, detail = self._queue.get_nowait()
+            except queue.Empty: break
+            if samples is None: self.on_error(plot_id, detail)
+            else: updates.setdefault(plot_id, []).append((samples, detail))
+        if updates: self.on_samples(updates)
+        self.root.after(self.frame_ms, self._drain)
+
+class ComputeScheduler:
+    # Obliczenia numeryczne w puli wątków, poza pętlą Tk. Zadania mają klucz (np. 'redraw'): nowe zgłoszenie z tym samym
+    # kluczem zastępuje oczekujące (latest-wins), a trwające staje się nieaktualne - funkcja obliczeń może przerwać pracę,
+    # sprawdzając is_cancelled(), a jej wynik jest odrzucany. Wyniki aktualnych zadań wracają do wątku Tk przez root.after.
+    def __init__(self, root, max_workers: int = 2, poll_ms: int = 15):
+        self.root = root; self.poll_ms = poll_ms; self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="compute")
+        self._results: queue.Queue = queue.Queue(); self._generations = itertools.count(1)
+        self._latest: Dict[str, int] = {}; self._running: Dict[str, int] = {}; self._pending: Dict[str, tuple] = {}; self._polling = False
+    def submit(self, key: str, compute, on_done, on_error=None) -> int:
+        generation = next(self._generations); self._latest[key] = generation; job = (generation, compute, on_done, on_error)
+        if key in self._running: self._pending[key] = job
+        else: self._start(key, job)
+        return generation
+    def cancel(self, key: str): self._latest[key] = next(self._generations); self._pending.pop(key, None)
+    def is_stale(self, key: str, generation: int) -> bool: return self._latest.get(key) != generation
+    def busy(self) -> bool: return bool(self._running or self._pending)
+    def shutdown(self):
+        for key in list(self._latest): self.cancel(key)
+        self._executor.shutdown(wait=False, cancel_futures=True)
+    def _start(self, key: str, job: tuple):
+        self._running[key] = job[0]; self._executor.submit(self._run, key, job)
+        if not self._polling: self._polling = True; self.root.after(self.poll_ms, self._poll)
+    def _run(self, key: str, job: tuple):
+        generation, compute = job[0], job[1]
+        try: outcome = (compute(lambda: self.is_stale(key, generation)), None)
+        except Exception as e: outcome = (None, e)
+        self._results.put((key, job, outcome))
+    def _poll(self):
+        while True:
+            try: key, (generation, _, on_done, on_error), (value, error) = self._results.get_nowait()
+            except queue.Empty: break
+            self._running.pop(key, None)
+            if not self.is_stale(key, generation):
+                if error is None: on_done(value)
+                elif on_error is not None: on_error(error)
+                else: logging.error(f"Błąd obliczeń w tle ({key}): {error}", exc_info=error)
+            pending = self._pending.pop(key, None)
+            if pending is not None: self._start(key, pending)
+        if self._running: self.root.after(self.poll_ms, self._poll)
+        else: self._polling = False
+
 class CustomNavigationToolbar(NavigationToolbar2Tk):
     toolitems = tuple(t for t in NavigationToolbar2Tk.toolitems if
                       t[0] in ('Home', 'Pan', 'Zoom', 'Subplots', 'Save'))
 
+class CrosshairCursor:
+    # Kursor krzyżowy rysowany metodą blittingu: tło osi jest buforowane po każdym pełnym rysowaniu, a ruch myszy
+    # (ograniczony do ~60 Hz) odtwarza tło i rysuje tylko linie kursora. Opcjonalnie przyciąga odczyt do najbliższej
+    # próbki aktywnego sygnału (wyszukiwanie binarne w indeksie podsumowania sygnału).
+    IDLE_TEXT = " Najechanie na wykres pokaże współrzędne"
+    def __init__(self, root, canvas, ax, set_status, snap_source, interval_ms: int = 16):
+        self.root = root; self.canvas = canvas; self.ax = ax; self.set_status = set_status; self.snap_source = snap_source; self.interval_ms = interval_ms
+        self.v_line = ax.axvline(0, color='gray', lw=0.8, linestyle='--', visible=False, animated=True)
+        self.h_line = ax.axhline(0, color='gray', lw=0.8, linestyle='--', visible=False, animated=True)
+        self.snap_point, = ax.plot([], [], marker='o', markersize=7, markerfacecolor='none', markeredgecolor='red', linestyle='none', visible=False, animated=True, label='_nolegend_')
+        self.snap_enabled = False; self.fft_quantity = ("Amplituda", "a.u."); self._background = None; self._pending: tuple = (False, None, None); self._scheduled = False
+        canvas.mpl_connect('draw_event', self._on_draw)
+    def on_move(self, event): self._pending = (event.inaxes is self.ax, event.xdata, event.ydata); self._schedule()
+    def on_leave(self, event=None): self._pending = (False, None, None); self._schedule()
+    def _schedule(self):
+        if not self._scheduled: self._scheduled = True; self.root.after(self.interval_ms, self._render)
+    def _on_draw(self, event):
+        self._background = self.canvas.copy_from_bbox(self.ax.bbox); self._draw_artists()
+    def _draw_artists(self):
+        for artist in (self.v_line, self.h_line, self.snap_point):
+            if artist.get_visible(): self.ax.draw_artist(artist)
+    def _render(self):
+        self._scheduled = False; inside, x_pos, y_pos = self._pending
+        if not inside or x_pos is None or y_pos is None:
+            for artist in (self.v_line, self.h_line, self.snap_point): artist.set_visible(False)
+            self.set_status(self.IDLE_TEXT)
+        else:
+            snapped = self._snap(x_pos) if self.snap_enabled else None; is_fft = False
+            if snapped is not None: x_pos, y_pos, is_fft = snapped; self.snap_point.set_data([x_pos], [y_pos])
+            else: source = self.snap_source(); is_fft = bool(source and source[1])
+            self.snap_point.set_visible(snapped is not None)
+            self.v_line.set_xdata([x_pos, x_pos]); self.h_line.set_ydata([y_pos, y_pos]); self.v_line.set_visible(True); self.h_line.set_visible(True)
+            if is_fft: self.set_status(f" Częstotliwość: {x_pos:,.4f} THz  |  {self.fft_quantity[0]}: {y_pos:,.5g} {self.fft_quantity[1]}" + ("  (próbka)" if snapped else ""))
+            else: self.set_status(f" Czas: {x_pos:,.3f} ps  |  Sygnał: {y_pos:,.5f} a.u." + ("  (próbka)" if snapped else ""))
+        if self._background is None: self.canvas.draw_idle(); return
+        self.canvas.restore_region(self._background); self._draw_artists(); self.canvas.blit(self.ax.bbox)
+    def _snap(self, x_pos: float):
+        source = self.snap_source()
+        if source is None: return None
+        summary, is_fft = source
+        if summary.y.size == 0 or not summary.x_sorted: return None
+        index = summary.nearest_index(x_pos)
+        return float(summary.x[index]), float(summary.y[index]), is_fft
+
+class DatasetList(ttk.Frame):
+    # Wirtualizowana lista zbiorów danych: istnieje tylko pula wierszy mieszczących się w oknie, a przewijanie podmienia
+    # ich treść (etykieta, zaznaczenie) z DatasetIndex - tysiące zbiorów nie oznaczają tysięcy widżetów. Filtr po fragmencie etykiety.
+    EMPTY_TEXT = "Nie wczytano żadnych danych."; NO_MATCH_TEXT = "Brak zbiorów pasujących do filtra."; WHEEL_ROWS = 3
+    def __init__(self, parent, index: DatasetIndex, filter_var: tk.StringVar, on_toggle):
+        super().__init__(parent); self.index = index; self.filter_var = filter_var; self.on_toggle = on_toggle
+        self._items: List[str] = []; self._offset = 0; self._capacity = 0; self._row_height = 0; self._rows: List[tuple] = []; self._refresh_pending = False
+        filter_frame = ttk.Frame(self); filter_frame.pack(side=tk.TOP, fill=tk.X, pady=(0, 5)); ttk.Label(filter_frame, text="Filtr:").pack(side=tk.LEFT, padx=(0, 5))
+        ttk.Entry(filter_frame, textvariable=filter_var).pack(side=tk.LEFT, fill=tk.X, expand=True)
+        self.count_label = ttk.Label(filter_frame, anchor='e'); self.count_label.pack(side=tk.LEFT, padx=(5, 0))
+        self.scrollbar = ttk.Scrollbar(self, orient=tk.VERTICAL, command=self._on_scrollbar); self.scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
+        self.body = ttk.Frame(self); self.body.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
+        self.empty_label = ttk.Label(self.body, text=self.EMPTY_TEXT, wraplength=350)
+        self.body.bind('<Configure>', lambda e: self._resize(e.height)); self._bind_wheel(self.body); self._bind_wheel(self.empty_label)
+        filter_var.trace_add('write', lambda *args: self.refresh(reset=True)); self.refresh()
+    def refresh(self, reset: bool = False):
+        # Zmiany modelu (np. wczytanie tysięcy plików) są zbierane do jednego odświeżenia na cykl pętli Tk
+        if reset: self._offset = 0
+        if not self._refresh_pending: self._refresh_pending = True; self.after_idle(self._refresh)
+    def _refresh(self): self._refresh_pending = False; self._items = self.index.matching(self.filter_var.get()); self._render()
+    def _resize(self, height: int):
+        if not self._rows: self._rows.append(self._make_row()); self._row_height = max(self._rows[0][0].winfo_reqheight(), 1)
+        self._capacity = max(height // self._row_height, 1)
+        while len(self._rows) < self._capacity + 1: self._rows.append(self._make_row())
+        while len(self._rows) > self._capacity + 1: self._rows.pop()[0].destroy()
+        self._render()
+    def _make_row(self) -> tuple:
+        var = tk.BooleanVar(); position = len(self._rows)
+        row = ttk.Checkbutton(self.body, variable=var, command=lambda: self._on_row_toggled(position, var.get())); self._bind_wheel(row)
+        return row, var
+    def _render(self):
+        n_items = len(self._items); self._offset = max(0, min(self._offset, n_items - self._capacity))
+        for position, (row, var) in enumerate(self._rows):
+            index = self._offset + position
+            if index >= n_items: row.place_forget(); continue
+            plot_id = self._items[index]; row.config(text=self.index.label(plot_id)); var.set(self.index.is_visible(plot_id))
+            row.place(x=5, y=position * self._row_height, relwidth=1.0, width=-5)
+        if n_items: self.empty_label.place_forget()
+        else: self.empty_label.config(text=self.NO_MATCH_TEXT if len(self.index) else self.EMPTY_TEXT); self.empty_label.place(x=5, y=5)
+        self.scrollbar.set(*((self._offset / n_items, min((self._offset + self._capacity) / n_items, 1.0)) if n_items else (0.0, 1.0)))
+        self.count_label.config(text=f"{n_items}/{len(self.index)}" if self.filter_var.get().strip() else f"{n_items}")
+    def _on_row_toggled(self, position: int, value: bool):
+        if self._offset + position < len(self._items): self.on_toggle(self._items[self._offset + position], value)
+    def _on_scrollbar(self, action: str, amount: str, unit: str | None = None):
+        if action == 'moveto': self._scroll_to(round(float(amount) * len(self._items)))
+        else: self._scroll_to(self._offset + int(amount) * (self._capacity if unit == 'pages' else 1))
+    def _scroll_to(self, offset: int):
+        if offset != self._offset: self._offset = offset; self._render()
+    def _bind_wheel(self, widget):
+        widget.bind('<MouseWheel>', lambda e: self._scroll_to(self._offset + (-self.WHEEL_ROWS if e.delta > 0 else self.WHEEL_ROWS)))
+        widget.bind('<Button-4>', lambda e: self._scroll_to(self._offset - self.WHEEL_ROWS)); widget.bind('<Button-5>', lambda e: self._scroll_to(self._offset + self.WHEEL_ROWS))
+
 class HistoryManager:
-    # ... (cała klasa HistoryManager bez zmian) ...
-    def __init__(self, app_instance):
-        self.app = app_instance
+    # Historia Undo/Redo oparta na deltach: każdy wpis przechowuje tylko zmienione parametry sygnałów
+    # (scale_factor, etykieta, kolor, wygładzanie, widoczność...). Bufory danych są traktowane jako niezmienne
+    # i współdzielone przez referencję, a rozmiar historii jest ograniczony budżetem w bajtach.
+    def __init__(self, app_instance, max_bytes: int = 16 * 1024 * 1024):
+        self.app = app_instance; self.max_bytes = max_bytes; self.current_bytes = 0
         self.undo_stack: List[Dict[str, Any]] = []
         self.redo_stack: List[Dict[str, Any]] = []
+        self._pending: Dict[str, Any] | None = None
     def save_state(self, operation_name: str):
+        with self.app.perf.operation("Zapis historii"): self._save_state(operation_name)
+    def _save_state(self, operation_name: str):
         try:
-            state = copy.deepcopy(self.app.plotted_data)
-            self.undo_stack.append(state)
-            self.redo_stack.clear()
-            if len(self.undo_stack) > 30: self.undo_stack.pop(0)
+            self._commit_pending(); self.redo_stack.clear()
+            self._pending = {'name': operation_name, 'before': {pid: (signal, signal.params()) for pid, signal in self.app.plotted_data.items()}}
             self.app.update_edit_menu_state()
             logging.info(f"Zapisano stan: {operation_name}")
         except Exception as e: logging.error(f"Błąd podczas zapisywania stanu: {e}")
+    def can_undo(self) -> bool: return bool(self.undo_stack) or self._pending is not None
+    def can_redo(self) -> bool: return bool(self.redo_stack) and self._pending is None
     def undo(self):
-        if not self.undo_stack: return
+        with self.app.perf.operation("Cofnij"): self._undo()
+    def _undo(self):
+        self._commit_pending()
+        if not self.undo_stack: self.app.update_edit_menu_state(); return
         try:
-            current_state = copy.deepcopy(self.app.plotted_data)
-            self.redo_stack.append(current_state)
-            previous_state = self.undo_stack.pop()
-            self.app.plotted_data = previous_state
-            self.app.redraw_all_plots()
-            self.app._update_combobox()
-            self.app.update_edit_menu_state()
-            logging.info("Operacja cofnięta.")
+            entry = self.undo_stack.pop(); self.current_bytes -= entry['bytes']
+            self._apply(entry['delta'], undo=True); self.redo_stack.append(entry)
+            self.app._on_history_restored(entry['delta'].keys())
+            logging.info(f"Operacja cofnięta: {entry['name']}")
         except Exception as e: logging.error(f"Błąd podczas cofania: {e}")
     def redo(self):
-        if not self.redo_stack: return
+        with self.app.perf.operation("Ponów"): self._redo()
+    def _redo(self):
+        self._commit_pending()
+        if not self.redo_stack: self.app.update_edit_menu_state(); return
         try:
-            current_state = copy.deepcopy(self.app.plotted_data)
-            self.undo_stack.append(current_state)
-            next_state = self.redo_stack.pop()
-            self.app.plotted_data = next_state
-            self.app.redraw_all_plots()
-            self.app._update_combobox()
-            self.app.update_edit_menu_state()
-            logging.info("Operacja ponowiona.")
+            entry = self.redo_stack.pop(); self._apply(entry['delta'], undo=False)
+            self.undo_stack.append(entry); self.current_bytes += entry['bytes']; self._enforce_budget()
+            self.app._on_history_restored(entry['delta'].keys())
+            logging.info(f"Operacja ponowiona: {entry['name']}")
         except Exception as e: logging.error(f"Błąd podczas ponawiania: {e}")
+    def clear(self): self.undo_stack.clear(); self.redo_stack.clear(); self._pending = None; self.current_bytes = 0
+    def _commit_pending(self):
+        # Zamienia migawkę parametrów sprzed operacji na deltę względem stanu bieżącego; puste operacje są pomijane
+        if self._pending is None: return
+        before, current = self._pending['before'], self.app.plotted_data; delta: Dict[str, tuple] = {}
+        for plot_id in list(before.keys()) + [pid for pid in current if pid not in before]:
+            old_signal, old_params = before.get(plot_id, (None, None)); new_signal = current.get(plot_id)
+            new_params = new_signal.params() if new_signal is not None else None
+            if old_signal is not new_signal:
+                delta[plot_id] = ({'signal': old_signal, 'params': old_params} if old_signal is not None else None, {'signal': new_signal, 'params': new_params} if new_signal is not None else None); continue
+            changed = [name for name in new_signal.PARAMS if old_params[name] != new_params[name]]
+            if changed: delta[plot_id] = ({'signal': old_signal, 'params': {name: old_params[name] for name in changed}}, {'signal': new_signal, 'params': {name: new_params[name] for name in changed}})
+        name = self._pending['name']; self._pending = None
+        if not delta: return
+        entry = {'name': name, 'delta': delta, 'bytes': self._estimate_bytes(delta)}
+        self.undo_stack.append(entry); self.current_bytes += entry['bytes']; self.redo_stack.clear(); self._enforce_budget()
+    def _apply(self, delta: Dict[str, tuple], undo: bool):
+        for plot_id, (old, new) in delta.items():
+            target = old if undo else new
+            if target is None: self.app.plotted_data.pop(plot_id, None); continue
+            target['signal'].update(target['params']); self.app.plotted_data[plot_id] = target['signal']
+    def _enforce_budget(self):
+        while self.undo_stack and self.current_bytes > self.max_bytes:
+            dropped = self.undo_stack.pop(0); self.current_bytes -= dropped['bytes']
+            logging.info(f"Historia przekroczyła budżet pamięci - usunięto najstarszy wpis: {dropped['name']}")
+    @staticmethod
+    def _estimate_bytes(delta: Dict[str, tuple]) -> int:
+        # Liczone są tylko parametry; bufory danych sygnałów są współdzielone z przestrzenią roboczą
+        total = sys.getsizeof(delta)
+        for old, new in delta.values():
+            for change in (old, new):
+                if change: total += sys.getsizeof(change['params']) + sum(sys.getsizeof(v) for v in change['params'].values())
+        return total
+
+class PlotLayer:
+    # Warstwa wykresu w trybie "retained": jedna trwała linia Line2D na plot_id, aktualizowana
+    # przez set_data/set_color/set_label/set_visible tylko wtedy, gdy zmienią się jej dane wejściowe.
+    LOD_MIN_POINTS = 20000
+    LEGEND_BEST_MAX = 20  # loc='best' sprawdza kolizje każdej pozycji ze wszystkimi liniami - przy wielu wpisach koszt rysowania rośnie kwadratowo
+    def __init__(self, ax, compute_xy, summarize, lighten_color, data_key=None, full_bounds=None):
+        # data_key/full_bounds: opcjonalny klucz danych linii i granice pełnego sygnału (np. okno i przegląd w trybie out-of-core)
+        self.ax = ax; self.compute_xy = compute_xy; self.summarize = summarize; self.lighten_color = lighten_color; self.data_key = data_key; self.full_bounds = full_bounds
+        self.lines: Dict[str, Line2D] = {}
+        self._data_keys: Dict[str, tuple] = {}; self._style_keys: Dict[str, tuple] = {}; self._legend_key = None
+        self._pyramids: Dict[str, MinMaxPyramid] = {}; self._bounds: Dict[str, tuple] = {}; self._view_key = None
+    def sync(self, plotted_data: Dict[str, 'Signal'], domain) -> bool:
+        data_changed = False
+        for plot_id in [pid for pid in self.lines if pid not in plotted_data]: self._remove(plot_id); data_changed = True
+        for plot_id in sorted(plotted_data.keys()):
+            data = plotted_data[plot_id]; line = self.lines.get(plot_id)
+            if not data.visible:
+                if line is not None and line.get_visible(): line.set_visible(False); data_changed = True
+                continue
+            smoothed = data.smoothed
+            data_key = self.data_key(plot_id, data, domain) if self.data_key else (data.version, data.scale_factor, smoothed, data.smoothing_method if smoothed else None, data.smoothing_window if smoothed else None, domain)
+            is_comparison = data.is_comparison
+            color = self.lighten_color(data.original_color) if is_comparison else data.color
+            style_key = (color, '--' if is_comparison else '-', f"{data.label} (x{data.scale_factor:.3f})")
+            if line is None:
+                x, y = self._prepare(plot_id, data, domain)
+                line, = self.ax.plot(x, y, label=style_key[2], color=style_key[0], linestyle=style_key[1]); self.lines[plot_id] = line; data_changed = True
+            else:
+                if self._data_keys.get(plot_id) != data_key: line.set_data(*self._prepare(plot_id, data, domain)); data_changed = True
+                if self._style_keys.get(plot_id) != style_key: line.set_color(style_key[0]); line.set_linestyle(style_key[1]); line.set_label(style_key[2])
+                if not line.get_visible(): line.set_visible(True); data_changed = True
+            self._data_keys[plot_id] = data_key; self._style_keys[plot_id] = style_key
+        if data_changed: self._view_key = None
+        return data_changed
+    def _prepare(self, plot_id: str, data: 'Signal', domain):
+        # Granice pełnych danych pochodzą z indeksu podsumowania; dla długich, posortowanych w x sygnałów buduje piramidę LOD
+        x_data, y_data = self.compute_xy(plot_id, data, domain); summary = self.summarize(plot_id, data, domain); self._pyramids.pop(plot_id, None)
+        self._bounds[plot_id] = (self.full_bounds(plot_id, data, domain) if self.full_bounds else None) or summary.bounds()
+        if x_data.size < self.LOD_MIN_POINTS or not summary.x_sorted: return x_data, y_data
+        pyramid = self._pyramids[plot_id] = MinMaxPyramid(x_data, y_data)
+        return pyramid.view(x_data[0], x_data[-1], self._width_px())
+    def refresh_view(self):
+        # Po zmianie zakresu osi X lub rozmiaru okna podmienia dane linii na poziom piramidy dopasowany do widoku
+        if not self._pyramids: return
+        x_min, x_max = self.ax.get_xlim(); width_px = self._width_px(); view_key = (x_min, x_max, width_px)
+        if view_key == self._view_key: return
+        self._view_key = view_key
+        for plot_id, pyramid in self._pyramids.items():
+            line = self.lines.get(plot_id)
+            if line is not None and line.get_visible(): line.set_data(*pyramid.view(x_min, x_max, width_px))
+    def data_bounds(self):
+        bounds = [self._bounds[pid] for pid, line in self.lines.items() if line.get_visible() and self._bounds.get(pid)]
+        if not bounds: return None
+        columns = np.array(bounds); return float(columns[:, 0].min()), float(columns[:, 1].max()), float(columns[:, 2].min()), float(columns[:, 3].max())
+    def _width_px(self) -> int: return max(int(self.ax.bbox.width), 100)
+    def update_legend(self, show: bool):
+        handles = [self.lines[pid] for pid in sorted(self.lines) if self.lines[pid].get_visible()]
+        legend_key = (show, tuple((pid,) + self._style_keys[pid] for pid in sorted(self.lines) if self.lines[pid].get_visible()))
+        if legend_key == self._legend_key: return
+        self._legend_key = legend_key; legend = self.ax.get_legend()
+        if legend: legend.remove()
+        if show and handles: self.ax.legend(handles=handles, loc='best' if len(handles) <= self.LEGEND_BEST_MAX else 'upper right')
+    def visible_lines(self) -> List[Line2D]: return [line for line in self.lines.values() if line.get_visible()]
+    def clear(self):
+        for plot_id in list(self.lines): self._remove(plot_id)
+        legend = self.ax.get_legend()
+        if legend: legend.remove()
+        self._legend_key = None
+    def _remove(self, plot_id: str):
+        self.lines.pop(plot_id).remove()
+        for store in (self._data_keys, self._style_keys, self._pyramids, self._bounds): store.pop(plot_id, None)
 
 class DataVisualizerApp:
+    LIVE_BUFFER_CAPACITY = 100_000; LIVE_MAX_FPS = 10
+    BACKGROUND_MIN_POINTS = 200_000  # poniżej tej liczby próbek do przeliczenia obliczenia są szybsze bez przełączania wątków
+    # Tryb out-of-core: sygnały zmapowane z dysku większe niż 1/8 limitu pamięci; okno próbek i przegląd liczone z limitu
+    DEFAULT_MEMORY_LIMIT_MB = 2048; WINDOW_BYTES_PER_SAMPLE = 64; OVERVIEW_BYTES_PER_BUCKET = 32
+    # Wielkość w widoku FFT: (wielkość SpectralEngine.relative albo None, etykieta osi Y, nazwa i jednostka w pasku stanu)
+    SPECTRUM_QUANTITIES = {"Amplituda": (None, "Amplituda FFT (a.u.)", ("Amplituda", "a.u.")),
+                           "Transmisja |S/S_ref|": ('transmission', "Transmisja |S/S_ref|", ("Transmisja", "")),
+                           "Faza arg(S/S_ref)": ('phase', "Faza względna (rad)", ("Faza", "rad"))}
+    # Eksport: format SignalExporter -> (pozycja menu, rozszerzenie pliku albo None dla katalogu); nagłówek kolumny widma wg wielkości
+    EXPORT_FORMATS = {'csv': ("CSV (katalog)...", None), 'npz': ("NumPy (.npz)...", ".npz"), 'columnar': ("Binarny kolumnowy (.dvcol)...", ".dvcol")}
+    EXPORT_SPECTRUM_COLUMNS = {None: "FFT Amplitude (a.u.)", 'transmission': "Transmission |S/S_ref|", 'phase': "Relative phase (rad)"}
+    EXPORT_PARALLEL_MIN_ROWS = 2_000_000  # poniżej start puli procesów formatujących CSV kosztuje więcej, niż oszczędza
     def __init__(self, root: tk.Tk):
+        init_start = time.perf_counter(); self.startup_timings: Dict[str, float] = {'importy': _IMPORT_SECONDS}
         self.root = root
         self._setup_logging()
         self.root.title("DaVisu v9.2")
@@ -75,30 +473,66 @@ class DataVisualizerApp:
         self.style = ttk.Style(self.root)
         self.style.theme_use('clam')
 
+        self._init_state()
+        self.perf.listeners.append(self._on_perf_record)
+        self.startup_timings['stan'] = time.perf_counter() - init_start
+
+        self._timed_startup_step('menu', self._create_menu)
+        self._timed_startup_step('układ okna', self._create_main_layout)
+        self._timed_startup_step('wykres', self._create_plot_area)
+        self._timed_startup_step('panel sterowania', self._create_control_panel_layout)
+        self._timed_startup_step('inicjalizacja wykresu', self._initialize_plot)
+        self._connect_events()
+        self._init_end = time.perf_counter(); self.root.after_idle(self._report_startup_times)
+        
+        logging.info("Aplikacja uruchomiona pomyślnie.")
+    def _init_state(self, cache_dir: str | None = None):
+        # Stan aplikacji bez widżetów (dane, historia, cache, zmienne kontrolek) - wspólny dla okna i trybu bez wyświetlacza (davisu_bench)
         self.history = HistoryManager(self)
-        self.smoothing_method_var = tk.StringVar(value="Moving Average")
-        self.smoothing_window_var = tk.IntVar(value=5)
+        self.smoothing_method_var = self._new_var(tk.StringVar, "Moving Average")
+        self.smoothing_window_var = self._new_var(tk.IntVar, 5)
         self.high_contrast_colors = ['#1f77b4', '#ff7f0e', '#2ca02c', '#d62728', '#9467bd', '#8c564b', '#e377c2', '#7f7f7f', '#bcbd22', '#17becf']
-        self.plotted_data: Dict[str, Dict[str, Any]] = {}
-        self.visibility_vars: Dict[str, tk.BooleanVar] = {}
+        self.plotted_data: Dict[str, Signal] = {}
+        self.datasets = DatasetIndex(); self.dataset_filter_var = self._new_var(tk.StringVar); self.dataset_list: DatasetList | None = None
         self._is_updating_ui = False
         self.excel_filepath = None
-        self.grid_visible_var = tk.BooleanVar(value=True)
-        self.grid_color_var = tk.StringVar(value="#cccccc")
-        self.grid_style_display_var = tk.StringVar(value="Kreskowana")
-        self.grid_style_internal_var = tk.StringVar(value="--")
-        self.grid_width_var = tk.DoubleVar(value=0.6)
+        self.grid_visible_var = self._new_var(tk.BooleanVar, True)
+        self.grid_color_var = self._new_var(tk.StringVar, "#cccccc")
+        self.grid_style_display_var = self._new_var(tk.StringVar, "Kreskowana")
+        self.grid_style_internal_var = self._new_var(tk.StringVar, "--")
+        self.grid_width_var = self._new_var(tk.DoubleVar, 0.6)
         self.markers: List[Any] = []; self.marker_text = None
-        self.data_canvas = None; self.chart_options_canvas = None; self.stats_canvas = None
-
-        self._create_menu()
-        self._create_main_layout()
-        self._create_plot_area()
-        self._create_control_panel_layout()
-        self._initialize_plot()
-        self._connect_events()
-        
-        logging.info("Aplikacja uruchomiona pomyślnie.")
+        self.chart_options_canvas = None; self.stats_canvas = None
+        self._draw_pending = False; self._plotted_as_fft = False
+        self._txt_loader: ParallelFileLoader | None = None; self._txt_load_state: Dict[str, Any] = {}
+        self._excel_loader: WorkbookLoader | None = None; self._excel_load_state: Dict[str, Any] = {}
+        self.dataset_cache = DatasetCache(cache_dir)
+        self._live: LiveAcquisition | None = None; self._live_buffers: Dict[str, RingBuffer] = {}; self.live_follow_var = self._new_var(tk.BooleanVar, True)
+        self.derived_cache = DerivedDataCache(); self.spectral_engine = SpectralEngine()
+        self._out_of_core: Dict[int, OutOfCoreSignal] = {}; self._ooc_windows: Dict[int, tuple] = {}; self._ooc_view = None; self._ooc_refresh_pending = False
+        self._set_memory_limit(int(os.environ.get('DAVISU_MEMORY_LIMIT_MB', self.DEFAULT_MEMORY_LIMIT_MB)))
+        self.fft_window_var = self._new_var(tk.StringVar, self.spectral_engine.window); self.fft_zero_pad_var = self._new_var(tk.BooleanVar, self.spectral_engine.zero_pad)
+        self.spectrum_quantity_var = self._new_var(tk.StringVar, "Amplituda")
+        # Stan kontrolek zakładek budowanych dopiero przy pierwszym wyświetleniu
+        self.active_signal_var = self._new_var(tk.StringVar); self.scale_entry_var = self._new_var(tk.StringVar, "1.0"); self.label_edit_var = self._new_var(tk.StringVar)
+        self.legend_visible_var = self._new_var(tk.BooleanVar, True); self.snap_cursor_var = self._new_var(tk.BooleanVar, False); self.show_fft_var = self._new_var(tk.BooleanVar, False)
+        self.stats_labels: Dict[str, tk.StringVar] = {"Max": self._new_var(tk.StringVar, "--"), "Min": self._new_var(tk.StringVar, "--"), "Pozycja Piku": self._new_var(tk.StringVar, "--"), "Średnia": self._new_var(tk.StringVar, "--")}
+        self.signal_selector = self.signal_selector_2 = None; self.log_scale_slider = None; self.fit_view_button = self.normalize_button = None; self.grid_color_preview = None
+        self._signal_labels: List[str] = []; self._pending_tabs: Dict[str, Any] = {}
+        self.compute = ComputeScheduler(self.root); self._redraw_followups: List[Any] = []
+        self.perf = PerformanceMonitor(); self.perf_tree = None; self._perf_refresh_pending = False
+        self.profiling_var = self._new_var(tk.BooleanVar, False); self.session_compress_var = self._new_var(tk.BooleanVar, False)
+        self.export_visible_only_var = self._new_var(tk.BooleanVar, True); self.export_spectra_var = self._new_var(tk.BooleanVar, True); self._export_job: ExportJob | None = None; self._export_state: Dict[str, Any] = {}
+    def _new_var(self, kind, value=None): return kind(self.root, value=value)
+    def _timed_startup_step(self, name: str, step):
+        start = time.perf_counter(); step(); self.startup_timings[name] = time.perf_counter() - start
+    def _report_startup_times(self):
+        # Wywoływane przy pierwszej bezczynności pętli Tk, czyli po pierwszym wyświetleniu okna
+        now = time.perf_counter(); self.startup_timings['pierwsze wyświetlenie'] = now - self._init_end
+        total = now - _IMPORT_START; self.startup_timings['pozostałe'] = max(total - sum(self.startup_timings.values()), 0.0)
+        breakdown = " | ".join(f"{name}: {seconds * 1000:.0f} ms" for name, seconds in self.startup_timings.items())
+        logging.info(f"Czas uruchamiania: {total:.2f} s ({breakdown})"); self.status_bar.config(text=f" Uruchomiono w {total:.2f} s")
+        self.perf.record("Uruchomienie", total, self.startup_timings)
 
     def _create_menu(self):
         menubar = tk.Menu(self.root)
@@ -108,6 +542,24 @@ class DataVisualizerApp:
         file_menu.add_command(label="Wczytaj plik(i) .txt", command=self.load_data_and_plot)
         file_menu.add_command(label="Wczytaj arkusze z .xlsx", command=self._load_excel_file)
         file_menu.add_separator()
+        file_menu.add_command(label="Zapisz sesję...", command=self.save_session)
+        file_menu.add_command(label="Wczytaj sesję...", command=self.load_session)
+        file_menu.add_checkbutton(label="Kompresuj zapis sesji", variable=self.session_compress_var)
+        file_menu.add_separator()
+        export_menu = tk.Menu(file_menu, tearoff=0); file_menu.add_cascade(label="Eksportuj dane", menu=export_menu)
+        for fmt, text in self.EXPORT_FORMATS.items(): export_menu.add_command(label=text[0], command=lambda fmt=fmt: self.export_data(fmt))
+        export_menu.add_separator()
+        export_menu.add_checkbutton(label="Tylko widoczne sygnały", variable=self.export_visible_only_var)
+        export_menu.add_checkbutton(label="Dołącz widma FFT", variable=self.export_spectra_var)
+        file_menu.add_separator()
+        file_menu.add_command(label="Tryb na żywo (śledź pliki)...", command=self.start_live_acquisition)
+        file_menu.add_command(label="Zatrzymaj tryb na żywo", command=self.stop_live_acquisition)
+        file_menu.add_checkbutton(label="Na żywo: śledź najnowsze dane", variable=self.live_follow_var)
+        file_menu.add_separator()
+        file_menu.add_command(label="Katalog cache danych...", command=self._choose_cache_directory)
+        file_menu.add_command(label="Wyczyść cache danych", command=self._clear_dataset_cache)
+        file_menu.add_command(label="Limit pamięci danych...", command=self._ask_memory_limit)
+        file_menu.add_separator()
         file_menu.add_command(label="Wyczyść wszystko", command=self.clear_plot)
         file_menu.add_separator()
         file_menu.add_command(label="Wyjdź", command=self.root.quit)
@@ -119,8 +571,7 @@ class DataVisualizerApp:
     def _create_plot_area(self):
         self.fig = Figure(figsize=(8, 6), dpi=100, constrained_layout=True)
         self.ax = self.fig.add_subplot(111)
-        self.crosshair_v = self.ax.axvline(0, color='gray', lw=0.8, linestyle='--', visible=False)
-        self.crosshair_h = self.ax.axhline(0, color='gray', lw=0.8, linestyle='--', visible=False)
+        self.plot_layer = PlotLayer(self.ax, self._compute_plot_xy, self._get_summary, self._lighten_color, self._derived_key, self._full_bounds)
         
         # ZMIANA: Modyfikacja sposobu pakowania dla lepszej responsywności
         toolbar_frame = ttk.Frame(self.plot_frame)
@@ -131,50 +582,55 @@ class DataVisualizerApp:
         
         self.toolbar = CustomNavigationToolbar(self.canvas, toolbar_frame)
         self.toolbar.update()
+        self.cursor = CrosshairCursor(self.root, self.canvas, self.ax, lambda text: self.status_bar.config(text=text), self._cursor_snap_source)
         
     # ... (reszta metod bez zmian aż do metod modyfikujących dane) ...
     def _create_control_panel_layout(self):
-        notebook = ttk.Notebook(self.control_frame)
+        # Zakładka danych jest budowana od razu; pozostałe przy pierwszym wyświetleniu (<<NotebookTabChanged>>)
+        self.notebook = notebook = ttk.Notebook(self.control_frame)
         notebook.pack(fill=tk.BOTH, expand=True, padx=5, pady=5)
-        data_tab = ttk.Frame(notebook); notebook.add(data_tab, text="Źródła Danych")
+        data_tab = ttk.Frame(notebook); notebook.add(data_tab, text="Źródła Danych"); self._build_data_tab(data_tab)
+        for text, builder in (("Opcje Wykresu", self._build_chart_options_tab), ("Statystyka i Przetwarzanie", self._build_stats_tab), ("Wydajność", self._build_performance_tab)):
+            tab = ttk.Frame(notebook); notebook.add(tab, text=text); self._pending_tabs[str(tab)] = (tab, builder)
+        notebook.bind("<<NotebookTabChanged>>", self._on_tab_changed)
+    def _on_tab_changed(self, event=None):
+        pending = self._pending_tabs.pop(self.notebook.select(), None)
+        if pending is None: return
+        start = time.perf_counter(); tab, builder = pending; builder(tab)
+        logging.info(f"Zbudowano zakładkę '{self.notebook.tab(tab, 'text')}' w {(time.perf_counter() - start) * 1000:.0f} ms.")
+    def _build_data_tab(self, data_tab):
         data_container = ttk.LabelFrame(data_tab, text="Wczytane Zbiory Danych", padding=10)
         data_container.pack(side=tk.TOP, fill='both', expand=True, padx=10, pady=(10, 5))
-        self.data_canvas = tk.Canvas(data_container, highlightthickness=0)
-        data_scrollbar = ttk.Scrollbar(data_container, orient="vertical", command=self.data_canvas.yview)
-        self.data_canvas.configure(yscrollcommand=data_scrollbar.set); data_scrollbar.pack(side=tk.RIGHT, fill='y')
-        self.data_canvas.pack(side=tk.LEFT, fill='both', expand=True); self.scrollable_data_frame = ttk.Frame(self.data_canvas)
-        self.scrollable_data_frame_id = self.data_canvas.create_window((0, 0), window=self.scrollable_data_frame, anchor="nw")
-        self.scrollable_data_frame.bind("<Configure>", lambda e: self._update_scroll_region(self.data_canvas))
-        self.data_canvas.bind('<Configure>', lambda e: self.data_canvas and self.data_canvas.itemconfig(self.scrollable_data_frame_id, width=e.width))
-        select_all_frame = ttk.Frame(self.scrollable_data_frame); select_all_frame.pack(fill=tk.X, pady=(0, 5))
+        select_all_frame = ttk.Frame(data_container); select_all_frame.pack(side=tk.TOP, fill=tk.X, pady=(0, 5))
         ttk.Button(select_all_frame, text="Zaznacz wszystkie", command=self._select_all_sheets).pack(side=tk.LEFT, expand=True, fill=tk.X, padx=(0,2))
         ttk.Button(select_all_frame, text="Odznacz wszystkie", command=self._deselect_all_sheets).pack(side=tk.LEFT, expand=True, fill=tk.X, padx=(2,0))
-        self.checkbox_container = ttk.Frame(self.scrollable_data_frame); self.checkbox_container.pack(fill='x')
-        self.initial_data_label = ttk.Label(self.checkbox_container, text="Nie wczytano żadnych danych.", wraplength=350); self.initial_data_label.pack(padx=5, pady=5)
+        self.dataset_list = DatasetList(data_container, self.datasets, self.dataset_filter_var, self._on_visibility_changed); self.dataset_list.pack(fill='both', expand=True)
         import_frame = ttk.LabelFrame(data_tab, text="Importuj / Zarządzaj", padding=10)
         import_frame.pack(side=tk.BOTTOM, fill=tk.X, padx=10, pady=(0, 10))
         ttk.Button(import_frame, text="Wczytaj dane z pliku .txt", command=self.load_data_and_plot).pack(fill=tk.X, pady=(0, 2))
         ttk.Button(import_frame, text="Wczytaj arkusze z pliku .xlsx", command=self._load_excel_file).pack(fill=tk.X, pady=(2, 2))
         ttk.Button(import_frame, text="Wyczyść wszystko", command=self.clear_plot).pack(fill=tk.X, pady=(2, 5))
-        chart_options_tab = ttk.Frame(notebook); notebook.add(chart_options_tab, text="Opcje Wykresu")
+    def _build_chart_options_tab(self, chart_options_tab):
         self.chart_options_canvas = tk.Canvas(chart_options_tab, highlightthickness=0)
         chart_opt_scrollbar = ttk.Scrollbar(chart_options_tab, orient="vertical", command=self.chart_options_canvas.yview)
         self.chart_options_canvas.configure(yscrollcommand=chart_opt_scrollbar.set); chart_opt_scrollbar.pack(side="right", fill="y"); self.chart_options_canvas.pack(side="left", fill="both", expand=True)
         chart_content_frame = ttk.Frame(self.chart_options_canvas); chart_content_frame_id = self.chart_options_canvas.create_window((0, 0), window=chart_content_frame, anchor="nw")
         chart_content_frame.bind("<Configure>", lambda e: self._update_scroll_region(self.chart_options_canvas)); self.chart_options_canvas.bind('<Configure>', lambda e: self.chart_options_canvas and self.chart_options_canvas.itemconfig(chart_content_frame_id, width=e.width))
         common_signal_frame_1 = ttk.LabelFrame(chart_content_frame, text="Aktywny Sygnał (Referencja)", padding=10); common_signal_frame_1.pack(side=tk.TOP, fill=tk.X, padx=10, pady=10)
-        self.active_signal_var = tk.StringVar(); self.signal_selector = ttk.Combobox(common_signal_frame_1, textvariable=self.active_signal_var, state='readonly')
+        self.signal_selector = ttk.Combobox(common_signal_frame_1, textvariable=self.active_signal_var, state='readonly', values=self._signal_labels)
         self.signal_selector.pack(fill=tk.X, pady=(0, 10)); self.signal_selector.bind("<<ComboboxSelected>>", self._on_signal_selected)
         edit_frame = ttk.LabelFrame(chart_content_frame, text="Edycja Wyglądu Sygnału", padding=10); edit_frame.pack(side=tk.TOP, fill=tk.X, padx=10, pady=10)
-        ttk.Label(edit_frame, text="Współczynnik skalowania:").pack(fill=tk.X, pady=(5, 0)); self.scale_entry_var = tk.StringVar(value="1.0"); scale_entry = ttk.Entry(edit_frame, textvariable=self.scale_entry_var)
+        ttk.Label(edit_frame, text="Współczynnik skalowania:").pack(fill=tk.X, pady=(5, 0)); scale_entry = ttk.Entry(edit_frame, textvariable=self.scale_entry_var)
         scale_entry.pack(fill=tk.X, pady=(0, 5)); scale_entry.bind("<Return>", self._update_from_entry); scale_entry.bind("<FocusOut>", self._update_from_entry)
         self.log_scale_slider = ttk.Scale(edit_frame, from_=-3.0, to=3.0, orient=tk.HORIZONTAL, command=self._update_from_slider); self.log_scale_slider.set(0.0); self.log_scale_slider.pack(fill=tk.X, pady=(0, 10))
-        ttk.Label(edit_frame, text="Nowa nazwa:").pack(anchor='w'); self.label_edit_var = tk.StringVar(); ttk.Entry(edit_frame, textvariable=self.label_edit_var).pack(fill=tk.X, pady=(0, 5))
+        ttk.Label(edit_frame, text="Nowa nazwa:").pack(anchor='w'); ttk.Entry(edit_frame, textvariable=self.label_edit_var).pack(fill=tk.X, pady=(0, 5))
         ttk.Button(edit_frame, text="Zmień etykietę", command=self._update_label).pack(fill=tk.X, pady=(0,5)); ttk.Button(edit_frame, text="Zmień kolor", command=self._change_active_plot_color).pack(fill=tk.X)
         plot_options_frame = ttk.LabelFrame(chart_content_frame, text="Opcje Wykresu", padding=10); plot_options_frame.pack(side=tk.TOP, fill=tk.X, padx=10, pady=(0, 10))
-        self.legend_visible_var = tk.BooleanVar(value=True); ttk.Checkbutton(plot_options_frame, text="Pokaż legendę", variable=self.legend_visible_var, command=self._toggle_legend_visibility).pack(anchor='w', pady=(0, 5))
+        ttk.Checkbutton(plot_options_frame, text="Pokaż legendę", variable=self.legend_visible_var, command=self._toggle_legend_visibility).pack(anchor='w', pady=(0, 5))
+        ttk.Checkbutton(plot_options_frame, text="Przyciągaj kursor do próbek aktywnego sygnału", variable=self.snap_cursor_var, command=self._toggle_cursor_snap).pack(anchor='w', pady=(0, 5))
         self.fit_view_button = ttk.Button(plot_options_frame, text="Dopasuj widok do danych", command=self.fit_view_to_data); self.fit_view_button.pack(fill=tk.X, pady=(0, 5))
         self.normalize_button = ttk.Button(plot_options_frame, text="Normalizuj Amplitudy", command=self.normalize_amplitudes); self.normalize_button.pack(fill=tk.X)
+        if self.show_fft_var.get(): self.fit_view_button.config(state='disabled'); self.normalize_button.config(state='disabled')
         grid_frame = ttk.LabelFrame(chart_content_frame, text="Ustawienia Siatki (Linii Pomocniczych)", padding=10); grid_frame.pack(side=tk.TOP, fill=tk.X, padx=10, pady=(0, 10))
         ttk.Checkbutton(grid_frame, text="Pokaż siatkę", variable=self.grid_visible_var, command=self._update_grid).pack(anchor='w')
         color_frame = ttk.Frame(grid_frame); color_frame.pack(fill=tk.X, pady=5); ttk.Button(color_frame, text="Zmień kolor", command=self._choose_grid_color).pack(side=tk.LEFT, expand=True, fill=tk.X, padx=(0, 5))
@@ -184,21 +640,21 @@ class DataVisualizerApp:
         self.grid_style_selector.bind("<<ComboboxSelected>>", lambda e: self._on_grid_style_selected(style_map)); self.grid_style_selector.pack(side=tk.RIGHT, expand=True, fill=tk.X)
         width_frame = ttk.Frame(grid_frame); width_frame.pack(fill=tk.X, pady=5); ttk.Label(width_frame, text="Grubość (0.1-5.0):").pack(side=tk.LEFT)
         ttk.Spinbox(width_frame, from_=0.1, to=5.0, increment=0.1, textvariable=self.grid_width_var, command=self._update_grid, wrap=True).pack(side=tk.RIGHT, expand=True, fill=tk.X)
-        stats_tab = ttk.Frame(notebook); notebook.add(stats_tab, text="Statystyka i Przetwarzanie")
+        plot_id = self._get_plot_id_from_active_signal(); self._update_scaling_ui(self.plotted_data[plot_id].scale_factor if plot_id else 1.0, update_entry=False)
+    def _build_stats_tab(self, stats_tab):
         self.stats_canvas = tk.Canvas(stats_tab, highlightthickness=0)
         stats_scrollbar = ttk.Scrollbar(stats_tab, orient="vertical", command=self.stats_canvas.yview)
         self.stats_canvas.configure(yscrollcommand=stats_scrollbar.set); stats_scrollbar.pack(side="right", fill="y"); self.stats_canvas.pack(side="left", fill="both", expand=True)
         stats_content_frame = ttk.Frame(self.stats_canvas); stats_content_frame_id = self.stats_canvas.create_window((0, 0), window=stats_content_frame, anchor="nw")
         stats_content_frame.bind("<Configure>", lambda e: self._update_scroll_region(self.stats_canvas)); self.stats_canvas.bind('<Configure>', lambda e: self.stats_canvas and self.stats_canvas.itemconfig(stats_content_frame_id, width=e.width))
         common_signal_frame_2 = ttk.LabelFrame(stats_content_frame, text="Aktywny Sygnał (Referencja)", padding=10); common_signal_frame_2.pack(side=tk.TOP, fill=tk.X, padx=10, pady=10)
-        self.signal_selector_2 = ttk.Combobox(common_signal_frame_2, textvariable=self.active_signal_var, state='readonly'); self.signal_selector_2.pack(fill=tk.X, pady=(0, 10))
+        self.signal_selector_2 = ttk.Combobox(common_signal_frame_2, textvariable=self.active_signal_var, state='readonly', values=self._signal_labels); self.signal_selector_2.pack(fill=tk.X, pady=(0, 10))
         self.signal_selector_2.bind("<<ComboboxSelected>>", self._on_signal_selected)
         stats_frame = ttk.LabelFrame(stats_content_frame, text="Statystyki Aktywnego Sygnału", padding=10); stats_frame.pack(side=tk.TOP, fill=tk.X, padx=10, pady=(0, 10))
-        self.stats_labels: Dict[str, tk.StringVar] = {"Max": tk.StringVar(value="--"), "Min": tk.StringVar(value="--"), "Pozycja Piku": tk.StringVar(value="--"), "Średnia": tk.StringVar(value="--")}
         for name, var in self.stats_labels.items(): f = ttk.Frame(stats_frame); f.pack(fill=tk.X); ttk.Label(f, text=f"{name}:").pack(side=tk.LEFT, padx=(0, 5)); ttk.Label(f, textvariable=var, anchor='e').pack(side=tk.RIGHT)
         processing_frame = ttk.LabelFrame(stats_content_frame, text="Przetwarzanie Sygnału", padding=10); processing_frame.pack(side=tk.TOP, fill=tk.X, padx=10, pady=(0, 10))
         smoothing_options_frame = ttk.Frame(processing_frame); smoothing_options_frame.pack(fill=tk.X, pady=5)
-        ttk.Label(smoothing_options_frame, text="Metoda:").pack(side=tk.LEFT, padx=(0,5)); smoothing_methods = ["Moving Average", "Savitzky-Golay", "Median Filter", "Gaussian Filter"]
+        ttk.Label(smoothing_options_frame, text="Metoda:").pack(side=tk.LEFT, padx=(0,5)); smoothing_methods = SMOOTHING_METHODS
         self.smoothing_combo = ttk.Combobox(smoothing_options_frame, textvariable=self.smoothing_method_var, values=smoothing_methods, state='readonly'); self.smoothing_combo.pack(side=tk.LEFT, expand=True, fill=tk.X)
         ttk.Label(smoothing_options_frame, text="Okno/Siła:").pack(side=tk.LEFT, padx=(10,5))
         vcmd = (self.root.register(self._validate_odd_int), '%P'); self.smoothing_spinbox = ttk.Spinbox(smoothing_options_frame, from_=1, to=101, increment=2, textvariable=self.smoothing_window_var, wrap=True, width=5, validate='key', validatecommand=vcmd)
@@ -210,17 +666,66 @@ class DataVisualizerApp:
         ttk.Button(smoothing_buttons_frame, text="Resetuj wygładzenie", command=self._reset_smoothing).pack(side=tk.LEFT, expand=True, fill=tk.X, padx=(0,2))
         ttk.Button(smoothing_buttons_frame, text="Zestaw z oryginałem", command=self._compare_all_with_original).pack(side=tk.LEFT, expand=True, fill=tk.X, padx=(2,0)) # ZMIANA: Nazwa przycisku
         ttk.Separator(processing_frame, orient=tk.HORIZONTAL).pack(fill=tk.X, pady=10)
-        self.show_fft_var = tk.BooleanVar(value=False); ttk.Checkbutton(processing_frame, text="Pokaż Transformację Fouriera (FFT)", variable=self.show_fft_var, command=self.toggle_fft_view).pack(anchor='w')
+        ttk.Checkbutton(processing_frame, text="Pokaż Transformację Fouriera (FFT)", variable=self.show_fft_var, command=self.toggle_fft_view).pack(anchor='w')
+        fft_options_frame = ttk.Frame(processing_frame); fft_options_frame.pack(fill=tk.X, pady=(5, 0)); ttk.Label(fft_options_frame, text="Okno FFT:").pack(side=tk.LEFT, padx=(0, 5))
+        fft_window_combo = ttk.Combobox(fft_options_frame, textvariable=self.fft_window_var, values=list(SpectralEngine.WINDOWS.keys()), state='readonly', width=10); fft_window_combo.pack(side=tk.LEFT)
+        fft_window_combo.bind("<<ComboboxSelected>>", self._on_fft_options_changed)
+        ttk.Checkbutton(fft_options_frame, text="Dopełnianie zerami", variable=self.fft_zero_pad_var, command=self._on_fft_options_changed).pack(side=tk.LEFT, padx=(10, 0))
+        quantity_frame = ttk.Frame(processing_frame); quantity_frame.pack(fill=tk.X, pady=(5, 0)); ttk.Label(quantity_frame, text="Widmo:").pack(side=tk.LEFT, padx=(0, 5))
+        quantity_combo = ttk.Combobox(quantity_frame, textvariable=self.spectrum_quantity_var, values=list(self.SPECTRUM_QUANTITIES.keys()), state='readonly'); quantity_combo.pack(side=tk.LEFT, fill=tk.X, expand=True)
+        quantity_combo.bind("<<ComboboxSelected>>", self._on_spectrum_quantity_changed)
         ttk.Button(processing_frame, text="Pokaż Histogram Amplitud", command=self._show_histogram).pack(fill=tk.X, pady=(10,0))
+    def _build_performance_tab(self, performance_tab):
+        timings_frame = ttk.LabelFrame(performance_tab, text="Czasy operacji [ms] (ostatnie pomiary)", padding=10); timings_frame.pack(side=tk.TOP, fill=tk.BOTH, expand=True, padx=10, pady=10)
+        columns = {'count': "N", 'mean': "Średnia", 'p50': "p50", 'p90': "p90", 'p99': "p99", 'max': "Max", 'last': "Ostatnia"}
+        self.perf_tree = ttk.Treeview(timings_frame, columns=list(columns.keys()), height=12); self.perf_tree.heading('#0', text="Operacja"); self.perf_tree.column('#0', width=130, stretch=True)
+        for column, heading in columns.items(): self.perf_tree.heading(column, text=heading); self.perf_tree.column(column, width=42, anchor='e', stretch=False)
+        self.perf_tree.pack(fill=tk.BOTH, expand=True)
+        self.perf_phases_var = tk.StringVar(value="--"); phases_frame = ttk.LabelFrame(performance_tab, text="Fazy ostatniej operacji", padding=10); phases_frame.pack(side=tk.TOP, fill=tk.X, padx=10, pady=(0, 10))
+        ttk.Label(phases_frame, textvariable=self.perf_phases_var, justify=tk.LEFT, wraplength=350).pack(anchor='w')
+        self.perf_memory_var = tk.StringVar(value="--"); memory_frame = ttk.LabelFrame(performance_tab, text="Pamięć", padding=10); memory_frame.pack(side=tk.TOP, fill=tk.X, padx=10, pady=(0, 10))
+        ttk.Label(memory_frame, textvariable=self.perf_memory_var, justify=tk.LEFT).pack(anchor='w')
+        profiling_frame = ttk.LabelFrame(performance_tab, text="Profilowanie", padding=10); profiling_frame.pack(side=tk.TOP, fill=tk.X, padx=10, pady=(0, 10))
+        ttk.Checkbutton(profiling_frame, text="Przechwytywanie cProfile + tracemalloc", variable=self.profiling_var, command=self._toggle_profiling).pack(anchor='w')
+        buttons_frame = ttk.Frame(profiling_frame); buttons_frame.pack(fill=tk.X, pady=(5, 0))
+        ttk.Button(buttons_frame, text="Odśwież", command=self._refresh_performance_panel).pack(side=tk.LEFT, expand=True, fill=tk.X, padx=(0, 2))
+        ttk.Button(buttons_frame, text="Wyczyść pomiary", command=self._clear_performance_records).pack(side=tk.LEFT, expand=True, fill=tk.X, padx=(2, 0))
+        self._refresh_performance_panel()
+    def _on_perf_record(self, record: Dict[str, Any]):
+        # Panel odświeżany najwyżej raz na przebieg pętli Tk, niezależnie od liczby zarejestrowanych operacji
+        if self.perf_tree is None or self._perf_refresh_pending: return
+        self._perf_refresh_pending = True; self.root.after_idle(self._refresh_performance_panel)
+    def _refresh_performance_panel(self):
+        self._perf_refresh_pending = False
+        if self.perf_tree is None: return
+        self.perf_tree.delete(*self.perf_tree.get_children())
+        for name, stats in sorted(self.perf.summary().items()):
+            self.perf_tree.insert('', tk.END, text=name, values=[stats['count']] + [f"{stats[key]:.1f}" for key in ('mean', 'p50', 'p90', 'p99', 'max', 'last')])
+        last = self.perf.records[-1] if self.perf.records else None
+        if last is not None:
+            phases = "\n".join(f"  {phase}: {seconds * 1000:.1f} ms" for phase, seconds in sorted(last['phases'].items(), key=lambda item: -item[1]))
+            self.perf_phases_var.set(f"{last['operation']}: {last['seconds'] * 1000:.1f} ms" + (f"\n{phases}" if phases else ""))
+        memory = self.perf.memory_usage(); cache = self.derived_cache.stats(); mb = 1024 ** 2
+        lines = [f"RSS procesu: {memory['rss_bytes'] / mb:.1f} MB" if 'rss_bytes' in memory else "RSS procesu: n/d"]
+        if 'peak_rss_bytes' in memory: lines.append(f"Szczytowe RSS: {memory['peak_rss_bytes'] / mb:.1f} MB")
+        if 'traced_bytes' in memory: lines.append(f"tracemalloc: {memory['traced_bytes'] / mb:.1f} MB (szczyt {memory['peak_traced_bytes'] / mb:.1f} MB)")
+        lines.append(f"Cache danych pochodnych: {cache['bytes'] / mb:.1f} MB, {cache['entries']} wpisów, trafienia {cache['hit_rate'] * 100:.0f}%")
+        lines.append(f"Historia: {self.history.current_bytes / 1024:.1f} kB, {len(self.history.undo_stack)} wpisów")
+        lines.append(f"Limit pamięci danych: {self.memory_limit / mb:.0f} MB, sygnały out-of-core: {len(self._out_of_core)} (przeglądy {sum(source.nbytes for source in self._out_of_core.values()) / mb:.1f} MB)")
+        self.perf_memory_var.set("\n".join(lines))
+    def _clear_performance_records(self): self.perf.records.clear(); self._refresh_performance_panel()
+    def _toggle_profiling(self):
+        if self.profiling_var.get(): self.perf.start_capture(); logging.info("Włączono przechwytywanie profilu (cProfile + tracemalloc)."); return
+        profile_path, report_path = self.perf.stop_capture(os.getcwd())
+        if profile_path: logging.info(f"Zapisano profil: {profile_path}, raport: {report_path}"); messagebox.showinfo("Profilowanie", f"Zapisano profil:\n{profile_path}\n\nRaport tekstowy:\n{report_path}")
+        self._refresh_performance_panel()
 
     # ... (cała reszta kodu jest identyczna jak w poprzedniej wersji i nie wymaga zmian)
     
     def _initialize_plot(self):
-        is_fft = self.show_fft_var.get()
-        x_label = "Częstotliwość (THz)" if is_fft else "Czas (ps)"; y_label = "Amplituda FFT (a.u.)" if is_fft else "Sygnał (a.u.)"
-        self.ax.set_xlabel(x_label); self.ax.set_ylabel(y_label)
+        x_label, y_label = self._axis_labels(self._current_domain()); self.ax.set_xlabel(x_label); self.ax.set_ylabel(y_label)
         self.ax.grid(self.grid_visible_var.get(), color=self.grid_color_var.get(), linestyle=self.grid_style_internal_var.get(), linewidth=self.grid_width_var.get())
-        self.canvas.draw_idle()
+        self._schedule_draw()
     def _setup_logging(self):
         log_formatter = logging.Formatter('%(asctime)s - %(levelname)s - %(message)s'); log_file = 'app_log.txt'
         file_handler = logging.FileHandler(log_file, mode='w', encoding='utf-8'); file_handler.setFormatter(log_formatter); file_handler.setLevel(logging.INFO)
@@ -232,9 +737,17 @@ class DataVisualizerApp:
         self.plot_frame = ttk.Frame(main_paned_window, width=1020); main_paned_window.add(self.plot_frame, stretch="always")
         self.control_frame = ttk.Frame(main_paned_window, width=420); main_paned_window.add(self.control_frame, stretch="never"); self.control_frame.pack_propagate(False)
         self.status_bar = ttk.Label(self.root, text=" Najechanie na wykres pokaże współrzędne", relief=tk.SUNKEN, anchor='w'); self.status_bar.pack(side=tk.BOTTOM, fill=tk.X)
+        self.progress_frame = ttk.Frame(self.root, padding=(5, 2)); self.progress_label = ttk.Label(self.progress_frame, anchor='w'); self.progress_label.pack(side=tk.LEFT, padx=(0, 5))
+        self.progress_cancel_button = ttk.Button(self.progress_frame, text="Anuluj"); self.progress_cancel_button.pack(side=tk.RIGHT)
+        self.progress_bar = ttk.Progressbar(self.progress_frame, orient=tk.HORIZONTAL, mode='determinate'); self.progress_bar.pack(side=tk.RIGHT, fill=tk.X, expand=True, padx=5)
+    def _show_progress(self, text: str, maximum: int, on_cancel):
+        self.progress_bar.config(maximum=max(maximum, 1), value=0); self.progress_label.config(text=text)
+        self.progress_cancel_button.config(command=on_cancel, state=tk.NORMAL); self.progress_frame.pack(side=tk.BOTTOM, fill=tk.X, before=self.status_bar)
+    def _update_progress(self, value: int, text: str): self.progress_bar.config(value=value); self.progress_label.config(text=text)
+    def _hide_progress(self): self.progress_frame.pack_forget()
     def update_edit_menu_state(self):
-        undo_state = tk.NORMAL if self.history.undo_stack else tk.DISABLED
-        redo_state = tk.NORMAL if self.history.redo_stack else tk.DISABLED
+        undo_state = tk.NORMAL if self.history.can_undo() else tk.DISABLED
+        redo_state = tk.NORMAL if self.history.can_redo() else tk.DISABLED
         if hasattr(self, 'edit_menu'):
             self.edit_menu.entryconfig("Cofnij (Ctrl+Z)", state=undo_state)
             self.edit_menu.entryconfig("Ponów (Ctrl+Y)", state=redo_state)
@@ -248,116 +761,291 @@ class DataVisualizerApp:
             light_r, light_g, light_b = int(r*(1-factor)+255*factor), int(g*(1-factor)+255*factor), int(b*(1-factor)+255*factor)
             return f'#{light_r:02x}{light_g:02x}{light_b:02x}'
         except Exception: return "#cccccc"
-    def redraw_all_plots(self):
-        xlim, ylim = None, None; view_preserved = False
-        if self.ax.has_data(): xlim, ylim = self.ax.get_xlim(), self.ax.get_ylim(); view_preserved = True
-        self.ax.cla(); self.crosshair_v = self.ax.axvline(0, color='gray', lw=0.8, linestyle='--', visible=False); self.crosshair_h = self.ax.axhline(0, color='gray', lw=0.8, linestyle='--', visible=False); self._clear_markers()
-        is_fft = self.show_fft_var.get(); sorted_plot_ids = sorted(self.plotted_data.keys())
-        for plot_id in sorted_plot_ids:
-            data = self.plotted_data[plot_id]
-            if not data.get('visible', False): continue
-            linestyle = '--' if data.get('is_comparison', False) else '-'
-            color = self._lighten_color(data['original_color']) if data.get('is_comparison', False) else data['color']
-            style_dict = {'color': color, 'linestyle': linestyle}
-            df, scale = data['df'], data['scale_factor']; label_text = f"{data['label']} (x{scale:.3f})"
-            x_data_original = df.iloc[:, 0].to_numpy(dtype=float); y_data_original = df.iloc[:, 1].to_numpy(dtype=float) * scale
-            y_data_to_plot = self._apply_smoothing(y_data_original, plot_id)
-            line_data_x, line_data_y = x_data_original, y_data_to_plot
-            if is_fft:
-                n_points = len(x_data_original)
-                if n_points > 1:
-                    time_step = float(np.mean(np.diff(x_data_original))) * 1e-12; yf, xf = fft(y_data_to_plot), fftfreq(n_points, time_step)
-                    positive_freq_indices = np.where(xf >= 0)[0]; xf_positive = xf[positive_freq_indices] / 1e12
-                    yf_positive_amp = 2.0/n_points * np.abs(np.asarray(yf[positive_freq_indices])); line_data_x, line_data_y = xf_positive, yf_positive_amp
-            line, = self.ax.plot(line_data_x, line_data_y, label=label_text, **style_dict); data['line'] = line
-        self._initialize_plot()
-        if self.legend_visible_var.get() and self.ax.has_data(): self.ax.legend()
-        if view_preserved and not is_fft and xlim is not None and ylim is not None: self.ax.set_xlim(xlim); self.ax.set_ylim(ylim)
-        elif is_fft:
-            if self.ax.has_data(): self.ax.set_xlim(left=0); self.ax.autoscale(enable=True, axis='y')
-        self.canvas.draw(); self._update_statistics_display()
-    def _apply_smoothing(self, y_data, plot_id):
-        data = self.plotted_data.get(plot_id)
-        if not data or not data.get('smoothed', False) or len(y_data) < 3: return y_data
-        try:
-            window = data.get('smoothing_window', self.smoothing_window_var.get())
-            method = data.get('smoothing_method', self.smoothing_method_var.get())
-            if method == "Gaussian Filter": sigma = max(1, window); return gaussian_filter1d(y_data, sigma=sigma)
-            if window < 3: return y_data
-            if method == "Moving Average": return pd.Series(y_data).rolling(window=window, center=True, min_periods=1).mean().to_numpy()
-            elif method == "Savitzky-Golay": poly_order = min(3, window - 1 if window > 3 else 1); return savgol_filter(y_data, window, poly_order)
-            elif method == "Median Filter": return median_filter(y_data, size=window)
+    @timed_operation("Odrysowanie")
+    def redraw_all_plots(self, then=None, background: bool = True):
+        # then: wywołanie po faktycznym odrysowaniu (np. dopasowanie widoku), także gdy dane liczone są w tle
+        domain = self._current_domain()
+        if then is not None: self._redraw_followups.append(then)
+        if background and self._derive_in_background(domain): return
+        is_fft = domain != 'time'; mode_changed = is_fft != self._plotted_as_fft
+        with self.perf.phase("przetwarzanie wsadowe"): self._prefetch_processed()
+        if is_fft:
+            with self.perf.phase("widma FFT"): self._prefetch_spectra(domain)
+        with self.perf.phase("synchronizacja linii"): data_changed = self.plot_layer.sync(self.plotted_data, domain)
+        with self.perf.phase("legenda i osie"):
+            self.plot_layer.update_legend(self.legend_visible_var.get())
+            if mode_changed or self.ax.get_ylabel() != self._axis_labels(domain)[1]: self._initialize_plot()
+            if self.plot_layer.visible_lines() and (mode_changed or (is_fft and data_changed)): self._autoscale_to_data(is_fft)
+        with self.perf.phase("poziom LOD"): self.plot_layer.refresh_view(); self._plotted_as_fft = is_fft
+        with self.perf.phase("znaczniki i statystyki"):
+            if len(self.markers) == 2: self._update_marker_calculations()
+            self._schedule_draw(); self._update_statistics_display()
+        followups, self._redraw_followups = self._redraw_followups, []
+        for callback in followups: callback()
+    def _derive_in_background(self, domain) -> bool:
+        # Brakujące dane pochodne widocznych sygnałów (przetworzony przebieg, widmo, indeks podsumowania) liczone są
+        # w wątku roboczym na migawce parametrów; odrysowanie nastąpi po powrocie wyników do wątku Tk
+        requests = []; reference = self._reference_job(domain)
+        for plot_id, data in self.plotted_data.items():
+            if not data.visible: continue
+            keys = {'time': self._derived_key(plot_id, data, 'time'), 'domain': self._derived_key(plot_id, data, domain), 'summary': self._derived_key(plot_id, data, ('summary', domain))}
+            if self.derived_cache.contains(keys['domain']) and self.derived_cache.contains(keys['summary']): continue
+            produce, n_samples, spec = self._processing_job(data, keys['time'])
+            requests.append((plot_id, produce, n_samples, keys, self.derived_cache.get(keys['time']), spec))
+        if sum(request[2] for request in requests) < self.BACKGROUND_MIN_POINTS: return False
+        self.status_bar.config(text=f" Przetwarzanie {len(requests)} sygnałów w tle...")
+        self.compute.submit('redraw', lambda is_cancelled: self._compute_derived(requests, domain, is_cancelled, reference), self._on_derived_computed)
+        return True
+    def _compute_derived(self, requests: List[tuple], domain, is_cancelled, reference: tuple | None = None):
+        # Wątek roboczy: tylko obliczenia na niezmiennych buforach, bez dostępu do Tk ani cache
+        start = time.perf_counter(); results = []; outputs = []
+        batch = [index for index, request in enumerate(requests) if request[4] is None and request[5] is not None]
+        batched = dict(zip(batch, self._process_batch([requests[index][5] for index in batch])))
+        for index, (plot_id, produce, _, keys, processed, _) in enumerate(requests):
+            if is_cancelled(): return None
+            if processed is None: processed = batched[index] if index in batched else produce(); results.append((keys['time'], processed))
+            outputs.append(processed)
+        if domain != 'time':
+            if is_cancelled(): return None
+            if reference is not None and reference[1] is None:
+                reference = (reference[0], self.spectral_engine.complex_transform([reference[2]()])[0]); results.append(reference)
+            outputs = self._transform_spectra(outputs, domain, reference[1] if reference is not None else None)
+            if self.spectral_engine.config_key() != domain[1:3]: return None  # ustawienia FFT zmieniono w trakcie obliczeń
+            results.extend((request[3]['domain'], spectrum) for request, spectrum in zip(requests, outputs))
+        for request, (x_out, y_out) in zip(requests, outputs):
+            if is_cancelled(): return None
+            results.append((request[3]['summary'], (SignalSummary(x_out, y_out),)))
+        return results, time.perf_counter() - start, len(requests)
+    def _on_derived_computed(self, outcome):
+        if outcome is None: return
+        results, seconds, count = outcome
+        for key, value in results:
+            data = self.plotted_data.get(key[0])
+            if data is not None and data.version == key[1]: self.derived_cache.put(key, value)
+        self.perf.record("Obliczenia w tle", seconds, signals=count); self.status_bar.config(text=CrosshairCursor.IDLE_TEXT)
+        self.redraw_all_plots(background=False)
+    def _current_domain(self): return self._spectrum_domain() if self.show_fft_var.get() else 'time'
+    def _spectrum_domain(self):
+        # Widmo względne zależy też od stanu referencji (aktywny sygnał): jej klucz przetworzonego przebiegu jest częścią domeny,
+        # więc zmiana jednej próbki unieważnia tylko jej wpisy, a zmiana referencji - wszystkie widma względne
+        domain = ('fft',) + self.spectral_engine.config_key(); quantity = self.SPECTRUM_QUANTITIES[self.spectrum_quantity_var.get()][0]
+        ref_plot_id = self._get_plot_id_from_active_signal() if quantity else None
+        if ref_plot_id is None: return domain
+        return domain + (quantity, self._derived_key(ref_plot_id, self.plotted_data[ref_plot_id], 'time'))
+    def _axis_labels(self, domain) -> tuple:
+        if domain == 'time': return "Czas (ps)", "Sygnał (a.u.)"
+        quantity = self.spectrum_quantity_var.get() if len(domain) > 3 else "Amplituda"; _, y_label, self.cursor.fft_quantity = self.SPECTRUM_QUANTITIES[quantity]
+        return "Częstotliwość (THz)", y_label
+    def _reference_job(self, domain) -> tuple | None:
+        # (klucz, zbuforowane widmo zespolone referencji albo None, obliczenie jej przetworzonego przebiegu) dla widma względnego
+        if domain == 'time' or len(domain) < 4: return None
+        ref_plot_id = domain[4][0]; data = self.plotted_data[ref_plot_id]; key = self._derived_key(ref_plot_id, data, ('reference',) + domain[1:3])
+        time_key = self._derived_key(ref_plot_id, data, 'time'); processed = self.derived_cache.get(time_key)
+        return key, self.derived_cache.get(key), (lambda: processed) if processed is not None else self._processing_job(data, time_key)[0]
+    def _reference_spectrum(self, domain) -> tuple | None:
+        reference = self._reference_job(domain)
+        if reference is None: return None
+        return self.derived_cache.get_or_compute(reference[0], lambda: self.spectral_engine.complex_transform([reference[2]()])[0])
+    def _transform_spectra(self, signals: List[tuple], domain, reference: tuple | None) -> List[tuple]:
+        # Widma amplitudowe albo jedna wsadowa transformacja zespolona i dzielenie przez widmo referencji na wspólnej siatce
+        if reference is None: return self.spectral_engine.transform(signals)
+        return self.spectral_engine.relative(self.spectral_engine.complex_transform(signals), reference, domain[3])
+    def _autoscale_to_data(self, is_fft: bool):
+        bounds = self.plot_layer.data_bounds()
+        if bounds is None: return
+        min_x, max_x, min_y, max_y = bounds; x_margin = (max_x - min_x) * 0.05 or 1; y_margin = (max_y - min_y) * 0.05 or 1
+        self.ax.set_xlim(0 if is_fft else min_x - x_margin, max_x + x_margin); self.ax.set_ylim(min_y - y_margin, max_y + y_margin)
+    def _compute_plot_xy(self, plot_id: str, data: Signal, domain):
+        return self._get_processed_signal(plot_id, data) if domain == 'time' else self._get_spectrum(plot_id, data, domain)
+    def _derived_key(self, plot_id: str, data: Signal, domain) -> tuple:
+        # Dla sygnałów out-of-core klucz zawiera okno próbek (start, stop, czy_próbki), więc każde okno ma własne wpisy
+        smoothed = data.smoothing_method is not None and data.smoothed
+        key = (plot_id, data.version, data.scale_factor, data.smoothing_method if smoothed else None, data.smoothing_window if smoothed else None, domain)
+        source = self._out_of_core_source(data)
+        return key if source is None else key + (self._out_of_core_window(data, source),)
+    def _get_processed_signal(self, plot_id: str, data: Signal):
+        key = self._derived_key(plot_id, data, 'time'); return self.derived_cache.get_or_compute(key, self._processing_job(data, key)[0])
+    def _processing_job(self, data: Signal, key: tuple):
+        # (obliczenie, liczba próbek, opis do przetwarzania wsadowego) przetworzonego przebiegu na migawce parametrów - bezpieczne
+        # w wątku roboczym; sygnał out-of-core przetwarzany jest tylko w oknie z klucza, z marginesem filtra, a szeroki widok pochodzi
+        # z obwiedni przeglądu, więc nie ma opisu wsadowego
+        process, method = self._processor(data); source = self._out_of_core_source(data); x_data, y_data = data.x, data.y
+        if source is None: return (lambda: (x_data, process(y_data))), y_data.size, (x_data, y_data, data.scale_factor, method, data.smoothing_window)
+        start, stop, samples = key[-1]
+        if samples: return functools.partial(source.window, start, stop, process, smoothing_margin(method, data.smoothing_window)), stop - start, None
+        return functools.partial(source.envelope, start, stop, data.scale_factor), 0, None
+    def _processor(self, data: Signal) -> tuple:
+        # (funkcja przetwarzania y na migawce parametrów, metoda wygładzania albo None)
+        smoothed = data.smoothed and data.smoothing_method is not None; method = data.smoothing_method if smoothed else None
+        return functools.partial(self._process_y, scale_factor=data.scale_factor, method=method, window=data.smoothing_window), method
+    def _process_batch(self, specs: List[tuple]) -> List[tuple]:
+        # specs: (x, y, scale_factor, metoda, okno); sygnały z tą samą metodą i oknem wygładzane są razem blokami 2D (smooth_batch),
+        # a przy błędzie filtra (np. okno dłuższe niż sygnał) grupa liczona jest pojedynczo jak dotąd
+        results: List[tuple | None] = [None] * len(specs); groups: Dict[tuple, List[int]] = {}
+        for index, (_, _, _, method, window) in enumerate(specs): groups.setdefault((method, window if method else None), []).append(index)
+        for (method, window), indices in groups.items():
+            try: outputs = smooth_batch([specs[i][1] for i in indices], method, window, [specs[i][2] for i in indices])
+            except Exception: outputs = [self._process_y(specs[i][1], specs[i][2], method, window) for i in indices]
+            for index, y_out in zip(indices, outputs): results[index] = (specs[index][0], y_out)
+        return results
+    def _prefetch_processed(self):
+        # Brakujące przetworzone przebiegi widocznych sygnałów liczone są jednym wywołaniem wsadowym zamiast osobno dla każdej linii
+        missing = []
+        for plot_id, data in self.plotted_data.items():
+            if not data.visible: continue
+            key = self._derived_key(plot_id, data, 'time')
+            if self.derived_cache.contains(key): continue
+            spec = self._processing_job(data, key)[2]
+            if spec is not None: missing.append((key, spec))
+        if len(missing) < 2: return
+        for (key, _), processed in zip(missing, self._process_batch([spec for _, spec in missing])): self.derived_cache.put(key, processed)
+    def _out_of_core_source(self, data: Signal) -> OutOfCoreSignal | None:
+        # Rozmiar buforów, a nie nbytes - widok (ślad porównawczy) nie zajmuje własnej pamięci, ale przetwarza dane rodzica
+        data_bytes = data.x.nbytes + data.y.nbytes
+        if data_bytes <= self.out_of_core_threshold or mapped_base(data.y) is None: return None
+        source = self._out_of_core.get(data.version)
+        if source is None:
+            with self.perf.operation("Indeks out-of-core", points=data.y.size):
+                source = self._out_of_core[data.version] = OutOfCoreSignal(data.x, data.y, self.memory_limit // 16 // self.OVERVIEW_BYTES_PER_BUCKET)
+            live_versions = {d.version for d in self.plotted_data.values()} | {data.version}
+            for version in [v for v in self._out_of_core if v not in live_versions]: del self._out_of_core[version]; self._ooc_windows.pop(version, None)
+            logging.info(f"Sygnał '{data.label}' ({data_bytes / 1024 ** 2:.0f} MB) w trybie out-of-core - przetwarzane jest tylko widoczne okno.")
+            if not source.x_sorted: logging.warning(f"Oś X sygnału '{data.label}' nie jest posortowana - okna obejmą cały sygnał (obwiednia).")
+        return source
+    def _out_of_core_window(self, data: Signal, source: OutOfCoreSignal) -> tuple:
+        # Okno próbek do przetworzenia: widoczny zakres osi X rozszerzony z obu stron o połowę szerokości (w granicach budżetu),
+        # więc przesuwanie i przybliżanie w jego obrębie nie wymaga ponownego odczytu. Widok szerszy niż budżet korzysta
+        # z obwiedni przeglądu; widmo FFT zawsze potrzebuje próbek, więc wtedy bierze pierwsze budżetowe próbki widoku.
+        x_min, x_max = self._ooc_view or (source.x_min, source.x_max); start, stop = source.index_range(x_min, x_max); budget = self.window_budget
+        window = self._ooc_windows.get(data.version); fits = stop - start <= budget
+        if window is None or not (window[0] <= start and stop <= window[1] and (window[2] or not fits)):
+            pad = (budget - (stop - start)) // 2 if fits else 0; pad = min(pad, (stop - start) // 2)
+            window = self._ooc_windows[data.version] = (max(start - pad, 0), min(stop + pad, len(source)), fits)
+        if not window[2] and self.show_fft_var.get(): return (window[0], min(window[0] + budget, window[1]), True)
+        return window
+    def _full_bounds(self, plot_id: str, data: Signal, domain):
+        source = self._out_of_core_source(data) if domain == 'time' else None
+        return source.bounds(data.scale_factor) if source is not None else None
+    def _set_memory_limit(self, limit_mb: int):
+        # Limit pamięci rezydentnej na dane: cache danych pochodnych (1/4), okna sygnałów out-of-core i ich przeglądy
+        self.memory_limit = max(int(limit_mb), 64) * 1024 ** 2; self.out_of_core_threshold = self.memory_limit // 8
+        self.window_budget = self.memory_limit // 4 // self.WINDOW_BYTES_PER_SAMPLE; self.derived_cache.resize(self.memory_limit // 4)
+        self._out_of_core.clear(); self._ooc_windows.clear()
+    def _ask_memory_limit(self):
+        limit_mb = simpledialog.askinteger("Limit pamięci danych", "Limit pamięci rezydentnej na dane (MB).\nSygnały większe niż 1/8 limitu są przetwarzane out-of-core - tylko widoczne okno.", initialvalue=self.memory_limit // 1024 ** 2, minvalue=64, parent=self.root)
+        if limit_mb is None: return
+        self._set_memory_limit(limit_mb); logging.info(f"Ustawiono limit pamięci danych: {limit_mb} MB (próg out-of-core {self.out_of_core_threshold / 1024 ** 2:.0f} MB, okno {self.window_budget} próbek).")
+        self.redraw_all_plots()
+    def _on_xlim_changed(self):
+        # Zmiana widoku w domenie czasu może wymagać nowego okna sygnałów out-of-core - przeliczane raz na cykl pętli Tk
+        self.plot_layer.refresh_view()
+        if self.show_fft_var.get(): return
+        self._ooc_view = self.ax.get_xlim()
+        if not self._out_of_core: return
+        if not self._ooc_refresh_pending: self._ooc_refresh_pending = True; self.root.after_idle(self._refresh_out_of_core_windows)
+    def _refresh_out_of_core_windows(self): self._ooc_refresh_pending = False; self.redraw_all_plots()
+    @staticmethod
+    def _process_y(y_data: np.ndarray, scale_factor: float, method: str | None, window: int) -> np.ndarray:
+        y_data = y_data * scale_factor if scale_factor != 1.0 else y_data
+        if method is None: return y_data
+        try: return apply_smoothing(y_data, method, window)
         except Exception: return y_data
-        return y_data
+    def _get_summary(self, plot_id: str, data: Signal, domain) -> SignalSummary:
+        # Indeks podsumowania (ekstrema, średnia, pik, granice, agregaty blokowe) liczony raz na wersję danych i przetwarzania
+        return self.derived_cache.get_or_compute(self._derived_key(plot_id, data, ('summary', domain)), lambda: (SignalSummary(*self._compute_plot_xy(plot_id, data, domain)),))[0]
+    def _get_spectrum(self, plot_id: str, data: Signal, domain):
+        return self.derived_cache.get_or_compute(self._derived_key(plot_id, data, domain), lambda: self._transform_spectra([self._get_processed_signal(plot_id, data)], domain, self._reference_spectrum(domain))[0])
+    def _prefetch_spectra(self, domain):
+        # Widma wszystkich widocznych sygnałów bez wpisu w cache liczone są jedną wsadową transformacją
+        missing = [(self._derived_key(pid, data, domain), pid, data) for pid, data in self.plotted_data.items() if data.visible]
+        missing = [item for item in missing if not self.derived_cache.contains(item[0])]
+        if len(missing) < 2: return
+        spectra = self._transform_spectra([self._get_processed_signal(pid, data) for _, pid, data in missing], domain, self._reference_spectrum(domain))
+        for (key, _, _), spectrum in zip(missing, spectra): self.derived_cache.put(key, spectrum)
+    def _schedule_draw(self):
+        # Zbiera wszystkie zmiany z bieżącego wywołania Tk i wysyła jedno draw_idle na całą paczkę
+        if self._draw_pending: return
+        self._draw_pending = True; self.root.after_idle(self._flush_draw)
+    def _flush_draw(self):
+        # Wywoływane z after_idle, więc rysowanie synchroniczne jest równoważne draw_idle i daje się zmierzyć
+        self._draw_pending = False
+        with self.perf.operation("Rysowanie wykresu"): self.canvas.draw()
     def _add_or_update_data(self, plot_id: str, df: pd.DataFrame, label: str):
         if plot_id in self.plotted_data: return False
-        load_index = len([pid for pid in self.plotted_data if not self.plotted_data[pid].get('is_comparison', False)])
-        initial_color = self.high_contrast_colors[load_index % len(self.high_contrast_colors)]
-        self.plotted_data[plot_id] = {'df': df, 'line': None, 'scale_factor': 1.0, 'label': label, 'visible': True, 'color': initial_color, 'original_color': initial_color, 'smoothed': False}
-        var = tk.BooleanVar(value=True); self.visibility_vars[plot_id] = var
-        if self.initial_data_label.winfo_exists(): self.initial_data_label.pack_forget()
-        cb = ttk.Checkbutton(self.checkbox_container, text=label, variable=var, command=lambda pid=plot_id: self._on_visibility_changed(pid)); cb.pack(anchor='w', fill='x', padx=5)
+        initial_color = self.high_contrast_colors[len(self.datasets) % len(self.high_contrast_colors)]
+        self.plotted_data[plot_id] = Signal.from_frame(df, label, initial_color)
+        self._register_dataset(plot_id)
         return True
-    def _on_visibility_changed(self, plot_id: str):
-        if plot_id in self.plotted_data and plot_id in self.visibility_vars: 
-            is_visible = self.visibility_vars[plot_id].get(); logging.info(f"Zmiana widoczności dla '{self.plotted_data[plot_id]['label']}' na {is_visible}")
-            self.plotted_data[plot_id]['visible'] = is_visible; self._update_combobox(); self.redraw_all_plots()
+    def _register_dataset(self, plot_id: str):
+        # Uaktualnia indeksy zbiorów po dodaniu, usunięciu albo zmianie etykiety/widoczności sygnału; lista odświeża się raz na cykl pętli Tk
+        self.datasets.sync(plot_id, self.plotted_data.get(plot_id))
+        if self.dataset_list is not None: self.dataset_list.refresh()
+    def _on_history_restored(self, plot_ids):
+        # Po cofnięciu/ponowieniu synchronizuje indeksy zbiorów danych dla sygnałów z delty i odświeża wykres
+        for plot_id in plot_ids: self._register_dataset(plot_id)
+        self.redraw_all_plots(); self._update_combobox(); self.update_edit_menu_state()
+    def _on_visibility_changed(self, plot_id: str, is_visible: bool):
+        if plot_id in self.plotted_data:
+            logging.info(f"Zmiana widoczności dla '{self.plotted_data[plot_id].label}' na {is_visible}")
+            self.plotted_data[plot_id].visible = is_visible; self._register_dataset(plot_id); self._update_combobox(); self.redraw_all_plots()
+    @timed_operation("Wygładzanie aktywnego")
     def _apply_smoothing_to_active(self):
         plot_id = self._get_plot_id_from_active_signal()
         if not plot_id: messagebox.showwarning("Brak danych", "Proszę wybrać aktywny sygnał do wygładzenia."); return
         self.history.save_state("Wygładź aktywny")
-        logging.info(f"Stosowanie wygładzania do: {self.plotted_data[plot_id]['label']}")
-        data = self.plotted_data[plot_id]; data['smoothed'] = True
-        data['smoothing_window'] = self.smoothing_window_var.get(); data['smoothing_method'] = self.smoothing_method_var.get()
+        logging.info(f"Stosowanie wygładzania do: {self.plotted_data[plot_id].label}")
+        data = self.plotted_data[plot_id]; data.smoothed = True
+        data.smoothing_window = self.smoothing_window_var.get(); data.smoothing_method = self.smoothing_method_var.get()
         self.redraw_all_plots()
+    @timed_operation("Wygładzanie wszystkich")
     def _apply_smoothing_to_all(self):
         self.history.save_state("Wygładź wszystkie")
         logging.info("Stosowanie wygładzania do wszystkich widocznych sygnałów.")
         any_smoothed = False
         for plot_id, data in self.plotted_data.items():
-            if data.get('visible', False) and not data.get('is_comparison', False):
-                data['smoothed'] = True; data['smoothing_window'] = self.smoothing_window_var.get(); data['smoothing_method'] = self.smoothing_method_var.get()
+            if data.visible and not data.is_comparison:
+                data.smoothed = True; data.smoothing_window = self.smoothing_window_var.get(); data.smoothing_method = self.smoothing_method_var.get()
                 any_smoothed = True
         if any_smoothed: self.redraw_all_plots()
         else: messagebox.showinfo("Informacja", "Brak widocznych sygnałów do wygładzenia.")
+    @timed_operation("Reset wygładzania")
     def _reset_smoothing(self):
         self.history.save_state("Resetuj wygładzenie")
         logging.info("Resetowanie wygładzania dla wszystkich sygnałów.")
-        comparison_keys = [pid for pid, data in self.plotted_data.items() if data.get('is_comparison', False)]
-        for key in comparison_keys: del self.plotted_data[key]
-        for data in self.plotted_data.values(): data['smoothed'] = False
+        comparison_keys = [pid for pid, data in self.plotted_data.items() if data.is_comparison]
+        for key in comparison_keys: del self.plotted_data[key]; self.derived_cache.invalidate(key)
+        for data in self.plotted_data.values(): data.smoothed = False
         self.redraw_all_plots(); self._update_combobox()
+    @timed_operation("Zestaw z oryginałem")
     def _compare_all_with_original(self):
         self.history.save_state("Zestaw wszystkie z oryginałem")
         logging.info("Tworzenie porównań dla wszystkich wygładzonych i widocznych sygnałów.")
         any_compared = False
         for plot_id, data in list(self.plotted_data.items()):
-            if data.get('visible', False) and data.get('smoothed', False) and not data.get('is_comparison', False):
+            if data.visible and data.smoothed and not data.is_comparison:
                 comparison_id = f"{plot_id}_comparison"
                 if comparison_id not in self.plotted_data:
-                    comparison_data = copy.deepcopy(data); comparison_data['label'] = f"{data['label']} (oryg.)"
-                    comparison_data['smoothed'] = False; comparison_data['is_comparison'] = True; comparison_data['visible'] = True
-                    self.plotted_data[comparison_id] = comparison_data; any_compared = True
+                    self.plotted_data[comparison_id] = data.derive(label=f"{data.label} (oryg.)", smoothed=False, is_comparison=True, visible=True); any_compared = True
         if any_compared: self.redraw_all_plots()
         else: messagebox.showinfo("Informacja", "Brak widocznych i wygładzonych sygnałów do porównania.")
     def clear_plot(self):
         self.history.save_state("Wyczyść wszystko")
         logging.info("Czyszczenie wykresu i wszystkich danych.")
-        self.ax.cla(); self.plotted_data.clear(); self.visibility_vars.clear(); self._clear_markers()
-        self.crosshair_v = self.ax.axvline(0, color='gray', lw=0.8, linestyle='--', visible=False); self.crosshair_h = self.ax.axhline(0, color='gray', lw=0.8, linestyle='--', visible=False)
+        for loader in (self._txt_loader, self._excel_loader):
+            if loader is not None: loader.cancel()
+        self.stop_live_acquisition(); self.compute.cancel('redraw'); self._redraw_followups.clear()
+        logging.info(f"Statystyki cache danych pochodnych: {self.derived_cache.stats()}"); self.derived_cache.clear()
+        self.plot_layer.clear(); self.plotted_data.clear(); self.datasets.clear(); self._clear_markers()
+        self._out_of_core.clear(); self._ooc_windows.clear(); self._ooc_view = None
         self._clear_data_ui()
-        self.signal_selector['values'] = []; self.signal_selector_2['values'] = []
+        self._set_signal_labels([])
         self._on_signal_selected(); self.legend_visible_var.set(True)
         if self.show_fft_var.get(): self.show_fft_var.set(False)
-        self.toggle_fft_view(initial_clear=True); self.root.update_idletasks()
-        self.history.undo_stack.clear(); self.history.redo_stack.clear(); self.update_edit_menu_state()
+        self.toggle_fft_view(initial_clear=True); self._plotted_as_fft = False; self._initialize_plot(); self.root.update_idletasks()
+        self.history.clear(); self.update_edit_menu_state()
     def _clear_data_ui(self):
-        for widget in self.scrollable_data_frame.winfo_children(): widget.destroy()
-        select_all_frame = ttk.Frame(self.scrollable_data_frame); select_all_frame.pack(fill=tk.X, pady=(0, 5))
-        ttk.Button(select_all_frame, text="Zaznacz wszystkie", command=self._select_all_sheets).pack(side=tk.LEFT, expand=True, fill=tk.X, padx=(0,2))
-        ttk.Button(select_all_frame, text="Odznacz wszystkie", command=self._deselect_all_sheets).pack(side=tk.LEFT, expand=True, fill=tk.X, padx=(2,0))
-        self.checkbox_container = ttk.Frame(self.scrollable_data_frame); self.checkbox_container.pack(fill='x')
-        self.initial_data_label = ttk.Label(self.checkbox_container, text="Nie wczytano żadnych danych.", wraplength=280); self.initial_data_label.pack(padx=5, pady=5)
+        self.dataset_filter_var.set('')
+        if self.dataset_list is not None: self.dataset_list.refresh(reset=True)
         self.excel_filepath = None
     def _load_excel_file(self):
         filepath = filedialog.askopenfilename(title="Wybierz plik Excel", filetypes=(("Pliki Excel", "*.xlsx"), ("Wszystkie pliki", "*.*")))
@@ -367,99 +1055,290 @@ class DataVisualizerApp:
         self._process_excel_file()
     def _process_excel_file(self):
         if not self.excel_filepath or not os.path.exists(self.excel_filepath): return
-        try:
-            xls = pd.ExcelFile(self.excel_filepath); sheet_names = xls.sheet_names
-            if not sheet_names: messagebox.showwarning("Pusty Plik", f"Plik '{os.path.basename(self.excel_filepath)}' jest pusty."); return
-            new_files_loaded = False
-            for sheet_name in sheet_names:
-                plot_id = f"excel_{self.excel_filepath}_{sheet_name}"
-                df = pd.read_excel(self.excel_filepath, sheet_name=sheet_name)
-                if len(df.columns) < 2: continue
-                if self._add_or_update_data(plot_id, df, str(sheet_name)): new_files_loaded = True
-            if new_files_loaded:
-                self._update_combobox()
-                self._redraw_and_fit(f"Dopasowano widok po wczytaniu arkuszy z '{os.path.basename(self.excel_filepath)}'.")
-        except Exception as e: logging.error(f"Błąd podczas wczytywania Excela '{self.excel_filepath}': {e}", exc_info=True); messagebox.showerror("Błąd wczytywania Excela", f"Nie można odczytać pliku '{self.excel_filepath}'.\n\nBłąd: '{e}'")
+        if self._excel_loader is not None: messagebox.showinfo("Wczytywanie w toku", "Poprzedni skoroszyt jest jeszcze wczytywany."); return
+        filepath = self.excel_filepath; self._excel_load_state = {'filepath': filepath, 'new_files_loaded': False, 'sheet_count': 0, 'start': time.perf_counter()}
+        self._excel_loader = WorkbookLoader(self.root, filepath, self._on_excel_sheets_loaded, self._on_excel_load_progress, self._on_excel_load_done, self.dataset_cache)
+        self._show_progress(f"Wczytywanie arkuszy z '{os.path.basename(filepath)}'", 1, self._excel_loader.cancel); self._excel_loader.start()
+    def _on_excel_sheets_loaded(self, batch):
+        state = self._excel_load_state; state['sheet_count'] += len(batch)
+        for sheet_name, df in batch:
+            if df is None: continue
+            if self._add_or_update_data(f"excel_{state['filepath']}_{sheet_name}", df, str(sheet_name)): state['new_files_loaded'] = True
+    def _on_excel_load_progress(self, done: int, total: int):
+        self.progress_bar.config(maximum=max(total, 1)); self._update_progress(done, f"Wczytywanie arkuszy z '{os.path.basename(self._excel_load_state['filepath'])}' ({done}/{total})")
+    def _on_excel_load_done(self, cancelled: bool):
+        state, loader = self._excel_load_state, self._excel_loader; self._excel_loader = None; self._hide_progress(); filename = os.path.basename(state['filepath'])
+        self.perf.record("Wczytywanie .xlsx", time.perf_counter() - state['start'], sheets=state['sheet_count'], cancelled=cancelled)
+        if cancelled: logging.info(f"Anulowano wczytywanie skoroszytu '{filename}'.")
+        if loader.error is not None:
+            logging.error(f"Błąd podczas wczytywania Excela '{state['filepath']}': {loader.error}", exc_info=loader.error)
+            messagebox.showerror("Błąd wczytywania Excela", f"Nie można odczytać pliku '{state['filepath']}'.\n\nBłąd: '{loader.error}'")
+        elif loader.total == 0: messagebox.showwarning("Pusty Plik", f"Plik '{filename}' jest pusty.")
+        if state['new_files_loaded']:
+            self._update_combobox()
+            self._redraw_and_fit(f"Dopasowano widok po wczytaniu arkuszy z '{filename}'.")
     def load_data_and_plot(self):
+        if self._txt_loader is not None: messagebox.showinfo("Wczytywanie w toku", "Poprzednie wczytywanie plików jeszcze trwa."); return
         filepaths = filedialog.askopenfilenames(title="Wybierz pliki z danymi", filetypes=(("Pliki tekstowe", "*.txt"), ("Wszystkie pliki", "*.*")))
         if not filepaths: logging.info("Nie wczytano żadnych plików do wczytania."); return
         self.history.save_state("Wczytaj pliki TXT")
-        logging.info(f"Wybrano do wczytania pliki: {filepaths}"); new_files_loaded, last_loaded_label, skipped_files = False, None, []
+        logging.info(f"Wybrano do wczytania pliki: {filepaths}")
+        self._txt_load_state = {'new_files_loaded': False, 'last_loaded_label': None, 'skipped_files': [], 'errors': [], 'start': time.perf_counter(), 'files': len(filepaths)}
+        self._txt_loader = ParallelFileLoader(self.root, filepaths, self._read_txt_file_cached, self._on_txt_files_loaded, self._on_txt_load_progress, self._on_txt_load_done)
+        self._show_progress(f"Wczytywanie plików .txt (0/{len(filepaths)})", len(filepaths), self._txt_loader.cancel); self._txt_loader.start()
+    def start_live_acquisition(self):
+        filepaths = filedialog.askopenfilenames(title="Wybierz pliki pomiarowe do śledzenia", filetypes=(("Pliki tekstowe", "*.txt"), ("Wszystkie pliki", "*.*")))
+        if not filepaths: return
+        capacity = simpledialog.askinteger("Tryb na żywo", "Pojemność bufora na sygnał (liczba próbek):", initialvalue=self.LIVE_BUFFER_CAPACITY, minvalue=100, maxvalue=50_000_000, parent=self.root)
+        if capacity is None: return
+        import pandas as pd
+        self.stop_live_acquisition(); self.history.save_state("Tryb na żywo")
+        sources: Dict[str, str] = {}; self._live_buffers.clear()
         for filepath in filepaths:
-            plot_id = f"manual_{filepath}"
-            try:
-                df = pd.read_csv(filepath, sep=r'\s+', comment='#', header=None, skiprows=1, engine='python')
-                if df.empty or df.shape[1] < 2: continue
-                if df.shape[1] >= 3: df = df.iloc[:, :3]
-                df.columns = ['Time (ps)', 'Rad THz', 'Rad Time'][:df.shape[1]]; df = df.apply(pd.to_numeric, errors='coerce').dropna()
-                if df.empty: continue
-                label, last_loaded_label = os.path.basename(filepath), os.path.basename(filepath)
-                if self._add_or_update_data(plot_id, df, label): new_files_loaded = True
-            except Exception as e: logging.error(f"Błąd wczytywania pliku {os.path.basename(filepath)}: {e}", exc_info=True); messagebox.showerror(f"Błąd wczytywania pliku {os.path.basename(filepath)}", f"Wystąpił błąd: {e}")
-        if new_files_loaded:
+            plot_id = f"live_{filepath}"; label = f"{os.path.basename(filepath)} [na żywo]"; sources[plot_id] = filepath
+            self._add_or_update_data(plot_id, pd.DataFrame({'Time (ps)': [], 'Rad THz': []}), label)
+            self._live_buffers[plot_id] = RingBuffer(capacity)
+        logging.info(f"Tryb na żywo: śledzenie {len(sources)} plików, bufor {capacity} próbek na sygnał.")
+        self._live = LiveAcquisition(self.root, sources, self._on_live_samples, self._on_live_error, max_fps=self.LIVE_MAX_FPS); self._live.start()
+        self._update_combobox(); self.redraw_all_plots(); self.update_edit_menu_state()
+    def stop_live_acquisition(self):
+        if self._live is None: return
+        self._live.stop(); self._live = None
+        totals = {pid: buffer.total_appended for pid, buffer in self._live_buffers.items()}; self._live_buffers.clear()
+        logging.info(f"Zatrzymano tryb na żywo. Odebrane próbki: {totals}")
+    def _on_live_samples(self, updates: Dict[str, list]):
+        # Dane sygnału są podmieniane na migawkę bufora; warstwa wykresu odświeża tylko linie o zmienionej wersji
+        changed = False
+        for plot_id, chunks in updates.items():
+            data = self.plotted_data.get(plot_id); buffer = self._live_buffers.get(plot_id)
+            if data is None or buffer is None: continue
+            for samples, reset in chunks:
+                if reset: buffer.clear(); logging.info(f"Plik '{plot_id[5:]}' został skrócony lub nadpisany - rozpoczęto nowy pomiar.")
+                buffer.append(samples)
+            data.set_data(*buffer.snapshot()); changed = True
+        if not changed: return
+        follow = self.live_follow_var.get() and not self.show_fft_var.get()
+        self.redraw_all_plots(then=self.fit_view_to_data if follow else None)
+    def _on_live_error(self, plot_id: str, error: Exception):
+        logging.error(f"Tryb na żywo: błąd odczytu '{plot_id[5:]}': {error}"); self.status_bar.config(text=f" Tryb na żywo: błąd odczytu {os.path.basename(plot_id[5:])}: {error}")
+    def _read_txt_file_cached(self, filepath: str) -> pd.DataFrame | None:
+        # Wywoływane w wątkach roboczych puli wczytującej; pliki większe niż próg out-of-core są konwertowane strumieniowo do kolumn na dysku
+        cached = self.dataset_cache.load(filepath)
+        if cached is not None: return cached[0][1]
+        if os.path.getsize(filepath) > self.out_of_core_threshold:
+            converted = self.dataset_cache.convert_txt(filepath)
+            if converted: return converted[0][1]
+        df = read_txt_file(filepath); self.dataset_cache.store(filepath, [('', df)])
+        return df
+    def _choose_cache_directory(self):
+        directory = filedialog.askdirectory(title="Wybierz katalog cache danych", initialdir=self.dataset_cache.cache_dir)
+        if directory: self.dataset_cache.cache_dir = directory; logging.info(f"Zmieniono katalog cache danych na: {directory}")
+    def _clear_dataset_cache(self):
+        if messagebox.askyesno("Wyczyść cache danych", f"Usunąć wszystkie pliki z katalogu cache:\n{self.dataset_cache.cache_dir}?"):
+            self.dataset_cache.clear(); logging.info("Wyczyszczono cache danych.")
+    def save_session(self):
+        if not self.plotted_data: messagebox.showinfo("Zapis sesji", "Brak danych do zapisania."); return
+        filepath = filedialog.asksaveasfilename(title="Zapisz sesję", defaultextension=".davisu", filetypes=(("Sesje DaVisu", "*.davisu"), ("Wszystkie pliki", "*.*")))
+        if not filepath: return
+        try:
+            with self.perf.operation("Zapis sesji", signals=len(self.plotted_data)):
+                state, arrays = self._session_state(); SessionFile.save(filepath, state, arrays, compress=self.session_compress_var.get())
+        except (OSError, ValueError) as e: logging.error(f"Błąd zapisu sesji '{filepath}': {e}"); messagebox.showerror("Błąd zapisu sesji", str(e)); return
+        logging.info(f"Zapisano sesję ({len(self.plotted_data)} sygnałów, {len(arrays)} tablic): {filepath}"); self.status_bar.config(text=f" Zapisano sesję: {os.path.basename(filepath)}")
+    def load_session(self):
+        filepath = filedialog.askopenfilename(title="Wczytaj sesję", filetypes=(("Sesje DaVisu", "*.davisu"), ("Wszystkie pliki", "*.*")))
+        if not filepath: return
+        try:
+            with self.perf.operation("Wczytanie sesji"): state, arrays = SessionFile.load(filepath); self._restore_session(state, arrays)
+        except (OSError, ValueError, KeyError) as e: logging.error(f"Błąd wczytywania sesji '{filepath}': {e}"); messagebox.showerror("Błąd wczytywania sesji", str(e)); return
+        logging.info(f"Wczytano sesję ({len(self.plotted_data)} sygnałów): {filepath}"); self.status_bar.config(text=f" Wczytano sesję: {os.path.basename(filepath)}")
+    def export_data(self, fmt: str):
+        # Eksport przetworzonych sygnałów (skala, wygładzanie), widm w bieżących ustawieniach FFT i statystyk - w tle, z postępem
+        if self._export_job is not None: messagebox.showinfo("Eksport w toku", "Poprzedni eksport jeszcze trwa."); return
+        plot_ids = [pid for pid in self.datasets.order() if self.plotted_data[pid].visible or not self.export_visible_only_var.get()]
+        if not plot_ids: messagebox.showinfo("Eksport danych", "Brak sygnałów do eksportu."); return
+        extension = self.EXPORT_FORMATS[fmt][1]
+        if extension is None: path = filedialog.askdirectory(title="Wybierz katalog eksportu", mustexist=False)
+        else: path = filedialog.asksaveasfilename(title="Eksportuj dane", defaultextension=extension, filetypes=((f"Pliki {extension}", f"*{extension}"), ("Wszystkie pliki", "*.*")))
+        if not path: return
+        domain = self._spectrum_domain() if self.export_spectra_var.get() else None
+        spectrum_column = self.EXPORT_SPECTRUM_COLUMNS[domain[3] if domain is not None and len(domain) > 3 else None]
+        parallel = fmt == 'csv' and sum(len(self.plotted_data[pid].x) for pid in plot_ids) >= self.EXPORT_PARALLEL_MIN_ROWS
+        try: exporter = SignalExporter(fmt, path, spectrum_columns=('Frequency (THz)', spectrum_column), workers=min(os.cpu_count() or 1, 8) if parallel else 1)
+        except OSError as e: logging.error(f"Błąd eksportu do '{path}': {e}"); messagebox.showerror("Błąd eksportu", str(e)); return
+        self._export_state = {'path': path, 'fmt': fmt, 'signals': len(plot_ids), 'start': time.perf_counter()}
+        self._export_job = ExportJob(self.root, exporter, self._export_items(plot_ids, domain), self._on_export_progress, self._on_export_done)
+        logging.info(f"Eksport {len(plot_ids)} sygnałów ({fmt}) do '{path}'.")
+        self._show_progress(f"Eksport danych (0/{len(plot_ids)})", len(plot_ids) + 1, self._export_job.cancel); self._export_job.start()
+    def _export_items(self, plot_ids: List[str], domain) -> List[tuple]:
+        # (etykieta, przygotowanie w wątku roboczym, parametry) na migawce parametrów; wyniki obecne już w cache (przebiegi
+        # i widma policzone do wykresu) są używane bez ponownego liczenia, a widmo referencji liczone jest raz dla całego eksportu
+        reference = self._reference_job(domain) if domain is not None else None; reference_cache: Dict[str, Any] = {}
+        def reference_spectrum():
+            if reference is None: return None
+            if 'value' not in reference_cache: reference_cache['value'] = reference[1] if reference[1] is not None else self.spectral_engine.complex_transform([reference[2]()])[0]
+            return reference_cache['value']
+        items = []
+        for plot_id in plot_ids:
+            data = self.plotted_data[plot_id]; process, method = self._processor(data)
+            info = {'scale_factor': data.scale_factor, 'smoothing': f"{method} ({data.smoothing_window})" if method else ''}
+            source = self._out_of_core_source(data)
+            if source is not None:
+                if domain is not None: logging.info(f"Eksport '{data.label}': sygnał out-of-core - zapisywany oknami, bez widma.")
+                margin = smoothing_margin(method, data.smoothing_window)
+                items.append((data.label, lambda source=source, process=process, margin=margin: (source.x, lambda start, stop: source.window(start, stop, process, margin)[1], None), info)); continue
+            processed = self.derived_cache.get(self._derived_key(plot_id, data, 'time'))
+            spectrum = self.derived_cache.get(self._derived_key(plot_id, data, domain)) if domain is not None else None
+            items.append((data.label, functools.partial(self._prepare_export, data.x, data.y, process, processed, spectrum, domain, reference_spectrum), info))
+        return items
+    def _prepare_export(self, x_data, y_data, process, processed, spectrum, domain, reference_spectrum) -> tuple:
+        # Wątek roboczy eksportu: bez dostępu do Tk ani cache
+        x_out, y_out = processed if processed is not None else (x_data, process(y_data))
+        if spectrum is None and domain is not None: spectrum = self._transform_spectra([(x_out, y_out)], domain, reference_spectrum())[0]
+        return x_out, (lambda start, stop: y_out[start:stop]), spectrum
+    def _on_export_progress(self, done: int, total: int):
+        count = self._export_state['signals']; self._update_progress(done, f"Eksport danych ({min(done, count)}/{count})")
+    def _on_export_done(self, cancelled: bool):
+        state, job = self._export_state, self._export_job; self._export_job = None; self._hide_progress(); seconds = time.perf_counter() - state['start']
+        self.perf.record("Eksport danych", seconds, signals=state['signals'], format=state['fmt'], cancelled=cancelled)
+        if cancelled: logging.info("Anulowano eksport danych."); self.status_bar.config(text=" Anulowano eksport danych."); return
+        if job.error is not None:
+            logging.error(f"Błąd eksportu do '{state['path']}': {job.error}", exc_info=job.error); messagebox.showerror("Błąd eksportu", f"Nie można zapisać '{state['path']}'.\n\nBłąd: '{job.error}'"); return
+        logging.info(f"Wyeksportowano {state['signals']} sygnałów do '{state['path']}' w {seconds:.2f} s.")
+        self.status_bar.config(text=f" Wyeksportowano {state['signals']} sygnałów: {os.path.basename(state['path'])} ({seconds:.1f} s)")
+    def _session_state(self):
+        # Metadane obszaru roboczego + tablice danych; bufory współdzielone zapisywane są raz, a widoki (ślady porównawcze)
+        # tylko jako parametry i identyfikator sygnału nadrzędnego
+        arrays: Dict[str, np.ndarray] = {}; names: Dict[int, str] = {}; signals = []; plot_ids = {id(data): pid for pid, data in self.plotted_data.items()}
+        def array_name(array):
+            if id(array) not in names: names[id(array)] = f"a{len(arrays)}"; arrays[names[id(array)]] = array
+            return names[id(array)]
+        for plot_id, data in self.plotted_data.items():
+            parent_id = plot_ids.get(id(data.parent)) if isinstance(data, SignalView) else None
+            if parent_id is not None: signals.append({'plot_id': plot_id, 'parent': parent_id, 'params': data.params()}); continue
+            signals.append({'plot_id': plot_id, 'x': array_name(data.x), 'y': array_name(data.y), 'columns': list(data.columns), 'params': {**data.params(), 'scale_factor': data.scale_factor}})
+        options = {'grid_visible': self.grid_visible_var.get(), 'grid_color': self.grid_color_var.get(), 'grid_style_display': self.grid_style_display_var.get(), 'grid_style': self.grid_style_internal_var.get(),
+                   'grid_width': self.grid_width_var.get(), 'legend_visible': self.legend_visible_var.get(), 'snap_cursor': self.snap_cursor_var.get(), 'show_fft': self.show_fft_var.get(),
+                   'fft_window': self.fft_window_var.get(), 'fft_zero_pad': self.fft_zero_pad_var.get(), 'spectrum_quantity': self.spectrum_quantity_var.get(), 'smoothing_method': self.smoothing_method_var.get(), 'smoothing_window': self.smoothing_window_var.get()}
+        state = {'signals': signals, 'active_signal': self.active_signal_var.get(), 'markers': [float(marker['x']) for marker in self.markers], 'options': options,
+                 'view': {'xlim': [float(v) for v in self.ax.get_xlim()], 'ylim': [float(v) for v in self.ax.get_ylim()]}}
+        return state, arrays
+    def _restore_session(self, state: Dict[str, Any], arrays: Dict[str, np.ndarray]):
+        # Zastępuje obszar roboczy zapisaną sesją: bufory z pliku (bez kopiowania), parametry, opcje i znaczniki, a na końcu jedno odrysowanie
+        for loader in (self._txt_loader, self._excel_loader):
+            if loader is not None: loader.cancel()
+        self.stop_live_acquisition(); self.compute.cancel('redraw'); self._redraw_followups.clear(); self.derived_cache.clear()
+        self.plot_layer.clear(); self.plotted_data.clear(); self.datasets.clear(); self._clear_markers()
+        self._out_of_core.clear(); self._ooc_windows.clear(); self._ooc_view = None; self._clear_data_ui()
+        options = state['options']
+        self.grid_visible_var.set(options['grid_visible']); self.grid_color_var.set(options['grid_color']); self.grid_style_display_var.set(options['grid_style_display'])
+        self.grid_style_internal_var.set(options['grid_style']); self.grid_width_var.set(options['grid_width']); self.legend_visible_var.set(options['legend_visible'])
+        self.snap_cursor_var.set(options['snap_cursor']); self.cursor.snap_enabled = options['snap_cursor']; self.show_fft_var.set(options['show_fft'])
+        self.smoothing_method_var.set(options['smoothing_method']); self.smoothing_window_var.set(options['smoothing_window'])
+        self.fft_window_var.set(options['fft_window']); self.fft_zero_pad_var.set(options['fft_zero_pad']); self.spectrum_quantity_var.set(options.get('spectrum_quantity', "Amplituda"))
+        self.spectral_engine.window = options['fft_window']; self.spectral_engine.zero_pad = options['fft_zero_pad']
+        if self.grid_color_preview is not None: self.grid_color_preview.config(bg=options['grid_color'])
+        for entry in sorted(state['signals'], key=lambda entry: 'parent' in entry):
+            params = entry['params']
+            if 'parent' in entry: data = self.plotted_data[entry['parent']].derive(**params)
+            else: data = Signal(arrays[entry['x']], arrays[entry['y']], params['label'], params['color'], tuple(entry['columns'])); data.update(params)
+            self.plotted_data[entry['plot_id']] = data
+            self._register_dataset(entry['plot_id'])
+        self.history.clear(); self.update_edit_menu_state(); self.toggle_fft_view(initial_clear=True); self._initialize_plot()
+        self._update_combobox()
+        if state['active_signal'] in self._signal_labels: self.active_signal_var.set(state['active_signal']); self._on_signal_selected()
+        xlim, ylim = state['view']['xlim'], state['view']['ylim']
+        self._plotted_as_fft = options['show_fft']; self.ax.set_xlim(*xlim); self.ax.set_ylim(*ylim)
+        if not options['show_fft']:
+            for x in state['markers'][-2:]: self._add_marker(x)
+        self.redraw_all_plots(then=lambda: (self.ax.set_xlim(*xlim), self.ax.set_ylim(*ylim)))
+    def _on_txt_files_loaded(self, batch):
+        state = self._txt_load_state
+        for filepath, df, error in batch:
+            label = os.path.basename(filepath)
+            if error is not None: logging.error(f"Błąd wczytywania pliku {label}: {error}", exc_info=error); state['errors'].append(f"{label}: {error}"); continue
+            if df is None: state['skipped_files'].append(label); continue
+            state['last_loaded_label'] = label
+            if self._add_or_update_data(f"manual_{filepath}", df, label): state['new_files_loaded'] = True
+    def _on_txt_load_progress(self, done: int, total: int): self._update_progress(done, f"Wczytywanie plików .txt ({done}/{total})")
+    def _on_txt_load_done(self, cancelled: bool):
+        state = self._txt_load_state; self._txt_loader = None; self._hide_progress()
+        self.perf.record("Wczytywanie .txt", time.perf_counter() - state['start'], files=state['files'], cancelled=cancelled)
+        if cancelled: logging.info("Anulowano wczytywanie plików .txt.")
+        if state['new_files_loaded']:
             self._update_combobox()
-            if last_loaded_label: self.active_signal_var.set(last_loaded_label); self._on_signal_selected()
+            if state['last_loaded_label']: self.active_signal_var.set(state['last_loaded_label']); self._on_signal_selected()
             self._redraw_and_fit("Automatycznie dopasowano widok po wczytaniu plików .txt.")
-        if skipped_files: messagebox.showinfo("Pominięto pliki", "Następujące pliki zostały pominięte:\n\n" + "\n".join(skipped_files))
+        if state['errors']: messagebox.showerror("Błąd wczytywania plików", "Wystąpiły błędy:\n\n" + "\n".join(state['errors']))
+        if state['skipped_files']: messagebox.showinfo("Pominięto pliki", "Następujące pliki zostały pominięte:\n\n" + "\n".join(state['skipped_files']))
     def _validate_odd_int(self, value_if_allowed): return value_if_allowed.isdigit() or value_if_allowed == ""
     def _show_histogram(self):
         plot_id = self._get_plot_id_from_active_signal()
         if not plot_id: messagebox.showwarning("Brak danych", "Proszę wybrać aktywny sygnał."); return
-        hist_window = tk.Toplevel(self.root); hist_window.title(f"Histogram: {self.plotted_data[plot_id]['label']}"); hist_window.geometry("600x450")
+        hist_window = tk.Toplevel(self.root); hist_window.title(f"Histogram: {self.plotted_data[plot_id].label}"); hist_window.geometry("600x450")
         fig = Figure(figsize=(6, 4), dpi=100, constrained_layout=True); ax = fig.add_subplot(111)
-        data = self.plotted_data[plot_id]; y_data = data['df'].iloc[:, 1].to_numpy(dtype=float) * data['scale_factor']; y_data = self._apply_smoothing(y_data, plot_id)
-        ax.hist(y_data, bins='auto', color=data['color'], alpha=0.75)
+        data = self.plotted_data[plot_id]; _, y_data = self._get_processed_signal(plot_id, data)
+        ax.hist(y_data, bins='auto', color=data.color, alpha=0.75)
         ax.set_title("Rozkład wartości amplitudy"); ax.set_xlabel("Amplituda (a.u.)"); ax.set_ylabel("Liczba wystąpień"); ax.grid(True, linestyle='--', alpha=0.6)
         canvas = FigureCanvasTkAgg(fig, master=hist_window); canvas.draw(); canvas.get_tk_widget().pack(fill=tk.BOTH, expand=True)
     def _connect_events(self): 
+        self.ax.callbacks.connect('xlim_changed', lambda ax: self._on_xlim_changed()); self.fig.canvas.mpl_connect('resize_event', lambda event: self.plot_layer.refresh_view())
         self.fig.canvas.mpl_connect('motion_notify_event', self._on_mouse_move); self.fig.canvas.mpl_connect('axes_leave_event', self._on_mouse_leave); self.fig.canvas.mpl_connect('button_press_event', self._on_plot_click)
         self.root.bind('<Control-z>', lambda event: self.history.undo())
         self.root.bind('<Control-y>', lambda event: self.history.redo())
-    def _on_mouse_move(self, event):
-        if not event.inaxes: self.crosshair_v.set_visible(False); self.crosshair_h.set_visible(False); self.status_bar.config(text=" Najechanie na wykres pokaże współrzędne"); self.canvas.draw_idle(); return
-        self.crosshair_v.set_data([event.xdata, event.xdata], [0, 1]); self.crosshair_h.set_data([0, 1], [event.ydata, event.ydata]); self.crosshair_v.set_visible(True); self.crosshair_h.set_visible(True)
-        self.status_bar.config(text=f" Czas: {event.xdata:,.3f} ps  |  Sygnał: {event.ydata:,.5f} a.u."); self.canvas.draw_idle()
-    def _on_mouse_leave(self, event): self.crosshair_v.set_visible(False); self.crosshair_h.set_visible(False); self.status_bar.config(text=" Najechanie na wykres pokaże współrzędne"); self.canvas.draw_idle()
+    def _on_mouse_move(self, event): self.cursor.on_move(event)
+    def _on_mouse_leave(self, event): self.cursor.on_leave(event)
+    def _cursor_snap_source(self):
+        plot_id = self._get_plot_id_from_active_signal()
+        if not plot_id: return None
+        domain = self._current_domain(); return self._get_summary(plot_id, self.plotted_data[plot_id], domain), domain != 'time'
+    def _toggle_cursor_snap(self):
+        self.cursor.snap_enabled = self.snap_cursor_var.get(); logging.info(f"Przyciąganie kursora do próbek: {self.cursor.snap_enabled}")
     def _on_plot_click(self, event):
         if not event.inaxes or self.show_fft_var.get(): return
         if event.button == 2:
             if len(self.markers) >= 2: oldest_marker = self.markers.pop(0); oldest_marker['line'].remove(); oldest_marker['text'].remove()
-            line = self.ax.axvline(event.xdata, color='red', linestyle=':', linewidth=1.5); text = self.ax.text(event.xdata, self.ax.get_ylim()[1], f" {len(self.markers)+1}", color='red', va='bottom', ha='left')
-            self.markers.append({'line': line, 'text': text, 'x': event.xdata}); self._update_marker_calculations()
+            self._add_marker(event.xdata); self._update_marker_calculations()
         elif event.button == 3: self.history.save_state("Wyczyść znaczniki"); self._clear_markers()
-        self.canvas.draw_idle()
+        self._schedule_draw()
+    def _add_marker(self, x: float):
+        line = self.ax.axvline(x, color='red', linestyle=':', linewidth=1.5); text = self.ax.text(x, self.ax.get_ylim()[1], f" {len(self.markers)+1}", color='red', va='bottom', ha='left')
+        self.markers.append({'line': line, 'text': text, 'x': x})
     def _clear_markers(self):
         for marker in self.markers: marker['line'].remove(); marker['text'].remove()
         self.markers.clear();
         if self.marker_text: self.marker_text.remove(); self.marker_text = None
-        self.canvas.draw_idle()
+        self._schedule_draw()
     def _update_marker_calculations(self):
         if self.marker_text: self.marker_text.remove(); self.marker_text = None
         if len(self.markers) == 2:
             m1_x, m2_x = self.markers[0]['x'], self.markers[1]['x']; delta_t = abs(m2_x - m1_x); plot_id = self._get_plot_id_from_active_signal(); delta_y_text = "n/a"
+            integral_text = peak_text = "n/a"
             if plot_id and plot_id in self.plotted_data:
-                data = self.plotted_data[plot_id]; x_data = data['df'].iloc[:, 0].to_numpy(dtype=float); y_data = data['df'].iloc[:, 1].to_numpy(dtype=float) * data['scale_factor']; y_data = self._apply_smoothing(y_data, plot_id)
-                idx1, idx2 = np.argmin(np.abs(x_data - m1_x)), np.argmin(np.abs(x_data - m2_x))
-                delta_y = abs(y_data[idx2] - y_data[idx1]); delta_y_text = f"{float(delta_y):,.5f} a.u."
-            text_content = f"Δt = {float(delta_t):,.3f} ps\nΔy = {delta_y_text}"
+                range_stats = self._get_summary(plot_id, self.plotted_data[plot_id], 'time').range_summary(m1_x, m2_x)
+                if range_stats is not None:
+                    delta_y_text = f"{range_stats['delta_y']:,.5f} a.u."; integral_text = f"{range_stats['integral']:,.5g} a.u.·ps"
+                    peak_text = f"{range_stats['peak_value']:,.5f} a.u. @ {range_stats['peak_position']:,.3f} ps"
+            text_content = f"Δt = {float(delta_t):,.3f} ps\nΔy = {delta_y_text}\n∫y dt = {integral_text}\nPik = {peak_text}"
             self.marker_text = self.ax.text(0.98, 0.98, text_content, transform=self.ax.transAxes, fontsize=10, va='top', ha='right', bbox=dict(boxstyle='round,pad=0.5', fc='wheat', alpha=0.8))
     def _update_statistics_display(self):
         plot_id = self._get_plot_id_from_active_signal()
         if not plot_id or self.show_fft_var.get():
             for var in self.stats_labels.values(): var.set("--")
             return
-        data = self.plotted_data[plot_id]; x_data = data['df'].iloc[:, 0].to_numpy(dtype=float); y_data = data['df'].iloc[:, 1].to_numpy(dtype=float) * data['scale_factor']; y_data = self._apply_smoothing(y_data, plot_id)
-        if y_data.size > 0:
-            max_val, min_val, mean_val = np.max(y_data), np.min(y_data), np.mean(y_data); peak_time = x_data[np.argmax(np.abs(y_data))]
-            self.stats_labels["Max"].set(f"{float(max_val):.5f}"); self.stats_labels["Min"].set(f"{float(min_val):.5f}"); self.stats_labels["Pozycja Piku"].set(f"{float(peak_time):.3f} ps"); self.stats_labels["Średnia"].set(f"{float(mean_val):.5f}")
+        stats = self._get_summary(plot_id, self.plotted_data[plot_id], 'time').statistics()
+        if stats is not None:
+            self.stats_labels["Max"].set(f"{stats['max']:.5f}"); self.stats_labels["Min"].set(f"{stats['min']:.5f}"); self.stats_labels["Pozycja Piku"].set(f"{stats['peak_position']:.3f} ps"); self.stats_labels["Średnia"].set(f"{stats['mean']:.5f}")
         else:
             for var in self.stats_labels.values(): var.set("--")
     def _select_all_sheets(self, select=True):
-        if not self.visibility_vars: logging.info("Brak danych do zaznaczenia."); return
+        # Przy aktywnym filtrze dotyczy tylko zbiorów pasujących do filtra
+        plot_ids = list(self.datasets.matching(self.dataset_filter_var.get()))
+        if not plot_ids: logging.info("Brak danych do zaznaczenia."); return
         self.history.save_state("Zaznacz/Odznacz wszystkie")
-        logging.info(f"Zaznaczanie wszystkich danych: {select}")
-        for plot_id, var in self.visibility_vars.items():
-             var.set(select); self.plotted_data[plot_id]['visible'] = select
+        logging.info(f"Zaznaczanie danych ({len(plot_ids)}): {select}")
+        for plot_id in plot_ids: self.plotted_data[plot_id].visible = select; self._register_dataset(plot_id)
+        self._update_combobox()
         self._redraw_and_fit(f"Dopasowano widok po zaznaczeniu/odznaczeniu wszystkich danych.")
     def _deselect_all_sheets(self): self._select_all_sheets(select=False)
     def _on_grid_style_selected(self, style_map: Dict[str, str]):
@@ -468,31 +1347,34 @@ class DataVisualizerApp:
     def _update_grid(self, event=None):
         if self.grid_visible_var.get(): self.ax.grid(True, color=self.grid_color_var.get(), linestyle=self.grid_style_internal_var.get(), linewidth=self.grid_width_var.get())
         else: self.ax.grid(False)
-        self.canvas.draw_idle()
+        self._schedule_draw()
     def _choose_grid_color(self):
         color_code = colorchooser.askcolor(title="Wybierz kolor siatki", initialcolor=self.grid_color_var.get())
         if color_code and color_code[1]: self.grid_color_var.set(color_code[1]); self.grid_color_preview.config(bg=color_code[1]); self._update_grid()
+    def _max_amplitude(self, data: Signal) -> float:
+        # Dla sygnału out-of-core z przeglądu min/max, bez odczytu całego pliku
+        source = self._out_of_core_source(data)
+        if source is not None: return source.max_abs
+        return float(np.max(np.abs(data.y))) if data.y.size else 0.0
+    @timed_operation("Normalizacja amplitud")
     def normalize_amplitudes(self):
         self.history.save_state("Normalizuj amplitudy")
         logging.info("Rozpoczęto normalizację amplitud.")
         if self.show_fft_var.get(): logging.warning("Próba normalizacji w widoku FFT."); messagebox.showinfo("Informacja", "Normalizacja jest dostępna tylko w trybie domeny czasu."); return
         ref_plot_id = self._get_plot_id_from_active_signal()
         if not ref_plot_id: logging.warning("Normalizacja przerwana - brak sygnału ref."); messagebox.showwarning("Brak Referencji", "Proszę wybrać sygnał referencyjny."); return
-        ref_label = self.plotted_data[ref_plot_id]['label']; logging.info(f"Sygnał referencyjny: '{ref_label}'")
-        ref_y_raw = self.plotted_data[ref_plot_id]['df'].iloc[:, 1].to_numpy(dtype=float)
-        if ref_y_raw.size == 0: logging.error(f"Sygnał referencyjny '{ref_label}' nie zawiera danych."); messagebox.showwarning("Błąd Danych", f"Sygnał referencyjny '{ref_label}' nie zawiera danych."); return
-        max_ref_amp = np.max(np.abs(ref_y_raw))
+        ref_label = self.plotted_data[ref_plot_id].label; logging.info(f"Sygnał referencyjny: '{ref_label}'")
+        ref_data = self.plotted_data[ref_plot_id]
+        if ref_data.y.size == 0: logging.error(f"Sygnał referencyjny '{ref_label}' nie zawiera danych."); messagebox.showwarning("Błąd Danych", f"Sygnał referencyjny '{ref_label}' nie zawiera danych."); return
+        max_ref_amp = self._max_amplitude(ref_data)
         if max_ref_amp == 0: logging.warning(f"Sygnał referencyjny '{ref_label}' ma zerową amplitudę."); messagebox.showwarning("Błąd", "Sygnał referencyjny ma zerową amplitudę."); return
-        visible_plots = {pid: d for pid, d in self.plotted_data.items() if d.get('visible', False) and not d.get('is_comparison')}
+        visible_plots = {pid: d for pid, d in self.plotted_data.items() if d.visible and not d.is_comparison}
         if len(visible_plots) < 2: logging.info("Normalizacja niewymagana - < 2 wykresy."); messagebox.showinfo("Informacja", "Potrzebne są co najmniej dwa widoczne wykresy."); return
         for plot_id, data in visible_plots.items():
-            if plot_id == ref_plot_id: data['scale_factor'] = 1.0; continue
-            current_y_raw = data['df'].iloc[:, 1].to_numpy(dtype=float)
-            if current_y_raw.size == 0: logging.warning(f"Wykres '{data['label']}' nie zawiera danych."); data['scale_factor'] = 1.0; continue
-            max_current_amp = np.max(np.abs(current_y_raw))
-            if max_current_amp > 0: data['scale_factor'] = float(max_ref_amp / max_current_amp)
-            else: data['scale_factor'] = 1.0
-            logging.info(f"Znormalizowano '{data['label']}' z współczynnikiem {data['scale_factor']:.4f}")
+            if plot_id == ref_plot_id: data.scale_factor = 1.0; continue
+            if data.y.size == 0: logging.warning(f"Wykres '{data.label}' nie zawiera danych.")
+            max_amp = self._max_amplitude(data); data.scale_factor = float(max_ref_amp / max_amp) if max_amp > 0 else 1.0
+            logging.info(f"Znormalizowano '{data.label}' z współczynnikiem {data.scale_factor:.4f}")
         self._on_signal_selected(); self.redraw_all_plots(); logging.info("Normalizacja zakończona.")
     def _update_from_slider(self, log_value_str: str):
         if self._is_updating_ui: return
@@ -508,93 +1390,97 @@ class DataVisualizerApp:
             self._update_scaling_ui(scale_factor, update_entry=False); self._apply_scaling_to_plot(scale_factor, save_history=False)
         except (ValueError, TclError): messagebox.showerror("Błąd wartości", "Proszę wprowadzić prawidłową liczbę dodatnią.")
         finally: self._is_updating_ui = False
+    @timed_operation("Zmiana skali")
     def _apply_scaling_to_plot(self, scale_factor: float, save_history=True):
         if save_history: self.history.save_state("Zmiana skali (suwak)")
         plot_id = self._get_plot_id_from_active_signal()
-        if plot_id: self.plotted_data[plot_id]['scale_factor'] = scale_factor; self.redraw_all_plots()
+        if plot_id: self.plotted_data[plot_id].scale_factor = scale_factor; self.redraw_all_plots()
     def _update_scaling_ui(self, scale_factor: float, update_entry=True):
         self._is_updating_ui = True
         try:
             if update_entry: self.scale_entry_var.set(f"{scale_factor:.4f}")
             log_value = np.log10(scale_factor) if scale_factor > 0 else -3.0
-            self.log_scale_slider.set(float(max(min(log_value, 3.0), -3.0)))
+            if self.log_scale_slider is not None: self.log_scale_slider.set(float(max(min(log_value, 3.0), -3.0)))
         except TclError: pass
         finally: self._is_updating_ui = False
     def _on_signal_selected(self, event=None):
         plot_id = self._get_plot_id_from_active_signal()
         if not plot_id: self._update_scaling_ui(1.0); self.label_edit_var.set(''); self.active_signal_var.set(''); self._update_statistics_display(); return
         data = self.plotted_data[plot_id]
-        self._update_scaling_ui(data['scale_factor']); self.label_edit_var.set(data['label']); self._update_statistics_display()
+        self._update_scaling_ui(data.scale_factor); self.label_edit_var.set(data.label); self._update_statistics_display()
+        if event is not None and self.show_fft_var.get() and self.SPECTRUM_QUANTITIES[self.spectrum_quantity_var.get()][0]: self.redraw_all_plots()  # nowa referencja widma względnego
     def _change_active_plot_color(self):
         plot_id = self._get_plot_id_from_active_signal()
         if not plot_id: messagebox.showwarning("Brak zaznaczenia", "Proszę wybrać widoczny sygnał."); return
         self.history.save_state("Zmiana koloru")
-        current_color = self.plotted_data[plot_id].get('color')
+        current_color = self.plotted_data[plot_id].color
         color_data = colorchooser.askcolor(initialcolor=current_color if current_color else "#000000", title="Wybierz kolor wykresu")
         if color_data and color_data[1]: 
-            logging.info(f"Zmiana koloru dla '{self.plotted_data[plot_id]['label']}' na {color_data[1]}")
-            self.plotted_data[plot_id]['color'] = color_data[1]; self.plotted_data[plot_id]['original_color'] = color_data[1]; self.redraw_all_plots()
+            logging.info(f"Zmiana koloru dla '{self.plotted_data[plot_id].label}' na {color_data[1]}")
+            self.plotted_data[plot_id].color = color_data[1]; self.plotted_data[plot_id].original_color = color_data[1]; self.redraw_all_plots()
     def _update_combobox(self):
-        visible_labels = [data['label'] for pid, data in self.plotted_data.items() if data.get('visible', False) and not data.get('is_comparison', False)]
-        current_selection = self.active_signal_var.get()
-        sorted_labels = sorted(visible_labels)
-        self.signal_selector['values'] = sorted_labels; self.signal_selector_2['values'] = sorted_labels
-        if current_selection not in visible_labels:
-            if visible_labels: self.active_signal_var.set(sorted_labels[0])
-            else: self.active_signal_var.set('')
+        sorted_labels = self.datasets.visible_labels()  # utrzymywana posortowana przez DatasetIndex
+        if sorted_labels is not self._signal_labels: self._set_signal_labels(sorted_labels)
+        if self.datasets.find_visible(self.active_signal_var.get()) is None: self.active_signal_var.set(sorted_labels[0] if sorted_labels else '')
         self._on_signal_selected()
+    def _set_signal_labels(self, labels: List[str]):
+        self._signal_labels = labels
+        for selector in (self.signal_selector, self.signal_selector_2):
+            if selector is not None: selector['values'] = labels
+    @timed_operation("Przełączenie FFT")
     def toggle_fft_view(self, initial_clear=False):
         is_fft = self.show_fft_var.get(); logging.info(f"Przełączanie widoku FFT na: {is_fft}")
         new_state = 'disabled' if is_fft else 'normal'
-        self.fit_view_button.config(state=new_state); self.normalize_button.config(state=new_state)
+        if self.fit_view_button is not None: self.fit_view_button.config(state=new_state); self.normalize_button.config(state=new_state)
         self._clear_markers(); self._update_statistics_display()
         if not initial_clear: self.redraw_all_plots()
+    @timed_operation("Ustawienia FFT")
+    def _on_fft_options_changed(self, event=None):
+        self.spectral_engine.window = self.fft_window_var.get(); self.spectral_engine.zero_pad = self.fft_zero_pad_var.get()
+        logging.info(f"Ustawienia FFT: okno={self.spectral_engine.window}, dopełnianie zerami={self.spectral_engine.zero_pad}")
+        if self.show_fft_var.get(): self.redraw_all_plots()
+    def _on_spectrum_quantity_changed(self, event=None):
+        quantity = self.SPECTRUM_QUANTITIES[self.spectrum_quantity_var.get()][0]; logging.info(f"Wielkość widma: {self.spectrum_quantity_var.get()}")
+        if quantity and not self._get_plot_id_from_active_signal(): messagebox.showinfo("Brak Referencji", "Widmo względne wymaga aktywnego sygnału referencyjnego - do czasu wyboru wyświetlana jest amplituda.")
+        if self.show_fft_var.get(): self.redraw_all_plots()
     def _get_plot_id_from_active_signal(self) -> str | None:
         selected_label = self.active_signal_var.get()
-        if not selected_label: return None
-        for pid, data in self.plotted_data.items():
-            if data['label'] == selected_label and data.get('visible', False): return pid
-        return None
+        return self.datasets.find_visible(selected_label) if selected_label else None
     def _toggle_legend_visibility(self):
         is_visible = self.legend_visible_var.get(); logging.info(f"Przełączanie legendy na: {is_visible}")
         legend = self.ax.get_legend()
         if legend: legend.set_visible(is_visible)
         elif is_visible and self.ax.has_data(): self.ax.legend()
-        self.canvas.draw_idle()
+        self._schedule_draw()
     def _update_label(self):
         plot_id = self._get_plot_id_from_active_signal()
         if not plot_id: messagebox.showwarning("Brak zaznaczenia", "Proszę wybrać widoczny sygnał."); return
         self.history.save_state("Zmiana etykiety")
-        old_label = self.plotted_data[plot_id]['label']; new_label = self.label_edit_var.get().strip()
+        old_label = self.plotted_data[plot_id].label; new_label = self.label_edit_var.get().strip()
         if not new_label: messagebox.showwarning("Pusta etykieta", "Etykieta nie może być pusta."); return
-        for pid, data in self.plotted_data.items():
-            if data.get('visible', False) and data['label'] == new_label and pid != plot_id: messagebox.showerror("Błąd", "Ta etykieta jest już używana."); return
+        if any(pid != plot_id for pid in self.datasets.visible_ids(new_label)): messagebox.showerror("Błąd", "Ta etykieta jest już używana."); return
         logging.info(f"Zmiana etykiety z '{old_label}' na '{new_label}'.")
-        self.plotted_data[plot_id]['label'] = new_label
+        self.plotted_data[plot_id].label = new_label; self._register_dataset(plot_id)
         self._update_combobox(); self.redraw_all_plots(); self.active_signal_var.set(new_label)
     def fit_view_to_data(self):
         try:
-            visible_lines = [data['line'] for data in self.plotted_data.values() if data.get('visible') and data.get('line')]
-            if not visible_lines: return
+            bounds = self.plot_layer.data_bounds()
+            if bounds is None: return
             logging.info("Dopasowywanie widoku do danych.")
-            min_x, max_x, min_y, max_y = np.inf, -np.inf, np.inf, -np.inf
-            for line in visible_lines:
-                x_data, y_data = line.get_xdata(), line.get_ydata()
-                if x_data.size > 0: min_x, max_x = min(min_x, np.min(x_data)), max(max_x, np.max(x_data))
-                if y_data.size > 0: min_y, max_y = min(min_y, np.min(y_data)), max(max_y, np.max(y_data))
-            if np.isinf(min_x) or np.isinf(min_y): return
+            min_x, max_x, min_y, max_y = bounds
             y_margin = (max_y - min_y) * 0.05
             if y_margin == 0: y_margin = 1
             self.ax.set_xlim(float(min_x), float(max_x)); self.ax.set_ylim(float(min_y - y_margin), float(max_y + y_margin))
-            self.canvas.draw_idle()
+            self._schedule_draw()
         except Exception as e: logging.error(f"Błąd podczas dopasowywania widoku: {e}", exc_info=True)
-    def _redraw_and_fit(self, log_message: str): self.redraw_all_plots(); self.fit_view_to_data(); logging.info(log_message)
+    def _redraw_and_fit(self, log_message: str): self.redraw_all_plots(then=self.fit_view_to_data); logging.info(log_message)
 
 if __name__ == "__main__":
     root = tk.Tk()
     app = DataVisualizerApp(root)
     def on_closing():
         logging.info("Aplikacja jest zamykana.")
+        app.stop_live_acquisition(); app.compute.shutdown()
         try: 
             app.root.quit()
             app.root.destroy()
@@ -0,0 +1,108 @@
+# -- coding: utf-8 --
+
+"""
+Wsadowe przetwarzanie plików pomiarowych bez interfejsu graficznego (np. na węźle klastra).
+Stosuje ten sam potok co aplikacja: normalizację amplitudy względem sygnału referencyjnego,
+wygładzanie i widmo FFT, równolegle na wszystkich rdzeniach.
+
+Przykład:
+    python davisu_batch.py pomiary/ -o wyniki/ --reference pomiary/ref.txt --smooth "Savitzky-Golay" --window 11 --fft --fft-window Hann
+"""
+
+import argparse
+import glob
+import itertools
+import logging
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, Any, List
+
+import numpy as np
+import pandas as pd
+
+from davisu_core import SMOOTHING_METHODS, apply_smoothing, normalization_factor, signal_statistics, read_txt_file, read_excel_workbook, SpectralEngine, write_text_columns
+
+def load_datasets(filepath: str) -> List[tuple]:
+    # Zwraca listę (nazwa, x, y) - jeden zbiór dla pliku .txt, po jednym na arkusz dla .xlsx
+    if filepath.lower().endswith('.xlsx'):
+        sheets: List[tuple] = []
+        read_excel_workbook(filepath, lambda count: None, lambda index, name, df: sheets.append((str(name), df)), lambda: False)
+        frames = [(name, df) for name, df in sheets if df is not None]
+    else:
+        df = read_txt_file(filepath); frames = [('', df)] if df is not None else []
+    return [(name, df.iloc[:, 0].to_numpy(dtype=float), df.iloc[:, 1].to_numpy(dtype=float)) for name, df in frames]
+
+def write_columns(path: str, columns: List[np.ndarray], header: List[str]):
+    # Nagłówek bez znaku komentarza - plik wynikowy można ponownie wczytać w aplikacji; formatowanie wektorowe blokami
+    write_text_columns(path, columns, header, delimiter='\t', fmt='%.9g')
+
+def process_file(filepath: str, config: Dict[str, Any]) -> List[Dict[str, Any]]:
+    rows = []; stem = os.path.splitext(os.path.basename(filepath))[0]
+    try: datasets = load_datasets(filepath)
+    except Exception as e: return [{'file': filepath, 'dataset': '', 'error': str(e)}]
+    engine = SpectralEngine(window=config['fft_window'], zero_pad=config['zero_pad'])
+    for name, x_data, y_data in datasets:
+        output_stem = f"{stem}_{name}" if name else stem; row: Dict[str, Any] = {'file': filepath, 'dataset': name}
+        try:
+            scale = normalization_factor(config['reference_y'], y_data) if config['reference_y'] is not None else 1.0
+            y_processed = y_data * scale
+            if config['smooth']: y_processed = apply_smoothing(y_processed, config['smooth'], config['window'])
+            write_columns(os.path.join(config['output_dir'], f"{output_stem}_processed.txt"), [x_data, y_processed], ['Time (ps)', 'Signal (a.u.)'])
+            stats = signal_statistics(x_data, y_processed) or {}
+            row.update({'points': len(x_data), 'scale_factor': scale, **stats})
+            if config['fft']:
+                freqs, amplitudes = engine.transform([(x_data, y_processed)])[0]
+                write_columns(os.path.join(config['output_dir'], f"{output_stem}_fft.txt"), [freqs, amplitudes], ['Frequency (THz)', 'FFT Amplitude (a.u.)'])
+                if amplitudes.size > 1: row['fft_peak_frequency'] = float(freqs[1:][np.argmax(amplitudes[1:])])
+        except Exception as e: row['error'] = str(e)
+        rows.append(row)
+    return rows
+
+def find_inputs(input_dir: str, patterns: List[str], recursive: bool) -> List[str]:
+    found = set()
+    for pattern in patterns: found.update(glob.glob(os.path.join(input_dir, '**' if recursive else '', pattern), recursive=recursive))
+    return sorted(path for path in found if os.path.isfile(path))
+
+def parse_args(argv: List[str] | None = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Wsadowe przetwarzanie danych DaVisu (normalizacja, wygładzanie, FFT, statystyki).")
+    parser.add_argument('input_dir', help="Katalog z plikami pomiarowymi")
+    parser.add_argument('-o', '--output-dir', required=True, help="Katalog na przetworzone przebiegi, widma i tabelę statystyk")
+    parser.add_argument('--pattern', action='append', help="Wzorzec nazw plików (domyślnie *.txt i *.xlsx); można podać wielokrotnie")
+    parser.add_argument('-r', '--recursive', action='store_true', help="Przeszukuj podkatalogi")
+    parser.add_argument('--reference', help="Plik referencyjny do normalizacji amplitud (max |S_ref| / max |S_i|)")
+    parser.add_argument('--smooth', choices=SMOOTHING_METHODS, help="Metoda wygładzania")
+    parser.add_argument('--window', type=int, default=5, help="Okno/siła wygładzania (domyślnie 5)")
+    parser.add_argument('--fft', action='store_true', help="Zapisz widmo amplitudowe FFT")
+    parser.add_argument('--fft-window', choices=list(SpectralEngine.WINDOWS.keys()), default="Brak", help="Okno apodyzacyjne FFT")
+    parser.add_argument('--zero-pad', action='store_true', help="Dopełnianie zerami do szybkiej długości FFT")
+    parser.add_argument('-j', '--workers', type=int, default=os.cpu_count() or 1, help="Liczba procesów roboczych")
+    return parser.parse_args(argv)
+
+def main(argv: List[str] | None = None) -> int:
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    args = parse_args(argv)
+    inputs = find_inputs(args.input_dir, args.pattern or ['*.txt', '*.xlsx'], args.recursive)
+    if not inputs: logging.error(f"Brak plików wejściowych w '{args.input_dir}'."); return 1
+    reference_y = None
+    if args.reference:
+        reference = load_datasets(args.reference)
+        if not reference: logging.error(f"Plik referencyjny '{args.reference}' nie zawiera danych."); return 1
+        reference_y = reference[0][2]
+    os.makedirs(args.output_dir, exist_ok=True)
+    config = {'output_dir': args.output_dir, 'reference_y': reference_y, 'smooth': args.smooth, 'window': args.window, 'fft': args.fft, 'fft_window': args.fft_window, 'zero_pad': args.zero_pad}
+    logging.info(f"Przetwarzanie {len(inputs)} plików w {args.workers} procesach."); start = time.perf_counter(); rows: List[Dict[str, Any]] = []
+    chunksize = max(1, len(inputs) // (args.workers * 4))
+    with ProcessPoolExecutor(max_workers=args.workers) as executor:
+        for done, file_rows in enumerate(executor.map(process_file, inputs, itertools.repeat(config), chunksize=chunksize), start=1):
+            rows.extend(file_rows)
+            if done % 50 == 0 or done == len(inputs): logging.info(f"Przetworzono {done}/{len(inputs)} plików.")
+    stats_path = os.path.join(args.output_dir, 'stats.csv'); pd.DataFrame(rows).to_csv(stats_path, index=False)
+    errors = [row for row in rows if row.get('error')]
+    for row in errors: logging.error(f"Błąd przetwarzania '{row['file']}' {row['dataset']}: {row['error']}")
+    logging.info(f"Zakończono w {time.perf_counter() - start:.2f} s. Tabela statystyk: {stats_path}")
+    return 1 if errors else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,226 @@
+# -- coding: utf-8 --
+
+"""
+Bezokienkowy zestaw benchmarków gorących ścieżek aplikacji: wczytywanie (.txt, .xlsx), odrysowanie wykresu,
+wygładzanie, widok FFT i zapis historii. Aplikacja jest uruchamiana z backendem Agg, bez wyświetlacza:
+okna dialogowe i widżety Tk są zastąpione prostymi zaślepkami, a pętla zdarzeń Tk - kolejką wywołań root.after.
+Dane to syntetyczne impulsy THz o zadanej liczbie i długości. Dla każdej operacji zapisywany jest czas (mediana
+i minimum z powtórzeń), szczytowe zużycie pamięci (tracemalloc) i przyrost liczby zaalokowanych bloków.
+
+Przykład:
+    python davisu_bench.py --signals 1 20 --points 5000 200000 -o bench.json --baseline bench_baseline.json
+"""
+
+import argparse
+import gc
+import heapq
+import itertools
+import json
+import logging
+import os
+import platform
+import sys
+import tempfile
+import time
+import tracemalloc
+from typing import Dict, Any, List
+
+import matplotlib
+matplotlib.use('Agg')
+import numpy as np
+from matplotlib.figure import Figure
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+
+import app as davisu_app
+from davisu_core import Signal, SessionFile
+
+def synthetic_pulse(n_points: int, seed: int, time_step: float = 0.05) -> tuple:
+    # Impuls THz w dziedzinie czasu: pochodna gaussa, słabsze echo (odbicie w próbce) i szum pomiarowy
+    rng = np.random.default_rng(seed); x = np.arange(n_points) * time_step; t0 = x[-1] * (0.3 + 0.1 * rng.random()); tau = 0.3 + 0.2 * rng.random()
+    pulse = lambda center, amplitude: -amplitude * (x - center) / tau ** 2 * np.exp(-(x - center) ** 2 / (2 * tau ** 2))
+    y = pulse(t0, 1.0) + pulse(t0 + x[-1] * 0.2, 0.3) + rng.normal(0, 0.01, n_points)
+    return x, y
+
+class _Var:
+    # Odpowiednik zmiennej Tk (get/set) niewymagający interpretera Tcl
+    def __init__(self, value=None): self._value = value
+    def get(self): return self._value
+    def set(self, value): self._value = value
+
+class _Stub:
+    # Zaślepka widżetu lub okna dialogowego: każda metoda przyjmuje dowolne argumenty i zwraca wartość domyślną
+    def __init__(self, **returns): self._returns = returns
+    def __getattr__(self, name): return lambda *args, **kwargs: self._returns.get(name)
+
+class HeadlessRoot:
+    # Pętla zdarzeń zastępująca Tk: root.after/after_idle kolejkują wywołania, run_until wykonuje je w czasie rzeczywistym
+    def __init__(self): self._queue: List[tuple] = []; self._counter = itertools.count()
+    def after(self, ms: int, func, *args): heapq.heappush(self._queue, (time.perf_counter() + ms / 1000, next(self._counter), func, args))
+    def after_idle(self, func, *args): self.after(0, func, *args)
+    def run_until(self, condition, timeout: float = 600.0):
+        deadline = time.perf_counter() + timeout
+        while not condition():
+            if not self._queue or time.perf_counter() > deadline: raise RuntimeError("Pętla zdarzeń zakończyła się przed spełnieniem warunku.")
+            due, _, func, args = heapq.heappop(self._queue); delay = due - time.perf_counter()
+            if delay > 0: time.sleep(delay)
+            func(*args)
+    def run_idle(self):
+        now = time.perf_counter()
+        while self._queue and self._queue[0][0] <= now: _, _, func, args = heapq.heappop(self._queue); func(*args)
+
+class HeadlessApp(davisu_app.DataVisualizerApp):
+    # Aplikacja z prawdziwą logiką przetwarzania i rysowania (PlotLayer, cache, historia), lecz bez okna Tk
+    def __init__(self, cache_dir: str):
+        self.root = HeadlessRoot(); self.startup_timings = {}
+        self._init_state(cache_dir); self.dataset_cache.enabled = False
+        self.cursor = _Stub(); self.status_bar = self.progress_frame = self.progress_bar = self.progress_label = self.progress_cancel_button = _Stub()
+        self.fig = Figure(figsize=(10.2, 7.5), dpi=100); self.ax = self.fig.add_subplot(111); self.canvas = FigureCanvasAgg(self.fig)
+        self.plot_layer = davisu_app.PlotLayer(self.ax, self._compute_plot_xy, self._get_summary, self._lighten_color, self._derived_key, self._full_bounds)
+        self.ax.callbacks.connect('xlim_changed', lambda ax: self._on_xlim_changed())
+        self._initialize_plot(); self.root.run_idle()
+    def _new_var(self, kind, value=None): return _Var(kind._default if value is None else value)
+    def update_edit_menu_state(self): pass
+    def _clear_data_ui(self): self.excel_filepath = None
+    def populate(self, n_signals: int, n_points: int):
+        for i in range(n_signals):
+            plot_id = f"bench_{i}"; x, y = synthetic_pulse(n_points, seed=i)
+            self.plotted_data[plot_id] = Signal(x, y, f"impuls_{i}", self.high_contrast_colors[i % len(self.high_contrast_colors)]); self._register_dataset(plot_id)
+        self._update_combobox()
+        return self
+    def flush(self): self.root.run_until(lambda: not self.compute.busy()); self.root.run_idle()
+
+def write_txt_inputs(directory: str, n_signals: int, n_points: int) -> List[str]:
+    paths = []
+    for i in range(n_signals):
+        path = os.path.join(directory, f"impuls_{n_points}_{i}.txt"); paths.append(path)
+        if not os.path.exists(path): x, y = synthetic_pulse(n_points, seed=i); np.savetxt(path, np.column_stack([x, y]), fmt='%.6f', delimiter='\t', header='Time (ps)\tRad THz', comments='')
+    return paths
+
+def write_xlsx_input(directory: str, n_signals: int, n_points: int) -> str:
+    from openpyxl import Workbook
+    path = os.path.join(directory, f"impulsy_{n_signals}x{n_points}.xlsx")
+    if os.path.exists(path): return path
+    workbook = Workbook(write_only=True)
+    for i in range(n_signals):
+        worksheet = workbook.create_sheet(f"impuls_{i}"); worksheet.append(['Time (ps)', 'Rad THz']); x, y = synthetic_pulse(n_points, seed=i)
+        for row in zip(x.tolist(), y.tolist()): worksheet.append(row)
+    workbook.save(path)
+    return path
+
+def _load_txt(directory: str, n_signals: int, n_points: int):
+    paths = write_txt_inputs(directory, n_signals, n_points)
+    def setup(): davisu_app.filedialog = _Stub(askopenfilenames=tuple(paths)); return HeadlessApp(directory)
+    def run(bench_app: HeadlessApp): bench_app.load_data_and_plot(); bench_app.root.run_until(lambda: bench_app._txt_loader is None); bench_app.flush()
+    return setup, run
+
+def _load_xlsx(directory: str, n_signals: int, n_points: int):
+    path = write_xlsx_input(directory, n_signals, n_points)
+    def setup(): bench_app = HeadlessApp(directory); bench_app.excel_filepath = path; return bench_app
+    def run(bench_app: HeadlessApp): bench_app._process_excel_file(); bench_app.root.run_until(lambda: bench_app._excel_loader is None); bench_app.flush()
+    return setup, run
+
+def _redraw_cold(directory: str, n_signals: int, n_points: int):
+    def run(bench_app: HeadlessApp): bench_app._redraw_and_fit("benchmark"); bench_app.flush()
+    return lambda: HeadlessApp(directory).populate(n_signals, n_points), run
+
+def _redraw_incremental(directory: str, n_signals: int, n_points: int):
+    def setup(): bench_app = HeadlessApp(directory).populate(n_signals, n_points); bench_app._redraw_and_fit("benchmark"); bench_app.flush(); return bench_app
+    def run(bench_app: HeadlessApp): bench_app._apply_scaling_to_plot(2.0); bench_app.flush()
+    return setup, run
+
+def _smoothing_all(directory: str, n_signals: int, n_points: int):
+    def setup(): bench_app = HeadlessApp(directory).populate(n_signals, n_points); bench_app.redraw_all_plots(); bench_app.flush(); bench_app.smoothing_method_var.set("Savitzky-Golay"); bench_app.smoothing_window_var.set(11); return bench_app
+    def run(bench_app: HeadlessApp): bench_app._apply_smoothing_to_all(); bench_app.flush()
+    return setup, run
+
+def _fft_view(directory: str, n_signals: int, n_points: int):
+    def setup(): bench_app = HeadlessApp(directory).populate(n_signals, n_points); bench_app.redraw_all_plots(); bench_app.flush(); return bench_app
+    def run(bench_app: HeadlessApp): bench_app.show_fft_var.set(True); bench_app.toggle_fft_view(); bench_app.flush()
+    return setup, run
+
+def _history_save_state(directory: str, n_signals: int, n_points: int):
+    def run(bench_app: HeadlessApp):
+        for step in range(50): bench_app.history.save_state("benchmark"); bench_app.plotted_data[f"bench_{step % n_signals}"].scale_factor = 1.0 + step
+        bench_app.history.save_state("benchmark")
+    return lambda: HeadlessApp(directory).populate(n_signals, n_points), run
+
+def _session_save(directory: str, n_signals: int, n_points: int):
+    path = os.path.join(directory, f"sesja_{n_signals}x{n_points}.davisu")
+    def run(bench_app: HeadlessApp): state, arrays = bench_app._session_state(); SessionFile.save(path, state, arrays)
+    return lambda: HeadlessApp(directory).populate(n_signals, n_points), run
+
+def _session_load(directory: str, n_signals: int, n_points: int):
+    path = os.path.join(directory, f"sesja_{n_signals}x{n_points}.davisu")
+    if not os.path.exists(path): bench_app = HeadlessApp(directory).populate(n_signals, n_points); SessionFile.save(path, *bench_app._session_state())
+    def run(bench_app: HeadlessApp): bench_app._restore_session(*SessionFile.load(path)); bench_app.flush()
+    return lambda: HeadlessApp(directory), run
+
+def _export(fmt: str):
+    # Eksport wszystkich sygnałów z widmami FFT (przetworzenie w wątku roboczym i zapis strumieniowy) do katalogu CSV albo pliku
+    def operation(directory: str, n_signals: int, n_points: int):
+        path = os.path.join(directory, f"eksport_{n_signals}x{n_points}{davisu_app.DataVisualizerApp.EXPORT_FORMATS[fmt][1] or ''}")
+        def setup(): davisu_app.filedialog = _Stub(askdirectory=path, asksaveasfilename=path); return HeadlessApp(directory).populate(n_signals, n_points)
+        def run(bench_app: HeadlessApp): bench_app.export_data(fmt); bench_app.root.run_until(lambda: bench_app._export_job is None)
+        return setup, run
+    return operation
+
+OPERATIONS = {'load_txt': _load_txt, 'load_xlsx': _load_xlsx, 'redraw_cold': _redraw_cold, 'redraw_incremental': _redraw_incremental,
+              'smoothing_all': _smoothing_all, 'fft_view': _fft_view, 'history_save_state': _history_save_state, 'session_save': _session_save, 'session_load': _session_load,
+              'export_csv': _export('csv'), 'export_npz': _export('npz'), 'export_columnar': _export('columnar')}
+
+def measure(setup, run, repeats: int) -> Dict[str, Any]:
+    # Pomiary czasu bez tracemalloc (narzut śledzenia zaniżałby wyniki); pamięć w osobnym przebiegu
+    run(setup()); times = []  # przebieg rozgrzewkowy: leniwe importy i jednorazowe inicjalizacje nie wchodzą do pomiaru
+    for _ in range(repeats):
+        state = setup(); gc.collect(); start = time.perf_counter(); run(state); times.append(time.perf_counter() - start); del state
+    state = setup(); gc.collect(); blocks_before = sys.getallocatedblocks(); tracemalloc.start()
+    try: run(state); _, peak = tracemalloc.get_traced_memory()
+    finally: tracemalloc.stop()
+    blocks_delta = sys.getallocatedblocks() - blocks_before
+    return {'wall_s_median': float(np.median(times)), 'wall_s_min': float(np.min(times)), 'repeats': repeats, 'peak_bytes': int(peak), 'allocated_blocks_delta': int(blocks_delta)}
+
+def compare(results: Dict[str, Any], baseline: Dict[str, Any], threshold: float, noise_floor_s: float = 0.002) -> List[str]:
+    regressions = []
+    for key, current in results.items():
+        reference = baseline.get(key)
+        if reference is None: continue
+        time_ratio = current['wall_s_median'] / reference['wall_s_median'] if reference['wall_s_median'] > 0 else 1.0
+        memory_ratio = current['peak_bytes'] / reference['peak_bytes'] if reference['peak_bytes'] > 0 else 1.0
+        current['baseline_ratio'] = {'wall': time_ratio, 'peak_bytes': memory_ratio}
+        slower = time_ratio > 1 + threshold and current['wall_s_median'] - reference['wall_s_median'] > noise_floor_s
+        if slower or memory_ratio > 1 + threshold: regressions.append(f"{key}: czas x{time_ratio:.2f}, pamięć x{memory_ratio:.2f}")
+    return regressions
+
+def parse_args(argv: List[str] | None = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Benchmarki wydajności DaVisu (backend Agg, bez wyświetlacza).")
+    parser.add_argument('--signals', type=int, nargs='+', default=[1, 10], help="Liczby sygnałów (domyślnie 1 10)")
+    parser.add_argument('--points', type=int, nargs='+', default=[5000, 100000], help="Długości sygnałów w próbkach (domyślnie 5000 100000)")
+    parser.add_argument('--ops', nargs='+', choices=list(OPERATIONS.keys()), default=list(OPERATIONS.keys()), help="Mierzone operacje (domyślnie wszystkie)")
+    parser.add_argument('--repeats', type=int, default=3, help="Liczba powtórzeń pomiaru czasu (domyślnie 3)")
+    parser.add_argument('-o', '--output', default='bench_results.json', help="Plik wyników JSON")
+    parser.add_argument('--baseline', help="Plik wyników odniesienia do porównania")
+    parser.add_argument('--threshold', type=float, default=0.2, help="Dopuszczalny względny wzrost czasu/pamięci (domyślnie 0.2 = 20%%)")
+    parser.add_argument('--workdir', help="Katalog na wygenerowane pliki wejściowe (domyślnie katalog tymczasowy)")
+    return parser.parse_args(argv)
+
+def main(argv: List[str] | None = None) -> int:
+    logging.basicConfig(level=logging.WARNING, format='%(asctime)s - %(levelname)s - %(message)s')
+    args = parse_args(argv); results: Dict[str, Any] = {}
+    with tempfile.TemporaryDirectory(prefix='davisu_bench_') as temp_dir:
+        directory = args.workdir or temp_dir; os.makedirs(directory, exist_ok=True)
+        for op_name, n_signals, n_points in itertools.product(args.ops, args.signals, args.points):
+            key = f"{op_name}[signals={n_signals},points={n_points}]"; setup, run = OPERATIONS[op_name](directory, n_signals, n_points)
+            results[key] = {'operation': op_name, 'signals': n_signals, 'points': n_points, **measure(setup, run, args.repeats)}
+            print(f"{key:<55} {results[key]['wall_s_median'] * 1000:10.1f} ms  {results[key]['peak_bytes'] / 1024 ** 2:8.1f} MB  {results[key]['allocated_blocks_delta']:+9d} bloków", flush=True)
+    regressions: List[str] = []
+    if args.baseline:
+        with open(args.baseline, 'r', encoding='utf-8') as f: regressions = compare(results, json.load(f)['results'], args.threshold)
+    meta = {'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'), 'python': platform.python_version(), 'numpy': np.__version__, 'matplotlib': matplotlib.__version__,
+            'platform': platform.platform(), 'cpu_count': os.cpu_count(), 'repeats': args.repeats, 'baseline': args.baseline}
+    with open(args.output, 'w', encoding='utf-8') as f: json.dump({'meta': meta, 'results': results, 'regressions': regressions}, f, indent=2, ensure_ascii=False)
+    print(f"Wyniki zapisano w {args.output}")
+    for line in regressions: print(f"REGRESJA: {line}")
+    return 1 if regressions else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,976 @@
+# -- coding: utf-8 --
+
+"""
+Rdzeń przetwarzania DaVisu niezależny od interfejsu graficznego: wczytywanie plików, sygnały,
+wygładzanie, normalizacja, widma FFT i statystyki. Używany przez aplikację (app.py)
+oraz przez wsadowe przetwarzanie z linii poleceń (davisu_batch.py).
+
+Biblioteki pandas i scipy są importowane leniwie, przy pierwszym użyciu (wczytanie pliku, wygładzanie, FFT),
+aby nie wydłużały uruchamiania aplikacji.
+"""
+
+from __future__ import annotations
+from typing import Dict, Any, List, TYPE_CHECKING
+import numpy as np
+import os
+import logging
+import threading
+import json
+import hashlib
+import itertools
+import bisect
+import re
+import zipfile
+import mmap
+import struct
+import zlib
+import stat
+import time
+import tracemalloc
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+
+if TYPE_CHECKING: import pandas as pd
+
+SMOOTHING_METHODS = ["Moving Average", "Savitzky-Golay", "Median Filter", "Gaussian Filter"]
+
+def apply_smoothing(y_data: np.ndarray, method: str, window: int) -> np.ndarray:
+    # Filtr wzdłuż ostatniej osi - działa także na blokach 2D (wiersz = sygnał) w jednym wywołaniu
+    if y_data.shape[-1] < 3: return y_data
+    if method == "Gaussian Filter": from scipy.ndimage import gaussian_filter1d; sigma = max(1, window); return gaussian_filter1d(y_data, sigma=sigma, axis=-1)
+    if window < 3: return y_data
+    if method == "Moving Average": return moving_average(y_data, window)
+    elif method == "Savitzky-Golay": from scipy.signal import savgol_filter; poly_order = min(3, window - 1 if window > 3 else 1); return savgol_filter(y_data, window, poly_order, axis=-1)
+    elif method == "Median Filter":
+        # Mediana 1D ma w scipy szybką ścieżkę, której nie ma filtr 2D z oknem (1, window) - blok filtrowany jest wierszami
+        from scipy.ndimage import median_filter
+        return median_filter(y_data, size=window) if y_data.ndim == 1 else np.stack([median_filter(row, size=window) for row in y_data.reshape(-1, y_data.shape[-1])]).reshape(y_data.shape)
+    return y_data
+
+def moving_average(y_data: np.ndarray, window: int) -> np.ndarray:
+    # Wyśrodkowana średnia krocząca w O(n) z sum prefiksowych (jak rolling(center=True, min_periods=1) w pandas: na brzegach
+    # średnia z dostępnych próbek). Od sygnału odejmowana jest średnia, aby ograniczyć błąd zaokrągleń długich sum.
+    n_points = y_data.shape[-1]; before = window // 2; after = window - 1 - before
+    offset = y_data.mean(axis=-1, keepdims=True); sums = np.zeros(y_data.shape[:-1] + (n_points + 1,)); np.cumsum(y_data - offset, axis=-1, out=sums[..., 1:])
+    result = np.empty(y_data.shape)
+    if n_points >= window: result[..., before:n_points - after] = (sums[..., window:] - sums[..., :n_points + 1 - window]) / window
+    edges = np.r_[0:min(before, n_points), max(n_points - after, min(before, n_points)):n_points] if n_points >= window else np.arange(n_points)
+    low = np.maximum(edges - before, 0); high = np.minimum(edges + after, n_points - 1) + 1
+    result[..., edges] = (sums[..., high] - sums[..., low]) / (high - low)
+    return result + offset
+
+def smooth_batch(signals: List[np.ndarray], method: str | None, window: int, scales: List[float] | None = None, parallel_min_samples: int = 2_000_000) -> List[np.ndarray]:
+    # Wygładzanie wielu sygnałów naraz: sygnały o równej długości trafiają do jednego bloku 2D (od razu przeskalowane),
+    # filtrowanego jednym wywołaniem wzdłuż osi próbek; bloki większe niż parallel_min_samples dzielone są na pasy wierszy
+    # liczone w puli wątków (filtry scipy.ndimage i numpy zwalniają GIL). Wynik: wiersze bloków (widoki) w kolejności wejścia.
+    scales = scales if scales is not None else [1.0] * len(signals); results: List[np.ndarray | None] = [None] * len(signals); groups: Dict[int, List[int]] = {}
+    for index, y_data in enumerate(signals):
+        if method is None or y_data.size < 3: results[index] = y_data * scales[index] if scales[index] != 1.0 else y_data
+        else: groups.setdefault(y_data.size, []).append(index)
+    for n_points, indices in groups.items():
+        block = np.empty((len(indices), n_points))
+        for row, index in enumerate(indices): np.multiply(signals[index], scales[index], out=block[row])
+        n_workers = min(os.cpu_count() or 1, len(indices), max(block.size // parallel_min_samples, 1))
+        if n_workers > 1:
+            with ThreadPoolExecutor(max_workers=n_workers) as executor: smoothed = np.concatenate(list(executor.map(lambda part: apply_smoothing(part, method, window), np.array_split(block, n_workers))))
+        else: smoothed = apply_smoothing(block, method, window)
+        for row, index in enumerate(indices): results[index] = smoothed[row]
+    return results
+
+def smoothing_margin(method: str | None, window: int | None) -> int:
+    # Liczba próbek z każdej strony okna potrzebna, aby filtr dał na brzegach okna ten sam wynik co na całym sygnale
+    if method is None or not window: return 0
+    if method == "Gaussian Filter": return 4 * max(1, int(window)) + 1
+    return int(window) // 2 + 1
+
+def normalization_factor(ref_y: np.ndarray, y_data: np.ndarray) -> float:
+    # Współczynnik skali k = max(|S_ref|) / max(|S_i|); dla pustego lub zerowego sygnału 1.0
+    if ref_y.size == 0 or y_data.size == 0: return 1.0
+    max_ref_amp, max_current_amp = np.max(np.abs(ref_y)), np.max(np.abs(y_data))
+    return float(max_ref_amp / max_current_amp) if max_current_amp > 0 and max_ref_amp > 0 else 1.0
+
+def signal_statistics(x_data: np.ndarray, y_data: np.ndarray) -> Dict[str, float] | None:
+    if y_data.size == 0: return None
+    return SignalSummary(x_data, y_data).statistics()
+
+class SignalSummary:
+    # Indeks podsumowania sygnału budowany raz na wersję danych/przetwarzania: ekstrema, średnia, pozycja piku,
+    # granice osi X i flaga posortowania (wyszukiwanie binarne). Zapytania o zakres między znacznikami korzystają
+    # z agregatów blokowych: sum prefiksowych całki trapezowej oraz maksimów |y| w blokach po BLOCK próbek.
+    BLOCK = 1024
+    def __init__(self, x_data: np.ndarray, y_data: np.ndarray):
+        self.x = np.asarray(x_data); self.y = np.asarray(y_data); n_points = self.y.size
+        self.x_sorted = bool(n_points < 2 or not np.any(np.diff(self.x) < 0))
+        if n_points == 0: self.x_min = self.x_max = self.y_min = self.y_max = self.mean = self.peak_position = float('nan'); self._block_integral = self._block_peak = np.empty(0); return
+        self.x_min, self.x_max = (float(self.x[0]), float(self.x[-1])) if self.x_sorted else (float(np.min(self.x)), float(np.max(self.x)))
+        self.y_min, self.y_max, self.mean = float(np.min(self.y)), float(np.max(self.y)), float(np.mean(self.y))
+        n_blocks = -(-n_points // self.BLOCK); padded = np.zeros(n_blocks * self.BLOCK); padded[:n_points] = np.abs(self.y)
+        self._block_peak = padded.reshape(n_blocks, self.BLOCK).argmax(axis=1) + np.arange(n_blocks) * self.BLOCK
+        self.peak_position = float(self.x[self._block_peak[np.argmax(np.abs(self.y[self._block_peak]))]])
+        # _block_integral[k] = całka od próbki 0 do próbki k*BLOCK
+        segments = np.zeros(n_blocks * self.BLOCK); segments[:n_points - 1] = np.diff(self.x) * (self.y[1:] + self.y[:-1]) * 0.5
+        self._block_integral = np.concatenate(([0.0], np.cumsum(segments.reshape(n_blocks, self.BLOCK).sum(axis=1))))
+    @property
+    def nbytes(self) -> int: return self._block_integral.nbytes + self._block_peak.nbytes
+    def statistics(self) -> Dict[str, float] | None:
+        if self.y.size == 0: return None
+        return {'max': self.y_max, 'min': self.y_min, 'mean': self.mean, 'peak_position': self.peak_position}
+    def bounds(self) -> tuple | None: return (self.x_min, self.x_max, self.y_min, self.y_max) if self.y.size else None
+    def nearest_index(self, x_value: float) -> int:
+        if not self.x_sorted: return int(np.argmin(np.abs(self.x - x_value)))
+        index = int(np.searchsorted(self.x, x_value))
+        if index <= 0: return 0
+        if index >= self.x.size: return self.x.size - 1
+        return index - 1 if x_value - self.x[index - 1] <= self.x[index] - x_value else index
+    def range_summary(self, x_start: float, x_end: float) -> Dict[str, float] | None:
+        # Δy, całka i lokalny pik |y| między próbkami najbliższymi x_start i x_end
+        if self.y.size == 0: return None
+        i1, i2 = sorted((self.nearest_index(x_start), self.nearest_index(x_end)))
+        result = {'delta_y': float(abs(self.y[i2] - self.y[i1])), 'integral': self._integral_to(i2) - self._integral_to(i1)}
+        peak = self._peak_index(i1, i2 + 1); result.update({'peak_value': float(self.y[peak]), 'peak_position': float(self.x[peak])})
+        return result
+    def _integral_to(self, index: int) -> float:
+        block = index // self.BLOCK; start = block * self.BLOCK
+        if index == start: return float(self._block_integral[block])
+        x, y = self.x[start:index + 1], self.y[start:index + 1]
+        return float(self._block_integral[block] + np.sum(np.diff(x) * (y[1:] + y[:-1]) * 0.5))
+    def _peak_index(self, start: int, stop: int) -> int:
+        # Niepełne bloki na brzegach przeszukiwane bezpośrednio, pełne bloki przez ich zapamiętane maksima
+        first_full, last_full = -(-start // self.BLOCK), stop // self.BLOCK
+        if first_full >= last_full: return start + int(np.argmax(np.abs(self.y[start:stop])))
+        candidates = [int(self._block_peak[first_full + np.argmax(np.abs(self.y[self._block_peak[first_full:last_full]]))])]
+        if start < first_full * self.BLOCK: candidates.append(start + int(np.argmax(np.abs(self.y[start:first_full * self.BLOCK]))))
+        if last_full * self.BLOCK < stop: candidates.append(last_full * self.BLOCK + int(np.argmax(np.abs(self.y[last_full * self.BLOCK:stop]))))
+        return max(candidates, key=lambda i: abs(self.y[i]))
+
+def read_txt_file(filepath: str) -> pd.DataFrame | None:
+    # Parser C biblioteki pandas (zwalnia GIL podczas tokenizacji, więc dobrze skaluje się w puli wątków);
+    # parser Pythona jest używany tylko dla plików o nieregularnej liczbie kolumn
+    import pandas as pd
+    try: df = pd.read_csv(filepath, sep=r'\s+', comment='#', header=None, skiprows=1, engine='c')
+    except pd.errors.ParserError: df = pd.read_csv(filepath, sep=r'\s+', comment='#', header=None, skiprows=1, engine='python')
+    if df.empty or df.shape[1] < 2: return None
+    if df.shape[1] >= 3: df = df.iloc[:, :3]
+    df.columns = ['Time (ps)', 'Rad THz', 'Rad Time'][:df.shape[1]]
+    if not all(dtype.kind in 'fi' for dtype in df.dtypes): df = df.apply(pd.to_numeric, errors='coerce')
+    df = df.dropna()
+    return None if df.empty else df
+
+def format_rows(columns: List[np.ndarray], delimiter: str = '\t', fmt: str = '%.9g') -> str:
+    # Wektorowe formatowanie bloku wierszy: jeden szablon na cały blok i jedna operacja % zamiast formatowania wiersz po wierszu
+    # (kilkukrotnie szybsze niż np.savetxt, identyczny wynik)
+    block = np.column_stack(columns); row = delimiter.join([fmt] * block.shape[1]) + '\n'
+    return (row * block.shape[0]) % tuple(block.ravel().tolist())
+
+def write_text_columns(path: str, columns: List[np.ndarray], header: List[str], delimiter: str = '\t', fmt: str = '%.9g', chunk_rows: int = 1 << 16):
+    # Nagłówek bez znaku komentarza i wiersze zapisywane blokami po chunk_rows (tekst w pamięci tylko dla jednego bloku)
+    n_rows = len(columns[0]) if columns else 0
+    with open(path, 'w', encoding='utf-8', newline='') as f:
+        f.write(delimiter.join(header) + '\n')
+        for start in range(0, n_rows, chunk_rows): f.write(format_rows([column[start:start + chunk_rows] for column in columns], delimiter, fmt))
+
+def read_excel_workbook(filepath: str, on_sheet_count, on_sheet, should_cancel):
+    # Jedno otwarcie skoroszytu w trybie strumieniowym (read_only) i odczyt tylko dwóch pierwszych kolumn każdego arkusza.
+    # Arkusze skoroszytu read-only współdzielą jeden strumień archiwum, dlatego są parsowane kolejno w wątku roboczym.
+    import pandas as pd
+    from openpyxl import load_workbook
+    workbook = load_workbook(filepath, read_only=True, data_only=True)
+    try:
+        sheet_names = workbook.sheetnames; on_sheet_count(len(sheet_names))
+        for index, sheet_name in enumerate(sheet_names):
+            if should_cancel(): break
+            worksheet = workbook[sheet_name]; worksheet.reset_dimensions()
+            rows = worksheet.iter_rows(max_col=2, values_only=True); header = next(rows, None)
+            if header is None or len(header) < 2 or header[1] is None: on_sheet(index, sheet_name, None); continue
+            columns = [str(name) if name is not None else f"Kolumna {i + 1}" for i, name in enumerate(header[:2])]
+            df = pd.DataFrame.from_records([row[:2] for row in rows], columns=columns)
+            df = df.apply(pd.to_numeric, errors='coerce').dropna()
+            on_sheet(index, sheet_name, None if df.empty else df)
+    finally: workbook.close()
+
+class DatasetCache:
+    # Trwały cache sparsowanych zbiorów danych: kolumny zapisane jako .npy (kolumnami, ciągłe w pamięci) oraz manifest .json
+    # z rozmiarem, mtime i skrótem zawartości pliku źródłowego. Ponowne wczytanie mapuje tablice do pamięci (mmap) zamiast parsować.
+    # Pliki większe niż FULL_HASH_BYTES nie są haszowane (ponowne czytanie wielu GB): zmiana ich mtime oznacza brak trafienia.
+    FORMAT_VERSION = 1; FULL_HASH_BYTES = 64 * 1024 ** 2
+    def __init__(self, cache_dir: str | None = None, max_bytes: int = 2 * 1024 ** 3, enabled: bool = True):
+        self.cache_dir = cache_dir or os.environ.get('DAVISU_CACHE_DIR') or os.path.join(os.path.expanduser('~'), '.davisu_cache')
+        self.max_bytes = max_bytes; self.enabled = enabled; self._lock = threading.Lock()
+    def load(self, filepath: str) -> List[tuple] | None:
+        if not self.enabled: return None
+        return self._load(filepath)
+    def _load(self, filepath: str) -> List[tuple] | None:
+        manifest_path = self._manifest_path(filepath)
+        try:
+            with open(manifest_path, 'r', encoding='utf-8') as f: manifest = json.load(f)
+            st = os.stat(filepath)
+            if manifest.get('format') != self.FORMAT_VERSION or manifest['source'] != os.path.abspath(filepath) or manifest['size'] != st.st_size: return None
+            if manifest['mtime_ns'] != st.st_mtime_ns:
+                if manifest['content_hash'] is None or manifest['content_hash'] != self._content_hash(filepath): return None
+                manifest['mtime_ns'] = st.st_mtime_ns; self._write_json(manifest_path, manifest)
+            import pandas as pd
+            items = []
+            for item in manifest['items']:
+                if item['file'] is None: items.append((item['name'], None)); continue
+                columns = np.load(os.path.join(self.cache_dir, item['file']), mmap_mode='r')
+                items.append((item['name'], pd.DataFrame({name: columns[i] for i, name in enumerate(item['columns'])}, copy=False)))
+            os.utime(manifest_path)
+            return items
+        except (OSError, ValueError, KeyError, TypeError): return None
+    def store(self, filepath: str, items: List[tuple]):
+        if not self.enabled: return
+        try:
+            os.makedirs(self.cache_dir, exist_ok=True); st = os.stat(filepath); key = self._key(filepath); manifest_items = []
+            for index, (name, df) in enumerate(items):
+                if df is None: manifest_items.append({'name': name, 'file': None}); continue
+                filename = f"{key}_{index}.npy"; tmp_path = os.path.join(self.cache_dir, f"{filename}.{threading.get_ident()}.tmp")
+                with open(tmp_path, 'wb') as f: np.save(f, np.ascontiguousarray(df.to_numpy(dtype=float).T))
+                os.replace(tmp_path, os.path.join(self.cache_dir, filename))
+                manifest_items.append({'name': name, 'file': filename, 'columns': [str(c) for c in df.columns]})
+            self._write_manifest(filepath, st, manifest_items)
+        except OSError as e: logging.warning(f"Nie można zapisać cache dla '{filepath}': {e}")
+    def convert_txt(self, filepath: str, chunk_rows: int = 1_000_000) -> List[tuple] | None:
+        # Jednorazowa konwersja dużego pliku .txt do kolumnowego .npy bez wczytywania całości do pamięci: fragmenty po chunk_rows
+        # wierszy dopisywane są do surowych plików kolumn, które następnie kopiowane są blokami do pliku mapowanego (np.memmap).
+        # Konwersja działa także przy wyłączonym cache - tryb out-of-core wymaga kolumn na dysku. Jak w read_txt_file, plik
+        # nieregularny dla parsera C czytany jest parserem Pythona; gdy i ten zawiedzie, zwracane jest None (zwykłe wczytanie).
+        import pandas as pd
+        for engine in ('c', 'python'):
+            try: return self._convert_txt(filepath, chunk_rows, engine)
+            except pd.errors.ParserError as e: logging.warning(f"Konwersja strumieniowa '{filepath}' (parser {engine}) nie powiodła się: {e}")
+        return None
+    def _convert_txt(self, filepath: str, chunk_rows: int, engine: str) -> List[tuple] | None:
+        import pandas as pd
+        os.makedirs(self.cache_dir, exist_ok=True); st = os.stat(filepath); key = self._key(filepath); suffix = f"{threading.get_ident()}.tmp"
+        filename = f"{key}_0.npy"; raw_paths: List[str] = []; raw_files = []; n_rows = 0; names: List[str] = []
+        try:
+            for chunk in pd.read_csv(filepath, sep=r'\s+', comment='#', header=None, skiprows=1, engine=engine, chunksize=chunk_rows):
+                if not raw_files:
+                    if chunk.shape[1] < 2: return None
+                    names = ['Time (ps)', 'Rad THz', 'Rad Time'][:min(chunk.shape[1], 3)]
+                    raw_paths = [os.path.join(self.cache_dir, f"{key}_col{i}.{suffix}") for i in range(len(names))]; raw_files = [open(path, 'wb') for path in raw_paths]
+                chunk = chunk.iloc[:, :len(names)]
+                if not all(dtype.kind in 'fi' for dtype in chunk.dtypes): chunk = chunk.apply(pd.to_numeric, errors='coerce')
+                values = chunk.dropna().to_numpy(dtype=float); n_rows += len(values)
+                for i, f in enumerate(raw_files): f.write(np.ascontiguousarray(values[:, i]).tobytes())
+            for f in raw_files: f.close()
+            if n_rows == 0: return None
+            tmp_path = os.path.join(self.cache_dir, f"{filename}.{suffix}")
+            columns = np.lib.format.open_memmap(tmp_path, mode='w+', dtype=np.float64, shape=(len(names), n_rows))
+            for i, path in enumerate(raw_paths):
+                raw = np.memmap(path, dtype=np.float64, mode='r', shape=(n_rows,))
+                for start in range(0, n_rows, chunk_rows): columns[i, start:start + chunk_rows] = raw[start:start + chunk_rows]
+                del raw
+            columns.flush(); del columns; os.replace(tmp_path, os.path.join(self.cache_dir, filename))
+            self._write_manifest(filepath, st, [{'name': '', 'file': filename, 'columns': names}])
+        finally:
+            for f in raw_files: f.close()
+            for path in raw_paths:
+                try: os.remove(path)
+                except OSError: pass
+        logging.info(f"Skonwertowano '{filepath}' do pliku kolumnowego ({n_rows} wierszy).")
+        return self._load(filepath)
+    def _write_manifest(self, filepath: str, st: os.stat_result, manifest_items: List[Dict[str, Any]]):
+        manifest = {'format': self.FORMAT_VERSION, 'source': os.path.abspath(filepath), 'size': st.st_size, 'mtime_ns': st.st_mtime_ns, 'content_hash': self._source_hash(filepath, st), 'items': manifest_items}
+        self._write_json(self._manifest_path(filepath), manifest); self._evict(keep=self._key(filepath))
+    def clear(self):
+        with self._lock:
+            if not os.path.isdir(self.cache_dir): return
+            for name in os.listdir(self.cache_dir):
+                try: os.remove(os.path.join(self.cache_dir, name))
+                except OSError: pass
+    def _evict(self, keep: str | None = None):
+        # Usuwa najdawniej używane wpisy (wg czasu modyfikacji manifestu), dopóki cache przekracza limit rozmiaru;
+        # właśnie zapisany wpis (keep) zostaje, nawet jeśli sam przekracza limit
+        with self._lock:
+            groups: Dict[str, List[str]] = {}
+            for name in os.listdir(self.cache_dir): groups.setdefault(name[:40], []).append(name)
+            entries, total = [], 0
+            for key, files in groups.items():
+                if f"{key}.json" not in files: continue
+                size = sum(os.path.getsize(os.path.join(self.cache_dir, n)) for n in files); total += size
+                if key != keep: entries.append((os.path.getmtime(os.path.join(self.cache_dir, f"{key}.json")), size, files))
+            for _, size, files in sorted(entries):
+                if total <= self.max_bytes: break
+                for n in files:
+                    try: os.remove(os.path.join(self.cache_dir, n))
+                    except OSError: pass
+                total -= size
+    def _key(self, filepath: str) -> str: return hashlib.sha1(os.path.abspath(filepath).encode('utf-8')).hexdigest()
+    def _manifest_path(self, filepath: str) -> str: return os.path.join(self.cache_dir, f"{self._key(filepath)}.json")
+    def _source_hash(self, filepath: str, st: os.stat_result) -> str | None:
+        if st.st_size > self.FULL_HASH_BYTES: return None
+        return self._stored_hash(filepath, st) or self._content_hash(filepath)
+    def _stored_hash(self, filepath: str, st: os.stat_result) -> str | None:
+        # Skrót z dotychczasowego manifestu, jeśli plik źródłowy się nie zmienił (rozmiar i mtime) - bez ponownego czytania pliku
+        try:
+            with open(self._manifest_path(filepath), 'r', encoding='utf-8') as f: manifest = json.load(f)
+            if manifest.get('format') == self.FORMAT_VERSION and manifest['size'] == st.st_size and manifest['mtime_ns'] == st.st_mtime_ns: return manifest['content_hash']
+        except (OSError, ValueError, KeyError, TypeError): pass
+        return None
+    @staticmethod
+    def _content_hash(filepath: str) -> str:
+        digest = hashlib.blake2b(digest_size=20)
+        with open(filepath, 'rb') as f:
+            for chunk in iter(lambda: f.read(1 << 20), b''): digest.update(chunk)
+        return digest.hexdigest()
+    @staticmethod
+    def _write_json(path: str, content: Dict[str, Any]):
+        tmp_path = f"{path}.{threading.get_ident()}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f: json.dump(content, f)
+        os.replace(tmp_path, path)
+
+def mapped_base(array: np.ndarray) -> np.memmap | None:
+    # Tablica np.memmap, której widokiem jest array (kolumna zmapowana z pliku), albo None dla danych w pamięci
+    base = array
+    while not isinstance(base, np.memmap) and isinstance(base.base, np.ndarray): base = base.base
+    return base if isinstance(base, np.memmap) else None
+
+def release_pages(array: np.ndarray):
+    # Zwalnia strony odwzorowania pliku z pamięci rezydentnej procesu (MADV_DONTNEED); dane pozostają w pliku
+    # i w buforze systemu, więc kolejny odczyt jedynie ponownie mapuje strony
+    base = mapped_base(array); mapping = getattr(base, '_mmap', None)
+    if mapping is None or not hasattr(mapping, 'madvise'): return
+    try: mapping.madvise(mmap.MADV_DONTNEED)
+    except (OSError, ValueError, AttributeError): pass
+
+def _readonly_buffer(values) -> np.ndarray:
+    # Ciągły bufor float64 tylko do odczytu; kolumny zmapowane z cache (np.memmap) i własne bufory już zamrożone
+    # (np. migawki bufora pierścieniowego) są używane bez kopiowania
+    array = np.asarray(values, dtype=np.float64)
+    if array.flags.owndata and not array.flags.writeable and array.flags.c_contiguous: return array
+    if not (mapped_base(array) is not None and array.flags.c_contiguous): array = np.array(array, dtype=np.float64, order='C')
+    array.setflags(write=False)
+    return array
+
+class Signal:
+    # Zbiór danych: ciągłe bufory x/y tylko do odczytu, licznik wersji danych oraz parametry wyświetlania i przetwarzania.
+    PARAMS = ('label', 'color', 'original_color', 'scale_factor', 'visible', 'smoothed', 'smoothing_method', 'smoothing_window', 'is_comparison')
+    __slots__ = ('x', 'y', 'columns', 'version') + PARAMS
+    _versions = itertools.count(1)
+    def __init__(self, x, y, label: str, color: str, columns: tuple = ('Time (ps)', 'Rad THz')):
+        self.x = _readonly_buffer(x); self.y = _readonly_buffer(y); self.columns = columns; self.version = next(Signal._versions)
+        self.label = label; self.color = color; self.original_color = color; self.scale_factor = 1.0; self.visible = True
+        self.smoothed = False; self.smoothing_method: str | None = None; self.smoothing_window: int | None = None; self.is_comparison = False
+    @classmethod
+    def from_frame(cls, df: pd.DataFrame, label: str, color: str) -> 'Signal':
+        return cls(df.iloc[:, 0].to_numpy(dtype=float), df.iloc[:, 1].to_numpy(dtype=float), label, color, (str(df.columns[0]), str(df.columns[1])))
+    def set_data(self, x, y): self.x = _readonly_buffer(x); self.y = _readonly_buffer(y); self.version = next(Signal._versions)
+    def params(self) -> Dict[str, Any]: return {name: getattr(self, name) for name in self.PARAMS}
+    def update(self, params: Dict[str, Any]):
+        for name, value in params.items(): setattr(self, name, value)
+    def derive(self, **params) -> 'SignalView':
+        # Ślad pochodny (np. porównanie z oryginałem) jako widok na ten sygnał - bez kopiowania buforów
+        return SignalView(self, **params)
+    @property
+    def nbytes(self) -> int: return self.x.nbytes + self.y.nbytes
+
+class SignalView(Signal):
+    # Widok na sygnał nadrzędny: bufory x/y, kolumny, wersja danych i scale_factor są odczytywane z rodzica (skala
+    # porównania podąża za skalą oryginału), a widok przechowuje tylko własne parametry wyświetlania i wygładzania.
+    DELEGATED = ('x', 'y', 'columns', 'version', 'scale_factor')
+    PARAMS = tuple(name for name in Signal.PARAMS if name != 'scale_factor')
+    __slots__ = ('parent',)
+    x = property(lambda self: self.parent.x); y = property(lambda self: self.parent.y); columns = property(lambda self: self.parent.columns)
+    version = property(lambda self: self.parent.version); scale_factor = property(lambda self: self.parent.scale_factor)
+    def __init__(self, parent: Signal, **params):
+        self.parent = parent.parent if isinstance(parent, SignalView) else parent
+        for name in self.PARAMS: setattr(self, name, getattr(parent, name))
+        self.update(params)
+    def update(self, params: Dict[str, Any]):
+        # Parametry delegowane (np. scale_factor z migawek sprzed utworzenia widoku) należą do rodzica i są pomijane
+        super().update({name: value for name, value in params.items() if name not in self.DELEGATED})
+    def set_data(self, x, y): raise TypeError("Dane widoku sygnału zmienia się przez sygnał nadrzędny.")
+    @property
+    def nbytes(self) -> int: return 0
+
+class DatasetIndex:
+    # Indeksy listy zbiorów danych (bez śladów porównawczych) utrzymywane przyrostowo: kolejność wczytania, etykieta -> plot_id
+    # oraz posortowana (bisect) lista etykiet widocznych sygnałów, więc wstawienie i wyszukanie nie skanują wszystkich zbiorów.
+    def __init__(self): self.clear()
+    def clear(self):
+        self._entries: Dict[str, tuple] = {}; self._order: List[str] = []; self._by_label: Dict[str, Dict[str, None]] = {}
+        self._visible: List[tuple] = []; self._labels_cache: List[str] | None = None
+    def __len__(self) -> int: return len(self._entries)
+    def __contains__(self, plot_id: str) -> bool: return plot_id in self._entries
+    def sync(self, plot_id: str, signal: Signal | None):
+        # Dodaje, aktualizuje (etykieta, widoczność) albo usuwa wpis (signal None lub ślad porównawczy); nowy wpis trafia na koniec kolejności
+        old = self._entries.get(plot_id); new = (signal.label, signal.visible) if signal is not None and not signal.is_comparison else None
+        if old == new: return
+        if old is not None:
+            bucket = self._by_label[old[0]]; del bucket[plot_id]
+            if not bucket: del self._by_label[old[0]]
+            if old[1]: del self._visible[bisect.bisect_left(self._visible, (old[0], plot_id))]
+        if new is None: del self._entries[plot_id]; self._order.remove(plot_id)
+        else:
+            if old is None: self._order.append(plot_id)
+            self._entries[plot_id] = new; self._by_label.setdefault(new[0], {})[plot_id] = None
+            if new[1]: bisect.insort(self._visible, (new[0], plot_id))
+        if (old and old[1]) or (new and new[1]): self._labels_cache = None
+    def label(self, plot_id: str) -> str: return self._entries[plot_id][0]
+    def is_visible(self, plot_id: str) -> bool: return self._entries[plot_id][1]
+    def order(self) -> List[str]: return self._order  # bez kopii - tylko do odczytu
+    def visible_ids(self, label: str) -> List[str]: return [plot_id for plot_id in self._by_label.get(label, ()) if self._entries[plot_id][1]]
+    def find_visible(self, label: str) -> str | None:
+        for plot_id in self._by_label.get(label, ()):
+            if self._entries[plot_id][1]: return plot_id
+        return None
+    def visible_labels(self) -> List[str]:
+        if self._labels_cache is None: self._labels_cache = [label for label, _ in self._visible]
+        return self._labels_cache
+    def matching(self, text: str) -> List[str]:
+        # plot_id w kolejności wczytania, których etykieta zawiera fragment (bez rozróżniania wielkości liter)
+        text = text.strip().lower()
+        if not text: return self._order
+        return [plot_id for plot_id in self._order if text in self._entries[plot_id][0].lower()]
+
+class DerivedDataCache:
+    # Cache LRU sygnałów pochodnych (skalowanych, wygładzonych, FFT) z budżetem w bajtach.
+    # Klucz: (plot_id, wersja danych, scale_factor, metoda, okno, domena); zmiana wersji danych unieważnia wpisy sygnału.
+    def __init__(self, max_bytes: int = 256 * 1024 * 1024):
+        self.max_bytes = max_bytes; self.current_bytes = 0
+        self._entries: OrderedDict = OrderedDict(); self._sizes: Dict[tuple, int] = {}; self._versions: Dict[str, int] = {}
+        self.hits = 0; self.misses = 0; self.evictions = 0
+    def get_or_compute(self, key: tuple, compute):
+        plot_id, version = key[0], key[1]
+        if self._versions.get(plot_id, version) != version: self.invalidate(plot_id)
+        self._versions[plot_id] = version
+        value = self._entries.get(key)
+        if value is not None: self._entries.move_to_end(key); self.hits += 1; return value
+        self.misses += 1; return self.put(key, compute())
+    def contains(self, key: tuple) -> bool: return key in self._entries and self._versions.get(key[0]) == key[1]
+    def get(self, key: tuple):
+        if not self.contains(key): return None
+        self._entries.move_to_end(key); self.hits += 1; return self._entries[key]
+    def put(self, key: tuple, value) -> tuple:
+        plot_id, version = key[0], key[1]
+        if self._versions.get(plot_id, version) != version: self.invalidate(plot_id)
+        self._versions[plot_id] = version; value = tuple(value)
+        if key in self._entries: self._pop(key)
+        for arr in value:
+            if isinstance(arr, np.ndarray): arr.setflags(write=False)
+        size = sum(getattr(item, 'nbytes', 0) for item in value)
+        if size > self.max_bytes: return value
+        self._entries[key] = value; self._sizes[key] = size; self.current_bytes += size
+        while self.current_bytes > self.max_bytes: self._pop(next(iter(self._entries))); self.evictions += 1
+        return value
+    def resize(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        while self.current_bytes > self.max_bytes: self._pop(next(iter(self._entries))); self.evictions += 1
+    def invalidate(self, plot_id: str):
+        for key in [k for k in self._entries if k[0] == plot_id]: self._pop(key)
+        self._versions.pop(plot_id, None)
+    def clear(self): self._entries.clear(); self._sizes.clear(); self._versions.clear(); self.current_bytes = 0
+    def stats(self) -> Dict[str, Any]:
+        total = self.hits + self.misses
+        return {'entries': len(self._entries), 'bytes': self.current_bytes, 'hits': self.hits, 'misses': self.misses, 'evictions': self.evictions, 'hit_rate': self.hits / total if total else 0.0}
+    def _pop(self, key: tuple): del self._entries[key]; self.current_bytes -= self._sizes.pop(key)
+
+class SpectralEngine:
+    # Widma amplitudowe liczone przez rfft: sygnały o tej samej długości i kroku czasowym są składane w tablicę 2D
+    # i transformowane jednym wywołaniem; niejednorodne osie czasu są przepróbkowywane na buforowaną siatkę jednorodną.
+    # Widma zespolone (complex_transform) służą do transmisji i fazy względem widma referencji (relative).
+    WINDOWS: Dict[str, Any] = {"Brak": None, "Hann": "hann", "Hamming": "hamming", "Blackman": "blackman", "Tukey": ("tukey", 0.25)}
+    def __init__(self, window: str = "Brak", zero_pad: bool = False, uniform_rtol: float = 1e-2):
+        self.window = window; self.zero_pad = zero_pad; self.uniform_rtol = uniform_rtol
+        self._grids: Dict[tuple, np.ndarray] = {}; self._windows: Dict[tuple, np.ndarray] = {}
+    QUANTITIES = ('transmission', 'phase')
+    REFERENCE_FLOOR = 1e-3  # próg |S_ref| względem maksimum widma referencji - poza pasmem powyżej progu stosunek jest tylko szumem
+    def config_key(self) -> tuple: return (self.window, self.zero_pad)
+    def transform(self, signals: List[tuple]) -> List[tuple]: return self._transform(signals, lambda spectra, norm: np.abs(spectra) * norm)
+    def complex_transform(self, signals: List[tuple]) -> List[tuple]: return self._transform(signals, lambda spectra, norm: spectra)
+    def relative(self, spectra: List[tuple], reference: tuple, quantity: str) -> List[tuple]:
+        # spectra, reference: (częstotliwości, widmo zespolone). Widma na wspólnej siatce częstotliwości dzielone są przez widmo
+        # referencji jednym działaniem na bloku 2D; quantity: 'transmission' -> |S/S_ref|, 'phase' -> rozwinięta faza arg(S/S_ref) [rad]
+        if quantity not in self.QUANTITIES: raise ValueError(f"Nieznana wielkość widma względnego: {quantity}")
+        results: List[Any] = [None] * len(spectra); groups: Dict[tuple, List[int]] = {}
+        for i, (freqs, spectrum) in enumerate(spectra):
+            if len(freqs) < 2 or not np.iscomplexobj(spectrum): results[i] = (freqs[:0], np.empty(0)); continue
+            groups.setdefault((len(freqs), float(f"{freqs[1] - freqs[0]:.12g}")), []).append(i)
+        ref_freqs, ref_spectrum = reference
+        for members in groups.values():
+            freqs = spectra[members[0]][0]; ref_on_grid = self._on_frequency_grid(freqs, ref_freqs, ref_spectrum)
+            magnitude = np.abs(ref_on_grid); floor = self.REFERENCE_FLOOR * (float(magnitude.max()) if magnitude.size else 0.0)
+            valid = magnitude >= floor if floor > 0 else np.zeros(magnitude.size, bool)
+            if not valid.any():
+                for i in members: results[i] = (freqs[:0], np.empty(0))
+                continue
+            # ciągłe pasmo powyżej progu wokół piku referencji - wewnątrz niego dzielenie jest zawsze dobrze uwarunkowane
+            peak = int(np.argmax(magnitude)); invalid = np.flatnonzero(~valid); below, above = invalid[invalid < peak], invalid[invalid > peak]
+            band = slice(int(below[-1]) + 1 if below.size else 0, int(above[0]) if above.size else len(freqs))
+            ratio = np.vstack([spectra[i][1][band] for i in members]) / ref_on_grid[band]
+            values = np.abs(ratio) if quantity == 'transmission' else np.unwrap(np.angle(ratio), axis=-1)
+            for row, i in enumerate(members): results[i] = (freqs[band], values[row])
+        return results
+    @staticmethod
+    def _on_frequency_grid(freqs: np.ndarray, ref_freqs: np.ndarray, ref_spectrum: np.ndarray) -> np.ndarray:
+        # Widmo referencji o innej długości/kroku interpolowane jest na siatkę próbek (część rzeczywista i urojona osobno), zero poza zakresem
+        if len(freqs) == len(ref_freqs) and np.allclose(freqs[[0, -1]], ref_freqs[[0, -1]]): return ref_spectrum
+        return np.interp(freqs, ref_freqs, ref_spectrum.real, right=0.0) + 1j * np.interp(freqs, ref_freqs, ref_spectrum.imag, right=0.0)
+    def _transform(self, signals: List[tuple], finish) -> List[tuple]:
+        from scipy.fft import rfft, rfftfreq, next_fast_len
+        results: List[Any] = [None] * len(signals); groups: Dict[tuple, List[tuple]] = {}
+        for i, (x_data, y_data) in enumerate(signals):
+            if len(x_data) < 2: results[i] = (x_data, y_data); continue
+            x_uniform, y_uniform = self._on_uniform_grid(np.asarray(x_data, dtype=float), np.asarray(y_data, dtype=float))
+            time_step = (x_uniform[-1] - x_uniform[0]) / (len(x_uniform) - 1)
+            groups.setdefault((len(x_uniform), float(f"{time_step:.12g}")), []).append((i, y_uniform))
+        for (n_points, time_step), members in groups.items():
+            block = np.vstack([y for _, y in members]); window = self._get_window(n_points)
+            n_fft = next_fast_len(n_points, real=True) if self.zero_pad else n_points
+            if window is not None: block = block * window; gain = 2.0 / float(np.sum(window))
+            else: gain = 2.0 / n_points
+            # Widmo jednostronne: podwajane są tylko prążki z parą ujemnych częstotliwości - bez składowej stałej i (parzyste n_fft) prążka Nyquista
+            norm = np.full(n_fft // 2 + 1, gain); norm[0] = gain / 2
+            if n_fft % 2 == 0: norm[-1] = gain / 2
+            values = finish(rfft(block, n=n_fft, axis=-1), norm); freqs = rfftfreq(n_fft, time_step) # krok w ps -> częstotliwość w THz
+            for row, (i, _) in enumerate(members): results[i] = (freqs, values[row])
+        return results
+    def _on_uniform_grid(self, x_data: np.ndarray, y_data: np.ndarray):
+        n_points = len(x_data); time_step = (x_data[-1] - x_data[0]) / (n_points - 1); steps = np.diff(x_data)
+        if time_step > 0 and np.max(np.abs(steps - time_step)) <= self.uniform_rtol * time_step: return x_data, y_data
+        logging.info(f"Niejednorodna oś czasu ({n_points} pkt.) - przepróbkowanie na siatkę jednorodną przed FFT.")
+        if np.any(steps <= 0): order = np.argsort(x_data, kind='stable'); x_data, y_data = x_data[order], y_data[order]
+        grid_key = (float(x_data[0]), float(x_data[-1]), n_points); grid = self._grids.get(grid_key)
+        if grid is None:
+            if len(self._grids) >= 64: self._grids.clear()
+            grid = self._grids[grid_key] = np.linspace(x_data[0], x_data[-1], n_points)
+        return grid, np.interp(grid, x_data, y_data)
+    def _get_window(self, n_points: int):
+        spec = self.WINDOWS.get(self.window)
+        if spec is None: return None
+        key = (self.window, n_points); window = self._windows.get(key)
+        if window is None:
+            if len(self._windows) >= 64: self._windows.clear()
+            from scipy.signal import get_window
+            window = self._windows[key] = get_window(spec, n_points, fftbins=False)
+        return window
+
+class MinMaxPyramid:
+    # Piramida min/max budowana raz dla sygnału: każdy poziom przechowuje indeksy próbki minimalnej i maksymalnej
+    # w kubełkach o rosnącym rozmiarze, więc zdecymowany widok zawiera dokładne wartości pików.
+    BASE_BUCKET = 4
+    def __init__(self, x_data: np.ndarray, y_data: np.ndarray):
+        self.x = x_data; self.y = y_data; n_points = len(y_data); bucket = self.BASE_BUCKET
+        n_buckets = -(-n_points // bucket); padded = np.empty(n_buckets * bucket); padded[:n_points] = y_data; padded[n_points:] = y_data[-1]
+        blocks = padded.reshape(n_buckets, bucket); offsets = np.arange(n_buckets) * bucket
+        index_type = np.int32 if n_points < 2 ** 31 else np.int64  # indeksy 32-bitowe: połowa pamięci piramidy (np. śladów porównawczych)
+        idx_min = np.minimum(blocks.argmin(axis=1) + offsets, n_points - 1).astype(index_type); idx_max = np.minimum(blocks.argmax(axis=1) + offsets, n_points - 1).astype(index_type)
+        self.levels: List[tuple] = [(bucket, idx_min, idx_max)]
+        while len(idx_min) > 2:
+            if len(idx_min) % 2: idx_min = np.append(idx_min, idx_min[-1]); idx_max = np.append(idx_max, idx_max[-1])
+            pairs_min, pairs_max = idx_min.reshape(-1, 2), idx_max.reshape(-1, 2); rows = np.arange(len(pairs_min))
+            idx_min = pairs_min[rows, y_data[pairs_min].argmin(axis=1)]; idx_max = pairs_max[rows, y_data[pairs_max].argmax(axis=1)]
+            bucket *= 2; self.levels.append((bucket, idx_min, idx_max))
+    def view(self, x_min: float, x_max: float, width_px: int):
+        n_points = len(self.x); target = max(int(width_px), 1)
+        start = max(int(np.searchsorted(self.x, x_min, 'left')) - 1, 0); stop = min(int(np.searchsorted(self.x, x_max, 'right')) + 1, n_points)
+        if stop - start <= 2 * target: return self.x[start:stop], self.y[start:stop]
+        bucket, idx_min, idx_max = next((level for level in self.levels if (stop - start) / level[0] <= target), self.levels[-1])
+        first, last = start // bucket, -(-stop // bucket); low, high = idx_min[first:last], idx_max[first:last]
+        indices = np.column_stack([np.minimum(low, high), np.maximum(low, high)]).ravel()
+        return self.x[indices], self.y[indices]
+
+class OutOfCoreSignal:
+    # Indeks sygnału zmapowanego z dysku (tryb out-of-core). Jeden przebieg blokami po CHUNK próbek buduje przegląd min/max
+    # całego sygnału (obwiednię o stałej liczbie kubełków) i sprawdza posortowanie osi X; później do pamięci trafia
+    # tylko wybrane okno próbek z marginesem filtra, a strony odwzorowania są zwalniane po każdym odczycie.
+    CHUNK = 1 << 20
+    def __init__(self, x_data: np.ndarray, y_data: np.ndarray, overview_buckets: int = 1 << 16):
+        self.x = x_data; self.y = y_data; n_points = len(y_data); bucket = self.bucket = max(-(-n_points // max(overview_buckets, 1)), 1)
+        step = max(self.CHUNK // bucket, 1) * bucket; lows, highs = [], []; self.x_sorted = True; previous = None
+        for start in range(0, n_points, step):
+            x_chunk = np.asarray(x_data[start:start + step]); y_chunk = np.asarray(y_data[start:start + step]); count = len(y_chunk)
+            if self.x_sorted: self.x_sorted = bool(np.all(np.diff(x_chunk) >= 0)) and (previous is None or x_chunk[0] >= previous); previous = x_chunk[-1]
+            n_buckets = -(-count // bucket); padded = np.empty(n_buckets * bucket); padded[:count] = y_chunk; padded[count:] = y_chunk[-1]
+            blocks = padded.reshape(n_buckets, bucket); offsets = np.arange(n_buckets) * bucket
+            lows.append(np.minimum(blocks.argmin(axis=1) + offsets, count - 1) + start); highs.append(np.minimum(blocks.argmax(axis=1) + offsets, count - 1) + start)
+        low, high = (np.concatenate(lows), np.concatenate(highs)) if lows else (np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64))
+        indices = np.column_stack([np.minimum(low, high), np.maximum(low, high)]).ravel()
+        self.overview_x = np.asarray(x_data[indices], dtype=np.float64); self.overview_y = np.asarray(y_data[indices], dtype=np.float64)
+        self.y_min = float(self.overview_y.min()) if indices.size else 0.0; self.y_max = float(self.overview_y.max()) if indices.size else 0.0
+        self.x_min = float(self.overview_x.min()) if indices.size else 0.0; self.x_max = float(self.overview_x.max()) if indices.size else 0.0
+        if n_points: self.x_min, self.x_max = (float(x_data[0]), float(x_data[-1])) if self.x_sorted else (min(self.x_min, float(x_data[0])), max(self.x_max, float(x_data[-1])))
+        self.release()
+    def __len__(self) -> int: return len(self.y)
+    @property
+    def nbytes(self) -> int: return self.overview_x.nbytes + self.overview_y.nbytes
+    @property
+    def max_abs(self) -> float: return max(abs(self.y_min), abs(self.y_max))
+    def bounds(self, scale_factor: float = 1.0) -> tuple:
+        y_limits = sorted((self.y_min * scale_factor, self.y_max * scale_factor)); return self.x_min, self.x_max, y_limits[0], y_limits[1]
+    def index_range(self, x_min: float, x_max: float) -> tuple:
+        # Wyszukiwanie binarne w zmapowanej osi X dotyka tylko kilku stron pliku
+        if not self.x_sorted: return 0, len(self.y)
+        return max(int(np.searchsorted(self.x, x_min, 'left')) - 1, 0), min(int(np.searchsorted(self.x, x_max, 'right')) + 1, len(self.y))
+    def window(self, start: int, stop: int, process=None, margin: int = 0) -> tuple:
+        # Kopia okna [start, stop) w pamięci; process (skalowanie, wygładzanie) działa na oknie rozszerzonym o margin próbek
+        low, high = max(start - margin, 0), min(stop + margin, len(self.y))
+        x_window = np.array(self.x[start:stop], dtype=np.float64); y_window = np.array(self.y[low:high], dtype=np.float64)
+        if process is not None: y_window = process(y_window)
+        self.release(); return x_window, np.ascontiguousarray(y_window[start - low:stop - low])
+    def envelope(self, start: int, stop: int, scale_factor: float = 1.0) -> tuple:
+        # Obwiednia min/max zakresu [start, stop) z przeglądu - bez odczytu próbek z dysku
+        first, last = 2 * (start // self.bucket), 2 * -(-stop // self.bucket)
+        return self.overview_x[first:last], self.overview_y[first:last] * scale_factor
+    def release(self): release_pages(self.x); release_pages(self.y)
+
+class SessionFile:
+    # Jednoplikowy zapis sesji: nagłówek (MAGIC, przesunięcie i długość metadanych), bloki tablic wyrównane do ALIGN bajtów
+    # i na końcu metadane JSON (stan obszaru roboczego + opis tablic). Tablice zapisywane są fragmentami po CHUNK elementów;
+    # bez kompresji przy odczycie są widokami jednego odwzorowania pliku (np.memmap - dane ładowane leniwie przez system),
+    # z kompresją każdy fragment jest tasowany bajtowo (lepszy współczynnik dla float64) i kompresowany zlib, a przy odczycie
+    # fragmenty są dekompresowane równolegle (zlib zwalnia GIL).
+    MAGIC = b'DAVSESS1'; FORMAT_VERSION = 1; ALIGN = 64; CHUNK = 1 << 20; HEADER = struct.Struct('<8sQQ'); DESCRIPTION = "plikiem sesji DaVisu"
+    @classmethod
+    def save(cls, path: str, state: Dict[str, Any], arrays: Dict[str, np.ndarray], compress: bool = False, level: int = 1):
+        writer = ContainerWriter(cls, path, compress, level)
+        try:
+            for name, array in arrays.items(): writer.add(name, array)
+            writer.close(state)
+        except BaseException: writer.abort(); raise
+    @classmethod
+    def load(cls, path: str) -> tuple:
+        # Zwraca (stan, {nazwa: tablica}); tablice bez kompresji są widokami tylko do odczytu na odwzorowaniu pliku
+        with open(path, 'rb') as f:
+            magic, meta_offset, meta_length = cls.HEADER.unpack(f.read(cls.HEADER.size))
+            if magic != cls.MAGIC: raise ValueError(f"'{path}' nie jest {cls.DESCRIPTION}.")
+            f.seek(meta_offset); meta = json.loads(f.read(meta_length).decode('utf-8'))
+        if meta.get('format') != cls.FORMAT_VERSION: raise ValueError(f"Nieobsługiwana wersja pliku sesji: {meta.get('format')}.")
+        mapping = np.memmap(path, dtype=np.uint8, mode='r') if any(e['codec'] == 'raw' for e in meta['arrays'].values()) else None; arrays = {}
+        compressed = {name: entry for name, entry in meta['arrays'].items() if entry['codec'] != 'raw'}
+        for name, entry in meta['arrays'].items():
+            if entry['codec'] != 'raw': continue
+            dtype = np.dtype(entry['dtype']); count = int(np.prod(entry['shape'], dtype=np.int64))
+            arrays[name] = mapping[entry['offset']:entry['offset'] + count * dtype.itemsize].view(dtype).reshape(entry['shape'])
+        if compressed:
+            with open(path, 'rb') as f, ThreadPoolExecutor(max_workers=os.cpu_count() or 1) as executor:
+                jobs = []
+                for name, entry in compressed.items():
+                    blobs = []
+                    for offset, length, _ in entry['chunks']: f.seek(offset); blobs.append(f.read(length))
+                    jobs.append((name, entry, [executor.submit(cls._decode, blob, np.dtype(entry['dtype']), count) for blob, (_, _, count) in zip(blobs, entry['chunks'])]))
+                for name, entry, futures in jobs:
+                    parts = [future.result() for future in futures]; array = (np.concatenate(parts) if parts else np.zeros(0, dtype=entry['dtype'])).reshape(entry['shape'])
+                    array.setflags(write=False); arrays[name] = array
+        return meta['state'], arrays
+    @staticmethod
+    def _shuffle(piece: np.ndarray) -> bytes: return piece.view(np.uint8).reshape(-1, piece.dtype.itemsize).T.tobytes()
+    @staticmethod
+    def _decode(blob: bytes, dtype: np.dtype, count: int) -> np.ndarray:
+        raw = np.frombuffer(zlib.decompress(blob), dtype=np.uint8).reshape(dtype.itemsize, count)
+        return np.ascontiguousarray(raw.T).view(dtype).reshape(count)
+
+class ContainerWriter:
+    # Strumieniowy zapis kontenera SessionFile/ColumnarFile do pliku tymczasowego: tablice dopisywane są kolejno (także fragmentami,
+    # bez składania całej tablicy w pamięci), a close() dopisuje metadane, uzupełnia nagłówek i podmienia plik docelowy.
+    def __init__(self, container, path: str, compress: bool = False, level: int = 1):
+        self.container = container; self.path = path; self.compress = compress; self.level = level; self.described: Dict[str, Any] = {}
+        self.tmp_path = f"{path}.{threading.get_ident()}.tmp"; self._f = open(self.tmp_path, 'wb'); self._f.write(container.HEADER.pack(container.MAGIC, 0, 0))
+        self._executor = ThreadPoolExecutor(max_workers=os.cpu_count() or 1) if compress else None
+    def add(self, name: str, array: np.ndarray):
+        array = np.ascontiguousarray(array); self.add_chunks(name, [array.reshape(-1)], array.dtype, array.shape)
+    def add_chunks(self, name: str, chunks, dtype=np.float64, shape: tuple | None = None):
+        # chunks: kolejne fragmenty tablicy 1D (np. okna przetworzonego sygnału); kształt domyślnie z łącznej liczby elementów
+        f = self._f; f.write(b'\0' * (-f.tell() % self.container.ALIGN)); dtype = np.dtype(dtype); size = 0
+        entry: Dict[str, Any] = {'dtype': dtype.str, 'offset': f.tell(), 'codec': 'zlib-shuffle' if self.compress else 'raw'}
+        if self.compress: entry['chunks'] = []
+        for chunk in chunks:
+            flat = np.ascontiguousarray(chunk, dtype=dtype).reshape(-1); size += flat.size
+            pieces = [flat[start:start + self.container.CHUNK] for start in range(0, flat.size, self.container.CHUNK)]
+            if self.compress:
+                for piece, blob in zip(pieces, self._executor.map(lambda piece: zlib.compress(self.container._shuffle(piece), self.level), pieces)):
+                    entry['chunks'].append([f.tell(), len(blob), piece.size]); f.write(blob)
+            else:
+                for piece in pieces: f.write(piece.tobytes())
+        entry['shape'] = list(shape) if shape is not None else [size]; self.described[name] = entry
+    def close(self, state: Dict[str, Any]):
+        f = self._f; meta = json.dumps({'format': self.container.FORMAT_VERSION, 'state': state, 'arrays': self.described}).encode('utf-8'); meta_offset = f.tell()
+        f.write(meta); f.seek(0); f.write(self.container.HEADER.pack(self.container.MAGIC, meta_offset, len(meta))); self._release()
+        os.replace(self.tmp_path, self.path)
+    def abort(self):
+        self._release()
+        if os.path.exists(self.tmp_path): os.remove(self.tmp_path)
+    def _release(self):
+        self._f.close()
+        if self._executor is not None: self._executor.shutdown()
+
+class ColumnarFile(SessionFile):
+    # Binarny plik kolumnowy eksportu danych: ten sam kontener co sesja (kolumny wyrównane, zapis fragmentami, odczyt przez
+    # odwzorowanie pliku, metadane JSON), z własnym MAGIC, aby nie był mylony z plikiem sesji
+    MAGIC = b'DAVCOLS1'; DESCRIPTION = "binarnym plikiem kolumnowym DaVisu"
+
+class SignalExporter:
+    # Strumieniowy eksport przetworzonych sygnałów, ich widm i statystyk. Każdy sygnał zapisywany jest blokami po CHUNK_ROWS
+    # wierszy (pamięć ograniczona do bloku, a dla sygnałów out-of-core także do okna przetwarzania), a liczby w CSV formatowane
+    # są wektorowo (format_rows). Formaty: 'csv' - katalog z plikami <nazwa>_processed.csv, <nazwa>_fft.csv i stats.csv (jak
+    # davisu_batch), 'npz' - członkowie .npy dopisywani kolejno do archiwum (np.load), 'columnar' - ColumnarFile.
+    # Formatowanie % trzyma GIL, więc przy workers > 1 bloki CSV formatowane są w puli procesów (spawn - bezpieczny przy wątkach
+    # aplikacji), a zapis zachowuje kolejność przy ograniczonej liczbie bloków w locie.
+    FORMATS = ('csv', 'npz', 'columnar'); CHUNK_ROWS = 1 << 16; CSV_CHUNK_ROWS = 1 << 14; FLOAT_FORMAT = '%.9g'
+    STATS_FIELDS = ('name', 'points', 'scale_factor', 'smoothing', 'max', 'min', 'mean', 'peak_position')
+    def __init__(self, fmt: str, path: str, time_columns: tuple = ('Time (ps)', 'Signal (a.u.)'), spectrum_columns: tuple = ('Frequency (THz)', 'FFT Amplitude (a.u.)'), workers: int = 1):
+        if fmt not in self.FORMATS: raise ValueError(f"Nieznany format eksportu: {fmt}")
+        self.fmt = fmt; self.path = path; self.time_columns = time_columns; self.spectrum_columns = spectrum_columns; self.workers = workers; self._pool = None
+        self.rows: List[Dict[str, Any]] = []; self._keys: set = set(); self._written: List[str] = []; self._zip = self._container = None
+        if fmt == 'csv': os.makedirs(path, exist_ok=True)
+        elif fmt == 'npz': self._tmp_path = f"{path}.{threading.get_ident()}.tmp"; self._zip = zipfile.ZipFile(self._tmp_path, 'w', zipfile.ZIP_STORED, allowZip64=True)
+        else: self._container = ContainerWriter(ColumnarFile, path)
+    def write(self, name: str, x: np.ndarray, y_window, spectrum: tuple | None = None, info: Dict[str, Any] | None = None, is_cancelled=lambda: False) -> Dict[str, Any] | None:
+        # y_window(start, stop) -> przetworzone próbki [start, stop); zwraca wiersz statystyk albo None po anulowaniu
+        key = self._unique_key(name); n_points = len(x); chunk_rows = self.CSV_CHUNK_ROWS if self.fmt == 'csv' else self.CHUNK_ROWS
+        blocks = [(start, min(start + chunk_rows, n_points)) for start in range(0, n_points, chunk_rows)]
+        stats = {'max': -np.inf, 'min': np.inf, 'sum': 0.0, 'peak': -1.0, 'peak_position': float('nan')}
+        def signal_blocks():
+            for start, stop in blocks:
+                if is_cancelled(): return
+                x_block = np.asarray(x[start:stop], dtype=float); y_block = np.asarray(y_window(start, stop), dtype=float); self._update_stats(stats, x_block, y_block)
+                yield x_block, y_block
+        if self.fmt == 'csv':
+            path = os.path.join(self.path, f"{key}_processed.csv"); self._written.append(path)
+            self._write_csv(path, self.time_columns, ([x_block, y_block] for x_block, y_block in signal_blocks()))
+        else:
+            self._add_column(f"{key}/time", (np.asarray(x[start:stop], dtype=float) for start, stop in blocks if not is_cancelled()), n_points)
+            self._add_column(f"{key}/signal", (y_block for _, y_block in signal_blocks()), n_points)
+        if is_cancelled(): return None
+        if spectrum is not None and len(spectrum[0]):
+            freqs, values = np.asarray(spectrum[0], dtype=float), np.asarray(spectrum[1], dtype=float)
+            if self.fmt == 'csv':
+                path = os.path.join(self.path, f"{key}_fft.csv"); self._written.append(path)
+                self._write_csv(path, self.spectrum_columns, ([freqs[start:start + self.CSV_CHUNK_ROWS], values[start:start + self.CSV_CHUNK_ROWS]] for start in range(0, len(freqs), self.CSV_CHUNK_ROWS)))
+            else: self._add_column(f"{key}/frequency", [freqs], len(freqs)); self._add_column(f"{key}/spectrum", [values], len(values))
+        info = info or {}
+        row = {'name': name, 'points': n_points, 'scale_factor': float(info.get('scale_factor', 1.0)), 'smoothing': str(info.get('smoothing') or ''),
+               'max': stats['max'] if n_points else float('nan'), 'min': stats['min'] if n_points else float('nan'),
+               'mean': stats['sum'] / n_points if n_points else float('nan'), 'peak_position': stats['peak_position']}
+        self.rows.append({**row, 'key': key}); return row
+    def close(self):
+        # Tabela statystyk i zamknięcie pliku; dla .npz i formatu kolumnowego dopiero tu plik tymczasowy zastępuje docelowy
+        self._shutdown_pool()
+        if self.fmt == 'csv':
+            path = os.path.join(self.path, 'stats.csv'); self._written.append(path)
+            with open(path, 'w', encoding='utf-8', newline='') as f:
+                f.write(','.join(self.STATS_FIELDS) + '\n')
+                for row in self.rows: f.write(','.join(self._csv_field(row[field]) for field in self.STATS_FIELDS) + '\n')
+        elif self.fmt == 'npz':
+            table = np.array([tuple(row[field] for field in self.STATS_FIELDS) for row in self.rows], dtype=self._stats_dtype())
+            with self._zip.open('stats.npy', 'w', force_zip64=True) as member: np.lib.format.write_array(member, table)
+            with self._zip.open('keys.npy', 'w', force_zip64=True) as member: np.lib.format.write_array(member, np.array([row['key'] for row in self.rows], dtype=str))
+            self._zip.close(); os.replace(self._tmp_path, self.path)
+        else: self._container.close({'signals': self.rows, 'time_columns': list(self.time_columns), 'spectrum_columns': list(self.spectrum_columns)})
+    def abort(self):
+        # Usuwa częściowy wynik (pliki CSV zapisane do tej pory albo plik tymczasowy)
+        self._shutdown_pool()
+        if self.fmt == 'csv':
+            for path in self._written:
+                if os.path.exists(path): os.remove(path)
+        elif self.fmt == 'npz':
+            self._zip.close()
+            if os.path.exists(self._tmp_path): os.remove(self._tmp_path)
+        else: self._container.abort()
+    def _write_csv(self, path: str, header: tuple, blocks):
+        with open(path, 'w', encoding='utf-8', newline='') as f:
+            f.write(','.join(header) + '\n')
+            if self.workers < 2:
+                for columns in blocks: f.write(format_rows(columns, ',', self.FLOAT_FORMAT))
+                return
+            if self._pool is None:
+                import multiprocessing
+                from concurrent.futures import ProcessPoolExecutor
+                self._pool = ProcessPoolExecutor(max_workers=self.workers, mp_context=multiprocessing.get_context('spawn'))
+            pending: deque = deque()
+            for columns in blocks:
+                pending.append(self._pool.submit(format_rows, columns, ',', self.FLOAT_FORMAT))
+                if len(pending) >= 2 * self.workers: f.write(pending.popleft().result())
+            while pending: f.write(pending.popleft().result())
+    def _shutdown_pool(self):
+        if self._pool is not None: self._pool.shutdown(cancel_futures=True); self._pool = None
+    def _add_column(self, name: str, chunks, n_points: int):
+        if self._container is not None: self._container.add_chunks(name, chunks); return
+        with self._zip.open(f"{name}.npy", 'w', force_zip64=True) as member:
+            np.lib.format.write_array_header_1_0(member, {'descr': np.lib.format.dtype_to_descr(np.dtype(float)), 'fortran_order': False, 'shape': (n_points,)})
+            for chunk in chunks: member.write(np.ascontiguousarray(chunk, dtype=float).tobytes())
+    def _unique_key(self, name: str) -> str:
+        base = re.sub(r'[^\w.-]+', '_', name).strip('_.') or 'sygnal'; key = base
+        for suffix in itertools.count(2):
+            if key.lower() not in self._keys: break
+            key = f"{base}_{suffix}"
+        self._keys.add(key.lower()); return key
+    def _stats_dtype(self) -> np.dtype:
+        text_width = max([1] + [len(str(row[field])) for row in self.rows for field in ('name', 'smoothing')])
+        return np.dtype([('name', f'U{text_width}'), ('points', 'i8'), ('scale_factor', 'f8'), ('smoothing', f'U{text_width}'), ('max', 'f8'), ('min', 'f8'), ('mean', 'f8'), ('peak_position', 'f8')])
+    @staticmethod
+    def _update_stats(stats: Dict[str, float], x_block: np.ndarray, y_block: np.ndarray):
+        # Statystyki jak w SignalSummary.stats(), liczone przyrostowo po blokach
+        if not y_block.size: return
+        stats['max'] = max(stats['max'], float(y_block.max())); stats['min'] = min(stats['min'], float(y_block.min())); stats['sum'] += float(y_block.sum())
+        index = int(np.argmax(np.abs(y_block)))
+        if abs(y_block[index]) > stats['peak']: stats['peak'] = float(abs(y_block[index])); stats['peak_position'] = float(x_block[index])
+    @staticmethod
+    def _csv_field(value) -> str:
+        if isinstance(value, str): return '"' + value.replace('"', '""') + '"' if any(c in value for c in ',"\n') else value
+        return SignalExporter.FLOAT_FORMAT % value if isinstance(value, float) else str(value)
+
+class RingBuffer:
+    # Bufor pierścieniowy próbek (x, y) o stałej pojemności: dopisywanie jest wektorowe, najstarsze próbki są nadpisywane,
+    # więc pamięć pozostaje ograniczona niezależnie od czasu trwania pomiaru.
+    def __init__(self, capacity: int):
+        self.capacity = max(int(capacity), 2); self._x = np.empty(self.capacity); self._y = np.empty(self.capacity)
+        self._start = 0; self.size = 0; self.total_appended = 0
+    def append(self, samples: np.ndarray):
+        if len(samples) == 0: return
+        self.total_appended += len(samples); samples = samples[-self.capacity:]; count = len(samples)
+        end = (self._start + self.size) % self.capacity; first = min(count, self.capacity - end)
+        self._x[end:end + first] = samples[:first, 0]; self._y[end:end + first] = samples[:first, 1]
+        self._x[:count - first] = samples[first:, 0]; self._y[:count - first] = samples[first:, 1]
+        overflow = max(self.size + count - self.capacity, 0); self._start = (self._start + overflow) % self.capacity
+        self.size = min(self.size + count, self.capacity)
+    def clear(self): self._start = 0; self.size = 0
+    def snapshot(self) -> tuple:
+        # Uporządkowana chronologicznie kopia zawartości (tylko do odczytu)
+        if self._start + self.size <= self.capacity: x, y = self._x[self._start:self._start + self.size].copy(), self._y[self._start:self._start + self.size].copy()
+        else: wrap = self._start + self.size - self.capacity; x, y = (np.concatenate((values[self._start:], values[:wrap])) for values in (self._x, self._y))
+        x.setflags(write=False); y.setflags(write=False)
+        return x, y
+
+_WHITESPACE = np.zeros(256, dtype=bool); _WHITESPACE[list(b' \t\n\r\x0b\x0c')] = True
+
+def _tokens_per_line(text: bytes) -> np.ndarray:
+    # Liczba tokenów (jak w bytes.split()) w każdej linii zakończonej '\n' - wektorowo, bez pętli po liniach
+    buf = np.frombuffer(text, dtype=np.uint8); blank = _WHITESPACE[buf]
+    starts = np.flatnonzero(blank[:-1] & ~blank[1:]) + 1
+    if not blank[0]: starts = np.concatenate(([0], starts))
+    return np.bincount(np.searchsorted(np.flatnonzero(buf == 10), starts), minlength=1)
+
+def parse_numeric_lines(text: bytes) -> np.ndarray:
+    # Zamienia pełne linie tekstu na tablicę (n, 2) pierwszych dwóch kolumn; szybka ścieżka tylko dla bloków, w których
+    # każda niepusta linia ma tyle kolumn co pierwsza - przy komentarzach lub nierównych wierszach parsowanie linia po linii
+    lines = text.splitlines(); first = next((line for line in lines if line.strip()), None)
+    if first is None: return np.empty((0, 2))
+    n_columns = len(first.split())
+    if n_columns >= 2:
+        try:
+            values = np.array(text.split(), dtype=float); counts = _tokens_per_line(text)
+            if np.all((counts == n_columns) | (counts == 0)): return values.reshape(-1, n_columns)[:, :2]
+        except ValueError: pass
+    rows = []
+    for line in lines:
+        tokens = line.split()
+        if len(tokens) < 2 or tokens[0].startswith(b'#'): continue
+        try: rows.append((float(tokens[0]), float(tokens[1])))
+        except ValueError: continue
+    return np.array(rows, dtype=float).reshape(-1, 2)
+
+class FileTail:
+    # Odczytuje tylko nowe, dopisane na końcu linie pliku (lub potoku nazwanego FIFO jako zastępstwa gniazda akwizycji).
+    # Niepełna ostatnia linia czeka w buforze na dokończenie. Skrócenie pliku, podmiana (nowy i-węzeł) albo nadpisanie
+    # (zmienione ostatnie odczytane bajty) oznacza nowy pomiar i zerowanie stanu.
+    ANCHOR_BYTES = 64
+    def __init__(self, path: str, skip_header: bool = True, max_read: int = 4 * 1024 * 1024):
+        self.path = path; self.skip_header = skip_header; self.max_read = max_read
+        self._fd: int | None = None; self._is_fifo = False; self._offset = 0; self._remainder = b''; self._header_pending = skip_header; self._anchor = b''
+    def _rewritten(self) -> bool:
+        path_stat = os.stat(self.path)
+        if path_stat.st_ino != os.fstat(self._fd).st_ino: os.close(self._fd); self._fd = os.open(self.path, os.O_RDONLY); return True
+        if path_stat.st_size < self._offset: return True
+        if not self._anchor: return False
+        os.lseek(self._fd, self._offset - len(self._anchor), os.SEEK_SET); return os.read(self._fd, len(self._anchor)) != self._anchor
+    def read_new(self) -> tuple:
+        # Zwraca (próbki (n, 2), czy_wyzerowano)
+        reset = False
+        if self._fd is None:
+            self._is_fifo = stat.S_ISFIFO(os.stat(self.path).st_mode)
+            self._fd = os.open(self.path, os.O_RDONLY | (os.O_NONBLOCK if self._is_fifo else 0))
+        if not self._is_fifo:
+            if self._rewritten(): self._offset = 0; self._remainder = b''; self._header_pending = self.skip_header; self._anchor = b''; reset = True
+            os.lseek(self._fd, self._offset, os.SEEK_SET)
+        chunks = []; remaining = self.max_read
+        while remaining > 0:
+            try: chunk = os.read(self._fd, min(remaining, 1024 * 1024))
+            except BlockingIOError: break
+            if not chunk: break
+            chunks.append(chunk); remaining -= len(chunk)
+        data = b''.join(chunks); self._offset += len(data); self._anchor = (self._anchor + data[-self.ANCHOR_BYTES:])[-self.ANCHOR_BYTES:]
+        data = self._remainder + data
+        cut = data.rfind(b'\n') + 1; self._remainder = data[cut:]; data = data[:cut]
+        if self._header_pending and data: data = data[data.find(b'\n') + 1:]; self._header_pending = False
+        return parse_numeric_lines(data), reset
+    def close(self):
+        if self._fd is not None: os.close(self._fd); self._fd = None
+
+class PerformanceMonitor:
+    # Lekkie pomiary czasu operacji użytkownika z podziałem na fazy. Operacja wywołana wewnątrz innej operacji
+    # (np. odrysowanie po wygładzaniu) staje się jej fazą. Każdy rekord trafia do bufora ostatnich pomiarów i jako
+    # ustrukturyzowany wpis JSON do loggera 'davisu.perf'. Opcjonalny tryb przechwytywania włącza cProfile i tracemalloc.
+    def __init__(self, max_records: int = 500, logger_name: str = 'davisu.perf'):
+        self.records: deque = deque(maxlen=max_records); self.listeners: List[Any] = []
+        self._logger = logging.getLogger(logger_name); self._local = threading.local(); self._profiler = None; self.capturing = False
+    def _stack(self) -> List[Dict[str, Any]]:
+        stack = getattr(self._local, 'stack', None)
+        if stack is None: stack = self._local.stack = []
+        return stack
+    @contextmanager
+    def operation(self, name: str, **meta):
+        stack = self._stack()
+        if stack:
+            with self.phase(name): yield stack[0]
+            return
+        record: Dict[str, Any] = {'operation': name, 'phases': {}, **meta}; stack.append(record)
+        if self.capturing: tracemalloc.reset_peak()
+        start = time.perf_counter()
+        try: yield record
+        finally:
+            record['seconds'] = time.perf_counter() - start; stack.pop()
+            if self.capturing: record['peak_traced_bytes'] = tracemalloc.get_traced_memory()[1]
+            self._finish(record)
+    @contextmanager
+    def phase(self, name: str):
+        stack = self._stack()
+        if not stack: yield; return
+        start = time.perf_counter()
+        try: yield
+        finally: phases = stack[0]['phases']; phases[name] = phases.get(name, 0.0) + time.perf_counter() - start
+    def record(self, name: str, seconds: float, phases: Dict[str, float] | None = None, **meta):
+        # Dla operacji asynchronicznych (wczytywanie w tle), których początek i koniec są w różnych wywołaniach
+        self._finish({'operation': name, 'phases': dict(phases or {}), 'seconds': seconds, **meta})
+    def _finish(self, record: Dict[str, Any]):
+        record['timestamp'] = time.time(); self.records.append(record)
+        self._logger.info(json.dumps({'perf': record}, ensure_ascii=False, default=str), extra={'perf': record})
+        for listener in self.listeners: listener(record)
+    def summary(self) -> Dict[str, Dict[str, float]]:
+        # Rozkład czasów (ms) ostatnich pomiarów dla każdej operacji
+        durations: Dict[str, List[float]] = {}
+        for record in self.records: durations.setdefault(record['operation'], []).append(record['seconds'] * 1000)
+        result = {}
+        for name, values in durations.items():
+            array = np.array(values); p50, p90, p99 = np.percentile(array, [50, 90, 99])
+            result[name] = {'count': len(values), 'mean': float(array.mean()), 'p50': float(p50), 'p90': float(p90), 'p99': float(p99), 'max': float(array.max()), 'last': values[-1]}
+        return result
+    @staticmethod
+    def memory_usage() -> Dict[str, int]:
+        usage: Dict[str, int] = {}
+        try:
+            with open('/proc/self/statm', 'r') as f: usage['rss_bytes'] = int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+        except (OSError, ValueError, AttributeError): pass
+        try: import resource; usage['peak_rss_bytes'] = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+        except ImportError: pass
+        if tracemalloc.is_tracing(): usage['traced_bytes'], usage['peak_traced_bytes'] = tracemalloc.get_traced_memory()
+        return usage
+    def start_capture(self):
+        # cProfile profiluje wątek wywołujący (wątek Tk); tracemalloc śledzi alokacje wszystkich wątków
+        if self.capturing: return
+        import cProfile
+        self._profiler = cProfile.Profile(); tracemalloc.start(); self._profiler.enable(); self.capturing = True
+    def stop_capture(self, directory: str) -> tuple:
+        # Zapisuje profil (.prof, do wczytania przez pstats/snakeviz) i raport tekstowy; zwraca ścieżki obu plików
+        if not self.capturing: return None, None
+        import io, pstats
+        self._profiler.disable(); snapshot = tracemalloc.take_snapshot(); tracemalloc.stop(); self.capturing = False
+        stem = os.path.join(directory, time.strftime('davisu_profile_%Y%m%d_%H%M%S')); self._profiler.dump_stats(f"{stem}.prof")
+        report = io.StringIO(); pstats.Stats(self._profiler, stream=report).sort_stats('cumulative').print_stats(40)
+        report.write("\nNajwiększe alokacje (tracemalloc):\n")
+        for stat_line in snapshot.statistics('lineno')[:25]: report.write(f"{stat_line}\n")
+        with open(f"{stem}.txt", 'w', encoding='utf-8') as f: f.write(report.getvalue())
+        self._profiler = None
+        return f"{stem}.prof", f"{stem}.txt"